@@ -0,0 +1,161 @@
+"""
+Admission control for the LLM-backed endpoints.
+
+ClientRateLimiter is a token bucket per client (API key or IP), checked
+before any work is done. PriorityGate bounds provider calls in flight and
+queues the rest in priority lanes by marks tier: a waiter is ordered by its
+arrival time plus its lane's delay, so 4-mark questions overtake queued
+14-mark essays but an essay is never starved for longer than the lane delay.
+Requests that could not start within max_wait - because the queue is full,
+the estimated wait is too long, or the provider rate limits are exhausted -
+are refused with Overloaded, which the app turns into 429 + Retry-After.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+LANES = ("4", "7", "14")
+
+
+def lane_for(marks):
+    return 0 if marks <= 4 else 1 if marks <= 7 else 2
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason.replace('_', ' ')}). Please retry in {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _retry_after(seconds):
+    return max(1, math.ceil(seconds))
+
+
+class ClientRateLimiter:
+    """per_minute requests per client on average, in bursts of up to burst. Idle clients are forgotten LRU-first."""
+
+    def __init__(self, per_minute, burst, max_clients=10000):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()  # client -> [tokens, updated]
+
+    def hit(self, client, cost=1):
+        """Takes cost tokens for client. Returns 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        bucket = self.buckets.pop(client, None) or [self.capacity, now]
+        bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self.buckets[client] = bucket
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0
+        return (cost - bucket[0]) / self.rate
+
+
+class PriorityGate:
+    """
+    At most capacity holders at once; the rest wait in lanes (see module doc).
+    quota_wait(n), if given, estimates how long until n more provider calls
+    can start under the provider rate limits.
+    """
+
+    def __init__(self, capacity, lane_delays=(0.0, 2.0, 5.0), max_queue=256, max_wait=30.0,
+                 quota_wait=None, metrics=None):
+        self.capacity = capacity
+        self.lane_delays = lane_delays
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.quota_wait = quota_wait
+        self.metrics = metrics
+        self.active = 0
+        self.waiters = []  # heap of (priority, seq, future, lane)
+        self.seq = itertools.count()
+        self.depth = [0] * len(LANES)
+        self.service_time = 5.0  # moving average of how long a slot is held
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "queue_wait": 0, "provider_quota": 0, "queue_timeout": 0}
+
+    def estimated_wait(self):
+        if self.active < self.capacity and not self.waiters:
+            return 0.0
+        return (sum(self.depth) + 1) * self.service_time / self.capacity
+
+    def check(self):
+        """Raises Overloaded if a new request would not get a slot within max_wait."""
+        queued = sum(self.depth)
+        if queued >= self.max_queue:
+            self._reject("queue_full", self.estimated_wait())
+        wait = self.estimated_wait()
+        if wait > self.max_wait:
+            self._reject("queue_wait", wait)
+        if self.quota_wait is not None:
+            wait = self.quota_wait(queued + 1)
+            if wait > self.max_wait:
+                self._reject("provider_quota", wait)
+
+    @asynccontextmanager
+    async def slot(self, marks=4):
+        lane = lane_for(marks)
+        self.check()
+        arrived = time.monotonic()
+        if self.active < self.capacity and not self.waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (arrived + self.lane_delays[lane], next(self.seq), future, lane))
+            self.depth[lane] += 1
+            try:
+                await asyncio.wait_for(future, self.max_wait)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout", self.estimated_wait())
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                raise
+            finally:
+                self.depth[lane] -= 1
+
+        granted = time.monotonic()
+        self.admitted += 1
+        if self.metrics is not None and self.metrics.mode != "off":
+            self.metrics.queue_wait.observe(granted - arrived, LANES[lane])
+        try:
+            yield
+        finally:
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - granted)
+            self._release()
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter, so active never dips and a newcomer can't jump the queue
+        while self.waiters:
+            _, _, future, _ = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _reject(self, reason, wait):
+        self.rejected[reason] += 1
+        if self.metrics is not None and self.metrics.mode != "off":
+            self.metrics.rejected.inc(reason)
+        raise Overloaded(reason, _retry_after(wait))
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queue_depth": dict(zip(LANES, self.depth)),
+            "estimated_wait_s": round(self.estimated_wait(), 2),
+            "service_time_s": round(self.service_time, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
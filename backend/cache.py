@@ -0,0 +1,268 @@
+"""Answer cache for /ask-ai: in-memory LRU with TTL and a byte cap, optionally backed by SQLite."""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_SPACE_RE = re.compile(r'\s+')
+_EDGE_PUNCT = " \t\n?!.,;:'\""
+
+
+def normalize_query(query):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question."""
+    return _SPACE_RE.sub(" ", query.lower()).strip(_EDGE_PUNCT)
+
+
+def cache_key(query, marks, context):
+    context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    raw = f"{normalize_query(query)}\x00{marks}\x00{context_hash}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of answers keyed by cache_key().
+
+    max_bytes caps the total size of stored answers (UTF-8) plus keys; the
+    least recently used entries are evicted first. With db_path set, puts
+    are also written to SQLite and misses fall back to it, so the cache
+    survives restarts. The writes are queued for a writer thread, which
+    commits them in batches every flush_interval seconds and then applies
+    the same TTL and byte cap to the table (oldest entries first), so a put
+    never waits on the disk. max_bytes=0 disables caching.
+
+    Each entry records the knowledge version it was answered from, and
+    get() only returns entries of the version asked for. aget() is get() for
+async callers, with the SQLite lookup of a memory miss run in a thread so
+it never blocks the event loop. clear(version),
+    called when the knowledge is reloaded, drops the older entries and the
+    SQLite rows; a put from a request that started on an older version is
+    not kept. Rows persisted by an earlier run are matched to the new one by
+    their key, which hashes the retrieved context the answer was based on.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=24 * 3600, db_path=None, flush_interval=0.5):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (answer, expires_at, size, version)
+        self.version = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.db = None
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.pending = {}  # key -> (answer, expires_at), not yet written to SQLite
+        self.flush_requested = threading.Event()
+        self.writer = None
+        self.closing = False
+        self.clear_db = False
+        self.db_writes = 0
+        self.db_evictions = 0
+        if db_path and max_bytes > 0:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            # A forked worker must not share the parent's connection
+            os.register_at_fork(after_in_child=self._reconnect)
+            # WAL lets get() read while the writer thread commits
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT, expires_at REAL)"
+            )
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(answers)")}
+            if "size" not in columns:
+                self.db.execute("ALTER TABLE answers ADD COLUMN size INTEGER")
+                self.db.execute("UPDATE answers SET size = length(key) + length(CAST(answer AS BLOB))")
+            self.db.execute("CREATE INDEX IF NOT EXISTS answers_expires_at ON answers (expires_at)")
+            self.db.commit()
+            self._expire(self.db)
+            self.db.commit()
+
+    def _reconnect(self):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        # The parent's queue and writer thread stay with the parent
+        self.pending = {}
+        self.clear_db = False
+        self.flush_requested = threading.Event()
+        self.writer = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key, version=0):
+        """Cached answer or None. A memory miss reads SQLite on the calling thread; async code uses aget()."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        answer = self._get_memory(key, version, now)
+        return answer if answer is not None else self._get_db(key, version, now)
+
+    async def aget(self, key, version=0):
+        """get() for the event loop: the SQLite read on a memory miss runs in a worker thread."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        answer = self._get_memory(key, version, now)
+        if answer is not None:
+            return answer
+        if self.db is None:
+            return self._get_db(key, version, now)
+        return await asyncio.to_thread(self._get_db, key, version, now)
+
+    def _get_memory(self, key, version, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                answer, expires_at, size, entry_version = entry
+                if expires_at <= now:
+                    self._remove(key)
+                elif entry_version == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+        return None
+
+    def _get_db(self, key, version, now):
+        """Looks key up in SQLite after a memory miss (without holding the lock) and counts the hit or miss."""
+        row = None
+        if self.db is not None and not self.clear_db:
+            row = self.db.execute(
+                "SELECT answer, expires_at FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        with self.lock:
+            # A clear() while the row was read makes it stale
+            if row is None or self.clear_db or version < self.version:
+                self.misses += 1
+                return None
+            self._insert(key, row[0], row[1], version)
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, answer, version=0):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            if version < self.version:
+                return
+            self._insert(key, answer, expires_at, version)
+            if self.db is not None and not self.closing:
+                self.pending[key] = (answer, expires_at)
+                self._wake_writer()
+
+    def _wake_writer(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, name="answer-cache-writer", daemon=True)
+            self.writer.start()
+        self.flush_requested.set()
+
+    def _write_loop(self):
+        db = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                self.flush_requested.wait()
+                if not self.closing:
+                    # Let the puts of a burst share one commit
+                    time.sleep(self.flush_interval)
+                with self.lock:
+                    batch, self.pending = self.pending, {}
+                    clear, self.clear_db = self.clear_db, False
+                    self.flush_requested.clear()
+                    closing = self.closing
+                if batch or clear:
+                    try:
+                        self._write(db, batch, clear)
+                    except sqlite3.Error as e:
+                        db.rollback()
+                        print(f"Answer cache: could not write {len(batch)} entries to {self.db_path}: {e}")
+                if closing:
+                    return
+        finally:
+            db.close()
+
+    def _write(self, db, batch, clear=False):
+        if clear:
+            db.execute("DELETE FROM answers")
+        db.executemany(
+            "INSERT OR REPLACE INTO answers (key, answer, expires_at, size) VALUES (?, ?, ?, ?)",
+            [(key, answer, expires_at, len(key) + len(answer.encode("utf-8")))
+             for key, (answer, expires_at) in batch.items()],
+        )
+        evicted = self._expire(db)
+        db.commit()
+        self.db_writes += len(batch)
+        self.db_evictions += evicted
+
+    def _expire(self, db):
+        """Deletes expired rows, then the oldest rows beyond max_bytes; returns how many went over the cap."""
+        db.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+        return db.execute(
+            "DELETE FROM answers WHERE key IN (SELECT key FROM ("
+            "SELECT key, SUM(size) OVER (ORDER BY expires_at DESC, key) AS total FROM answers"
+            ") WHERE total > ?)",
+            (self.max_bytes,),
+        ).rowcount
+
+    def clear(self, version):
+        """Drops the entries of knowledge versions before version, in memory and (queued) in SQLite."""
+        with self.lock:
+            self.version = version
+            for key in [k for k, entry in self.entries.items() if entry[3] < version]:
+                self._remove(key)
+            if self.db is not None and not self.closing:
+                self.pending = {k: v for k, v in self.pending.items() if k in self.entries}
+                self.clear_db = True
+                self._wake_writer()
+
+    def close(self):
+        """Writes out queued puts and stops the writer thread. Blocks until the last commit."""
+        with self.lock:
+            self.closing = True
+            writer = self.writer
+            self.flush_requested.set()
+        if writer is not None:
+            writer.join()
+
+    def _insert(self, key, answer, expires_at, version):
+        if key in self.entries:
+            self._remove(key)
+        size = len(key) + len(answer.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (answer, expires_at, size, version)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        size = self.entries.pop(key)[2]
+        self.size -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "knowledge_version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self.db is not None,
+            "pending_writes": len(self.pending),
+            "db_writes": self.db_writes,
+            "db_evictions": self.db_evictions,
+        }
@@ -0,0 +1,110 @@
+"""
+Single-flight coalescing of identical in-flight questions.
+
+When a class submits the same question within a second, the first request
+(the leader) starts one Flight that does retrieval, the cache lookup and the
+provider call; identical requests arriving while it runs (followers) attach
+to that Flight instead of starting their own. A Flight is a log of the
+events it has published so far: a follower that joins late replays them
+from the start and then receives new ones as they arrive, so streaming
+followers see the leader's token stream.
+
+The producer runs in its own task, so a leader whose client disconnects
+does not cancel the answer its followers are waiting for.
+"""
+
+import asyncio
+
+
+class Flight:
+    """One shared computation: published events, then a result or an error."""
+
+    def __init__(self):
+        self.events = []
+        self.followers = 0
+        self.done = False
+        self.result = None
+        self.error = None
+        self.task = None
+        self._wake = asyncio.Event()
+
+    def publish(self, kind, value):
+        self.events.append((kind, value))
+        self._notify()
+
+    def _finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    async def follow(self):
+        """Yields every (kind, value) event from the first, then raises the producer's error if it failed."""
+        i = 0
+        while True:
+            wake = self._wake
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                break
+            await wake.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def wait(self):
+        """Returns the producer's result (or raises its error) without cancelling it if the caller goes away."""
+        while not self.done:
+            await self._wake.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Flights by key while they run. A key of None is never shared."""
+
+    def __init__(self):
+        self.flights = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key, produce):
+        """
+        Returns (flight, leader). For a key with no flight running, starts
+        produce(flight) - a coroutine function that publishes events and
+        returns the result - and returns leader=True.
+        """
+        flight = self.flights.get(key) if key is not None else None
+        if flight is not None:
+            flight.followers += 1
+            self.followers += 1
+            return flight, False
+        flight = Flight()
+        if key is not None:
+            self.flights[key] = flight
+        self.leaders += 1
+        flight.task = asyncio.ensure_future(self._run(key, flight, produce))
+        return flight, True
+
+    async def _run(self, key, flight, produce):
+        try:
+            flight._finish(result=await produce(flight))
+        except BaseException as e:
+            flight._finish(error=e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if key is not None and self.flights.get(key) is flight:
+                del self.flights[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self.flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
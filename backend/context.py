@@ -0,0 +1,111 @@
+"""Token-budgeted assembly of retrieved chunks into the examiner CONTEXT block."""
+
+# Context tokens allowed per marks tier; unknown tiers fall back to 4m (examiner rule STEP 9)
+TOKEN_BUDGETS = {4: 800, 7: 1400, 14: 2400}
+
+CHARS_PER_TOKEN = 4
+
+# Rendering cost not in chunk.tokens: section headings, and per-chunk separators/question lines
+TEXTBOOK_HEADER_TOKENS = 24
+SCHEME_HEADER_TOKENS = 12
+CHUNK_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def marks_tier(marks):
+    """The marks tier a question is answered at: 4, 7 or 14, with unknown values treated as 4."""
+    return marks if marks in TOKEN_BUDGETS else 4
+
+
+def token_budget(marks):
+    return TOKEN_BUDGETS[marks_tier(marks)]
+
+
+def uncovered_span(chunk, covered):
+    """
+    (start, end) of the part of a raw_text passage not already held by the
+    passages in covered (spans of the same topic). Neighbouring passages
+    overlap by a sentence or two, so only the head or the tail is ever cut.
+    """
+    start, end = chunk.meta["start"], chunk.meta["end"]
+    for s, e in covered:
+        if s <= start < e:
+            start = e
+        if s < end <= e:
+            end = s
+    return start, max(start, end)
+
+
+def pack_context(ranked, budget):
+    """
+    Greedily keep the highest-scoring chunks whose rendered size fits in budget tokens.
+    A chunk that does not fit is skipped so smaller, lower-ranked ones can still use the space.
+    A passage overlapping one already kept only costs its new text, and is dropped if it adds none.
+    Returns (packed, used_tokens).
+    """
+    packed = []
+    used = 0
+    sections = set()
+    covered = {}
+    for chunk, score in ranked:
+        section = "mark_scheme" if chunk.kind == "mark_scheme" else chunk.key
+        tokens = chunk.tokens
+        if "start" in chunk.meta:
+            start, end = uncovered_span(chunk, covered.setdefault(chunk.key, []))
+            if start == end:
+                continue
+            tokens = (end - start + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        cost = tokens + CHUNK_OVERHEAD_TOKENS
+        if section not in sections:
+            cost += SCHEME_HEADER_TOKENS if section == "mark_scheme" else TEXTBOOK_HEADER_TOKENS
+        if used + cost > budget:
+            continue
+        packed.append((chunk, score))
+        sections.add(section)
+        if "start" in chunk.meta:
+            covered[chunk.key].append((chunk.meta["start"], chunk.meta["end"]))
+        used += cost
+    return packed, used
+
+
+def render_context(ranked):
+    """Group ranked (chunk, score) pairs into textbook and marking-scheme sections."""
+    context = ""
+    textbook = {}
+    marking_examples = []
+    covered = {}
+    pages = {}
+    for chunk, score in ranked:
+        if chunk.kind == "mark_scheme":
+            marking_examples.append(chunk.meta)
+            continue
+        text = chunk.text
+        if "start" in chunk.meta:
+            # overlapping passages: only the sentences not already rendered
+            start, end = uncovered_span(chunk, covered.setdefault(chunk.key, []))
+            covered[chunk.key].append((chunk.meta["start"], chunk.meta["end"]))
+            text = text[start - chunk.meta["start"]:end - chunk.meta["start"]].strip()
+            if chunk.meta.get("pages"):
+                pages.setdefault(chunk.key, []).extend(int(p) for p in chunk.meta["pages"].split("-"))
+        if text:
+            textbook.setdefault(chunk.key, (chunk.title, []))[1].append(text)
+
+    for key, (title, texts) in textbook.items():
+        where = ""
+        if key in pages:
+            first, last = min(pages[key]), max(pages[key])
+            where = f", p. {first}" if first == last else f", pp. {first}-{last}"
+        context += f"\n### TEXTBOOK CONTEXT: {title} (Nigel Kelly Standards{where})\n"
+        context += "\n".join(texts) + "\n"
+
+    if marking_examples:
+        context += "\n\n### CAMBRIDGE EXAMINER MARKING SCHEMES:\n"
+        for example in marking_examples:
+            tier = f", {example['marks']} marks" if example.get("marks") else ""
+            context += f"\n**Question: {example['question']}** ({example['year']}{tier})\n"
+            for point in example['points']: context += f"  • {point}\n"
+    return context
@@ -0,0 +1,120 @@
+"""
+Outbound HTTP connection pools for the provider clients.
+
+groq talks httpx and huggingface_hub talks httpx2 (its fork of httpx), so
+each provider gets its own pool, built from the same settings: a connection
+limit, how many idle connections are kept alive and for how long, HTTP/2
+when asked for and the h2 package is installed, and connect/read timeouts.
+The read timeout is the longest gap between two chunks of a streamed
+answer; the provider deadline still bounds the whole call. The limits
+default to the SDKs' own (100 connections, 20 kept alive for 5 s, HTTP/1.1).
+
+A ConnectionPool is the transport handed to the SDK's AsyncClient. It wraps
+the library's own transport and counts requests, requests in flight, and
+requests that found every connection busy. Newly opened connections (each
+one a TCP handshake) and TLS handshakes are counted from httpcore's
+per-request "trace" extension, so nothing private to httpx is touched.
+"""
+
+import importlib.util
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ConnectionPool:
+    def __init__(self, name, max_connections=100, max_keepalive=20, keepalive_expiry=5.0,
+                 http2=False, connect_timeout=5.0, read_timeout=60.0):
+        self.name = name
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.transport = None
+        self.requests = 0
+        self.opened = 0
+        self.tls_handshakes = 0
+        self.active = 0
+        self.peak_active = 0
+        self.waits = 0
+
+    def timeout(self, httpx):
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def bind(self, httpx):
+        """Returns self to use as an AsyncClient's transport, building the pooled httpx (or httpx2) transport
+        on the first call; clients bound later share it."""
+        if self.transport is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive,
+                                  keepalive_expiry=self.keepalive_expiry)
+            self.transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)
+        return self
+
+    async def handle_async_request(self, request):
+        """
+        Sends request through the pooled transport. A request is active from
+        here until httpcore reports its response closed (or it fails before
+        getting one); over HTTP/1.1 each active request holds a connection,
+        so one started with max_connections already active waits for one.
+        """
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                self.active -= 1
+
+        outer = request.extensions.get("trace")
+
+        async def trace(event, info):
+            if event == "connection.connect_tcp.complete":
+                self.opened += 1
+            elif event == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif event.endswith((".response_closed.complete", ".response_closed.failed")):
+                finish()
+            if outer is not None:
+                await outer(event, info)
+
+        request.extensions["trace"] = trace
+        self.requests += 1
+        if not self.http2 and self.active >= self.max_connections:
+            self.waits += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            return await self.transport.handle_async_request(request)
+        except BaseException:
+            finish()
+            raise
+
+    async def aclose(self):
+        transport, self.transport = self.transport, None
+        if transport is not None:
+            await transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def stats(self):
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry_s": self.keepalive_expiry,
+            "connect_timeout_s": self.connect_timeout,
+            "read_timeout_s": self.read_timeout,
+            "active": self.active,
+            "peak_active": self.peak_active,
+            "requests": self.requests,
+            "connections_opened": self.opened,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_rate": round(1 - self.opened / self.requests, 3) if self.requests else None,
+            "waits": self.waits,
+            "waiting": max(0, self.active - self.max_connections) if not self.http2 else 0,
+        }
@@ -0,0 +1,244 @@
+"""
+Compiled, memory-mapped knowledge base (history_data.kb).
+
+Layout: MAGIC | u32 header length | JSON header | 8-byte aligned sections.
+The header is small (section table, topic titles, past_papers) and is parsed
+on open. Everything large - chunk text, vocabulary and BM25 postings - stays
+in the file and is read through zero-copy memoryviews, so every worker that
+opens the same file shares those pages through the OS page cache.
+
+Sections (typecodes as in the array module):
+  blob          B  UTF-8 of every string (chunk text, meta JSON, keys, titles, terms)
+  text_off      I  n+1 offsets of chunk text in blob (text ends where its meta starts)
+  meta_off      I  n offsets of chunk meta JSON in blob (empty = {}; ends at next text_off)
+  chunk_kind    B  index into KINDS
+  chunk_key     I  index into strings
+  chunk_title   I  index into strings
+  chunk_tokens  I  estimated tokens per chunk
+  strings_off   I  offsets of key/title strings in blob, plus a closing offset
+  vocab_off     I  offsets of terms in blob, plus a closing offset
+  post_off      I  V+1 offsets into post_ids / post_weights
+  post_ids      i  chunk ids
+  post_weights  f  BM25 weights
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from knowledge import build_index
+from retriever import Chunk, Retriever, build_retriever
+
+MAGIC = b"HKB1"
+# Bumped whenever the chunks a build would write change, not only the layout:
+# 2 - raw_text as sentence-aligned passages, mark-scheme meta from PastPaperScheme
+FORMAT_VERSION = 2
+KINDS = ["raw_text", "factor", "qa", "mark_scheme"]
+
+
+class StaleKnowledgeBase(ValueError):
+    """The .kb was compiled by an older format version; rebuild it or load the JSON."""
+
+
+def compile_kb(data, path):
+    """Build the BM25 retriever for data and write it, plus the small tables, to path."""
+    retriever = build_retriever(data)
+    blob = bytearray()
+
+    def put(text):
+        start = len(blob)
+        blob.extend(text.encode("utf-8"))
+        return start
+
+    text_off, meta_off = array("I"), array("I")
+    kinds, tokens = array("B"), array("I")
+    for chunk in retriever.chunks:
+        text_off.append(put(chunk.text))
+        meta_off.append(put(json.dumps(chunk.meta, ensure_ascii=False) if chunk.meta else ""))
+        kinds.append(KINDS.index(chunk.kind))
+        tokens.append(chunk.tokens)
+    # closing offset, so chunk i is blob[text_off[i]:meta_off[i]] + blob[meta_off[i]:text_off[i + 1]]
+    text_off.append(len(blob))
+
+    strings = {}
+    for chunk in retriever.chunks:
+        strings.setdefault(chunk.key, len(strings))
+        strings.setdefault(chunk.title, len(strings))
+    strings_off = array("I", (put(text) for text in strings))
+    strings_off.append(len(blob))
+    keys = array("I", (strings[c.key] for c in retriever.chunks))
+    titles = array("I", (strings[c.title] for c in retriever.chunks))
+
+    vocab_off, post_off = array("I"), array("I", [0])
+    post_ids, post_weights = array("i"), array("f")
+    for term in sorted(retriever.postings):
+        ids, weights = retriever.postings[term]
+        vocab_off.append(put(term))
+        post_ids.extend(ids)
+        post_weights.extend(weights)
+        post_off.append(len(post_ids))
+    vocab_off.append(len(blob))
+
+    sections = {
+        "blob": array("B", bytes(blob)),
+        "text_off": text_off, "meta_off": meta_off,
+        "chunk_kind": kinds, "chunk_key": keys, "chunk_title": titles, "chunk_tokens": tokens,
+        "strings_off": strings_off, "vocab_off": vocab_off,
+        "post_off": post_off, "post_ids": post_ids, "post_weights": post_weights,
+    }
+    light = light_data(data)
+
+    # Section offsets depend on the header length, so repeat until it stops changing
+    table = {}
+    header = b""
+    while True:
+        header_len = len(header)
+        offset = _align(len(MAGIC) + 4 + header_len)
+        for name, arr in sections.items():
+            table[name] = [offset, len(arr), arr.typecode]
+            offset = _align(offset + len(arr) * arr.itemsize)
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "chunks": len(retriever.chunks),
+            "sections": table,
+            "data": light,
+        }, ensure_ascii=False).encode("utf-8")
+        if len(header) == header_len:
+            break
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name, arr in sections.items():
+            f.write(b"\0" * (table[name][0] - f.tell()))
+            f.write(arr.tobytes())
+    os.replace(tmp_path, path)
+    return retriever
+
+
+def light_data(data):
+    """history_data without the bulky textbook bodies: topic titles plus every other top-level section."""
+    light = {k: v for k, v in data.items() if k != "specific_topics"}
+    light["specific_topics"] = {
+        key: {"title": topic.get("title", key)} for key, topic in data.get("specific_topics", {}).items()
+    }
+    return light
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class MappedChunk:
+    """A Chunk read from the mapped file; its text is decoded from the file on each use."""
+
+    __slots__ = ("kind", "key", "title", "meta", "tokens", "_kb", "_start", "_end")
+
+    def __init__(self, kind, key, title, meta, tokens, kb, start, end):
+        self.kind, self.key, self.title, self.meta, self.tokens = kind, key, title, meta, tokens
+        self._kb, self._start, self._end = kb, start, end
+
+    @property
+    def text(self):
+        return self._kb.blob_text(self._start, self._end)
+
+
+class MappedChunks:
+    """
+    Sequence of MappedChunk over the mapped blob. A chunk's fields and parsed
+    meta are kept once it has been ranked, but its text stays in the file
+    (shared between workers in the page cache) and is only decoded when the
+    chunk is rendered. Callers must treat chunk.meta as read-only.
+    """
+
+    def __init__(self, kb):
+        s = kb.sections
+        self.kb = kb
+        self.keys = [kb.strings[i] for i in s["chunk_key"]]
+        self.titles = [kb.strings[i] for i in s["chunk_title"]]
+        self.kinds = [KINDS[k] for k in s["chunk_kind"]]
+        self.decoded = {}  # chunk id -> MappedChunk
+
+    def __len__(self):
+        return self.kb.n
+
+    def __getitem__(self, i):
+        chunk = self.decoded.get(i)
+        if chunk is None:
+            if not 0 <= i < self.kb.n:
+                raise IndexError(i)
+            s = self.kb.sections
+            meta_raw = self.kb.blob_text(s["meta_off"][i], s["text_off"][i + 1])
+            chunk = self.decoded[i] = MappedChunk(
+                self.kinds[i], self.keys[i], self.titles[i], json.loads(meta_raw) if meta_raw else {},
+                s["chunk_tokens"][i], self.kb, s["text_off"][i], s["meta_off"][i])
+        return chunk
+
+
+class MappedPostings:
+    """term -> (chunk ids, weights) as memoryview slices into the file."""
+
+    def __init__(self, kb):
+        s = kb.sections
+        off = s["vocab_off"]
+        self.terms = {kb.blob_text(off[i], off[i + 1]): i for i in range(len(off) - 1)}
+        self.post_off, self.ids, self.weights = s["post_off"], s["post_ids"], s["post_weights"]
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get(self, term, default=None):
+        i = self.terms.get(term)
+        if i is None:
+            return default
+        a, b = self.post_off[i], self.post_off[i + 1]
+        return self.ids[a:b], self.weights[a:b]
+
+
+class MappedRetriever(Retriever):
+    """Retriever whose chunks and postings live in a compiled .kb file."""
+
+    def __init__(self, kb):
+        self.kb = kb
+        self.chunks = MappedChunks(kb)
+        self.chunk_keys = self.chunks.keys
+        self.postings = MappedPostings(kb)
+        chunks = self.chunks
+        self.index_chunks(self.chunk_keys, [(i, (chunks.keys[i], chunks.titles[i]))
+                                            for i in range(kb.n) if chunks.kinds[i] == "mark_scheme"])
+
+
+class KnowledgeBase:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled knowledge base")
+        (header_len,) = struct.unpack_from("<I", self.mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self.mm[start:start + header_len].decode("utf-8"))
+        if header["version"] != FORMAT_VERSION:
+            raise StaleKnowledgeBase(f"{path} has format version {header['version']}, expected {FORMAT_VERSION}")
+
+        view = memoryview(self.mm)
+        self.sections = {}
+        for name, (offset, length, typecode) in header["sections"].items():
+            size = array(typecode).itemsize
+            self.sections[name] = view[offset:offset + length * size].cast(typecode)
+        self.blob = self.sections["blob"]
+        self.n = header["chunks"]
+        self.data = header["data"]
+        off = self.sections["strings_off"]
+        self.strings = [self.blob_text(off[i], off[i + 1]) for i in range(len(off) - 1)]
+
+    def blob_text(self, start, end):
+        return str(self.blob[start:end], "utf-8")
+
+
+def open_kb(path):
+    """Returns (history_data, index, retriever) backed by the compiled file at path."""
+    kb = KnowledgeBase(path)
+    return kb.data, build_index(kb.data), MappedRetriever(kb)
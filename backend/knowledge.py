@@ -0,0 +1,161 @@
+"""Precomputed lookup tables over history_data for get_subject_context."""
+
+import re
+from collections import defaultdict
+
+WORD_RE = re.compile(r'\w+')
+YEAR_RE = re.compile(r'\d{4}')
+DIGITS_RE = re.compile(r'\d{4,}')
+
+
+def query_years(query_lower):
+    """Every 4-digit window in the query, so '19371939' yields 1937, 9371, ... 1939."""
+    years = set()
+    for run in DIGITS_RE.findall(query_lower):
+        for i in range(len(run) - 3):
+            years.add(run[i:i + 4])
+    return years
+
+
+class PastPaperScheme:
+    """One past-paper question with its marking points, whichever ingestion path wrote it."""
+
+    __slots__ = ("year", "season", "paper", "question", "marks", "points", "tips")
+
+    def __init__(self, year, season, paper, question, marks, points, tips):
+        self.year = year
+        self.season = season
+        self.paper = paper
+        self.question = question
+        self.marks = marks
+        self.points = points
+        self.tips = tips
+
+    @property
+    def key(self):
+        return f"{self.year}/{self.season}/{self.paper}"
+
+
+def iter_schemes(data):
+    """
+    Every past_papers mark_scheme entry as a PastPaperScheme, in dict order.
+    Curated entries use marks/mark_scheme_points; raw parser output uses total_marks/points.
+    """
+    for year, seasons in data.get("past_papers", {}).items():
+        for season, papers in seasons.items():
+            for paper, content in papers.items():
+                for entry in content.get("mark_scheme", []):
+                    marks = entry.get("marks", entry.get("total_marks"))
+                    yield PastPaperScheme(
+                        year, season, paper, entry.get("question", ""),
+                        int(marks) if marks is not None else None,
+                        tuple(entry.get("mark_scheme_points") or entry.get("points") or ()),
+                        tuple(entry.get("examiner_tips") or ()),
+                    )
+
+
+class KnowledgeIndex:
+    """
+    Inverted index built once per history_data load.
+
+    topic_tokens:  token -> topic keys whose underscore-split key contains it
+    topic_years:   4-digit year -> topic keys mentioning it
+    scheme_tokens: token -> ids of past-paper mark-scheme entries whose question contains it
+    schemes_by_marks / schemes_by_topic: marks tier / topic key -> ids of those entries
+    """
+
+    def __init__(self, data):
+        self.topic_keys = []
+        self.topic_order = {}
+        self.topic_word_count = {}
+        self.topic_tokens = defaultdict(set)
+        self.topic_years = defaultdict(set)
+
+        for key in data.get("specific_topics", {}):
+            self.topic_order[key] = len(self.topic_keys)
+            self.topic_keys.append(key)
+            key_words = set(key.split('_'))
+            self.topic_word_count[key] = len(key_words)
+            for word in key_words:
+                self.topic_tokens[word].add(key)
+            for year in YEAR_RE.findall(key):
+                self.topic_years[year].add(key)
+
+        self.schemes = list(iter_schemes(data))
+        self.scheme_tokens = defaultdict(set)
+        self.schemes_by_marks = defaultdict(set)
+        self.schemes_by_topic = defaultdict(set)
+        for entry_id, scheme in enumerate(self.schemes):
+            question = scheme.question.lower()
+            for token in set(WORD_RE.findall(question)):
+                if len(token) > 4:
+                    self.scheme_tokens[token].add(entry_id)
+            self.schemes_by_marks[scheme.marks].add(entry_id)
+            for key in self.match_topics(question):
+                self.schemes_by_topic[key].add(entry_id)
+
+    def match_topics(self, query_lower):
+        """Topic keys matched by the query, in specific_topics order."""
+        words = set(WORD_RE.findall(query_lower))
+        hits = defaultdict(int)
+        for word in words:
+            for key in self.topic_tokens.get(word, ()):
+                hits[key] += 1
+
+        matched = set()
+        for key, common in hits.items():
+            if common >= 2 or (common == 1 and self.topic_word_count[key] == 1):
+                matched.add(key)
+        for year in query_years(query_lower):
+            matched.update(self.topic_years.get(year, ()))
+        return sorted(matched, key=self.topic_order.__getitem__)
+
+    def match_schemes(self, query_lower, marks=None, topics=None):
+        """
+        Past-paper mark-scheme entries on a topic the query names, or sharing a long (>4 chars)
+        word with it; with marks, only entries of that marks tier. topics: match_topics(query_lower),
+        when the caller already has it.
+        """
+        ids = set()
+        for word in WORD_RE.findall(query_lower):
+            if len(word) > 4:
+                ids.update(self.scheme_tokens.get(word, ()))
+        for key in self.match_topics(query_lower) if topics is None else topics:
+            ids.update(self.schemes_by_topic.get(key, ()))
+        if marks is not None:
+            ids &= self.schemes_by_marks.get(marks, set())
+        return [self.schemes[i] for i in sorted(ids)]
+
+
+def build_index(data):
+    return KnowledgeIndex(data)
+
+
+class KnowledgeSnapshot:
+    """
+    One consistent generation of history_data and everything derived from it.
+    Reloads build a new snapshot and replace the reference in one assignment,
+    so a request that read the old reference keeps using it to the end.
+    """
+
+    __slots__ = ("data", "index", "retriever", "version", "source", "loaded_at", "load_seconds")
+
+    def __init__(self, data, index, retriever, version, source, loaded_at, load_seconds):
+        self.data = data
+        self.index = index
+        self.retriever = retriever
+        self.version = version
+        self.source = source
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "load_ms": round(self.load_seconds * 1000, 2),
+            "chunks": len(self.retriever.chunks),
+            "topics": len(self.index.topic_keys),
+            "mark_schemes": len(self.index.schemes),
+        }
@@ -1,19 +1,64 @@
-from fastapi import FastAPI, Form, HTTPException
+from fastapi import Depends, FastAPI, Form, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+import asyncio
 import json
 import os
 from typing import Optional, List
-from dotenv import load_dotenv
-from groq import Groq
-from huggingface_hub import InferenceClient
-import re
+from http_pool import ConnectionPool
+from providers import HF_MODEL, GroqProvider, HuggingFaceProvider, LazyClient, ProviderRouter, ProvidersUnavailable, CircuitBreaker, RateLimiter
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from knowledge import KnowledgeSnapshot, build_index
+from retriever import build_retriever
+from kb_format import StaleKnowledgeBase, open_kb
+from context import estimate_tokens, marks_tier, pack_context, render_context, token_budget
+from cache import AnswerCache, cache_key, normalize_query
+from prompts import answer_prompt, context_message, grading_prompt
+from streaming import AuditSplitter, parse_audit, sse_event
+from metrics import Metrics, MetricsMiddleware, current_trace
+from admission import LANES, ClientRateLimiter, Overloaded, PriorityGate
+from coalesce import SingleFlight
+import prefork
+
+def load_env_file():
+    """Loads the nearest .env (this directory or a parent). python-dotenv is only imported when there is one."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
 
 # Load environment variables
-load_dotenv()
-
-app = FastAPI(title="Cambridge History Examiner Bot - Simple Mode")
+load_env_file()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Pre-fork workers leave watching and reloading to the parent, which keeps the data shared
+    watching = KNOWLEDGE_WATCH_INTERVAL > 0 and not prefork.in_worker()
+    watcher = asyncio.create_task(watch_knowledge()) if watching else None
+    sharing = metrics.shared_dir is not None and metrics.mode != "off"
+    flusher = asyncio.create_task(flush_metrics()) if sharing else None
+    yield
+    if watcher:
+        watcher.cancel()
+    if flusher:
+        flusher.cancel()
+        await asyncio.to_thread(metrics.write_snapshot, metrics.snapshot())
+    # Commit the answers still queued for the SQLite cache
+    await asyncio.to_thread(answer_cache.close)
+
+app = FastAPI(title="Cambridge History Examiner Bot - Simple Mode", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -22,216 +67,665 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # the frontend reads it from 429 responses to say when to retry
+    expose_headers=["Retry-After"],
 )
 
+# Worker processes forked from one parent that loads the knowledge base (1 = a single process, and
+# always 1 under `uvicorn main:app`). The workers all spend the same provider quota, so GROQ_RPM, HF_RPM,
+# LLM_MAX_CONCURRENCY and QUEUE_MAX_DEPTH are split between them; /metrics sums every worker's counters.
+# Caches and client_limiter stay per worker: a client spread over N workers gets up to N x CLIENT_RPM
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1")) if __name__ == "__main__" else 1
+
+def worker_share(total, minimum=1):
+    """One worker's part of a server-wide budget."""
+    return max(minimum, total / WEB_WORKERS)
+
+# Seconds between the snapshots a pre-fork worker writes for the server-wide /metrics
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+
+# Per-stage timings and counters for /metrics (METRICS_MODE=full|sampled|off)
+metrics = Metrics(mode=os.getenv("METRICS_MODE", "full"), sample_every=int(os.getenv("METRICS_SAMPLE_EVERY", "10")))
+app.add_middleware(MetricsMiddleware, metrics=metrics, paths=("/ask-ai", "/ask-ai/stream", "/batch"))
+
 # Load Knowledge Datasets
 BASE_DIR = os.path.dirname(__file__)
 # HIST_DATA_PATH = os.path.join(BASE_DIR, "..", "data", "history_data.json")
 HIST_DATA_PATH = os.path.join(BASE_DIR, "history_data.json")
 
 
+# Compiled, memory-mapped form of history_data.json (python scripts/build_knowledge_base.py)
+HIST_KB_PATH = os.path.join(BASE_DIR, "history_data.kb")
+# auto: use the .kb file when it is at least as new as the JSON; kb / json: force one
+HISTORY_DATA_FORMAT = os.getenv("HISTORY_DATA_FORMAT", "auto")
+
+
 def load_json(path):
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     return {}
 
-history_data = load_json(HIST_DATA_PATH)
-
-# Initialize LLM clients
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY")) if os.getenv("GROQ_API_KEY") else None
-hf_client = InferenceClient(token=os.getenv("HF_API_KEY")) if os.getenv("HF_API_KEY") else None
+def _kb_is_fresh():
+    if not os.path.exists(HIST_KB_PATH):
+        return False
+    return not os.path.exists(HIST_DATA_PATH) or os.path.getmtime(HIST_KB_PATH) >= os.path.getmtime(HIST_DATA_PATH)
+
+def _source_mtimes():
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (HIST_DATA_PATH, HIST_KB_PATH))
+
+def load_knowledge(version=1, previous=None):
+    """Builds a KnowledgeSnapshot, from the compiled .kb when available.
+    With the .kb, snapshot.data holds topic titles and past_papers but not the textbook bodies.
+    From JSON, chunks unchanged since the previous snapshot are not tokenized again."""
+    start = time.perf_counter()
+    source = None
+    if HISTORY_DATA_FORMAT == "kb" or (HISTORY_DATA_FORMAT == "auto" and _kb_is_fresh()):
+        try:
+            data, index, retriever = open_kb(HIST_KB_PATH)
+            source = "kb"
+        except StaleKnowledgeBase as e:
+            if HISTORY_DATA_FORMAT == "kb":
+                raise
+            print(f"Loading the JSON instead: {str(e)}; rebuild it with scripts/build_knowledge_base.py")
+    if source is None:
+        source = "json"
+        data = load_json(HIST_DATA_PATH)
+        index, retriever = build_index(data), build_retriever(data, previous and previous.retriever)
+    return KnowledgeSnapshot(data, index, retriever, version, source,
+                             datetime.now().isoformat(timespec="seconds"), time.perf_counter() - start)
+
+# background: the first snapshot is loaded in a thread, so the server accepts connections (and
+# /ready answers) while it indexes; requests that need it wait. eager: loaded during import.
+KNOWLEDGE_PRELOAD = os.getenv("KNOWLEDGE_PRELOAD", "background")
+knowledge = None
+knowledge_mtimes = None
+knowledge_ready = threading.Event()
+knowledge_error = None
+reload_lock = asyncio.Lock()
+
+def _initial_load():
+    global knowledge, knowledge_mtimes, knowledge_error
+    knowledge_mtimes = _source_mtimes()  # also on failure: the watcher retries once the files change
+    try:
+        knowledge = load_knowledge()
+        print(f"Knowledge loaded: v1 from {knowledge.source} in {knowledge.load_seconds * 1000:.1f} ms")
+    except Exception as e:
+        knowledge_error = str(e)
+        print(f"Knowledge load failed: {knowledge_error}")
+    finally:
+        knowledge_ready.set()
+    if KNOWLEDGE_PRELOAD == "background":
+        warm_providers()
+
+def current_knowledge():
+    """The live snapshot; blocks until the first load has finished."""
+    if knowledge is None:
+        knowledge_ready.wait()
+        if knowledge is None:
+            raise RuntimeError(f"Knowledge base failed to load: {knowledge_error}")
+    return knowledge
+
+async def knowledge_loaded():
+    """current_knowledge() for the event loop: waits for the first load in a thread, not on the loop."""
+    if not knowledge_ready.is_set():
+        await asyncio.to_thread(knowledge_ready.wait)
+    return current_knowledge()
+
+# Seconds between checks of history_data.json / .kb for changes (0 disables the watcher)
+KNOWLEDGE_WATCH_INTERVAL = float(os.getenv("KNOWLEDGE_WATCH_INTERVAL", "5"))
+# When set, POST /admin/reload requires this value in the X-Admin-Token header
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def knowledge_changed():
+    return _source_mtimes() != knowledge_mtimes
+
+def _log_reload(snapshot):
+    retokenized = ""
+    if snapshot.source == "json":
+        retokenized = f", {snapshot.retriever.tokenized}/{len(snapshot.retriever.chunks)} chunks re-tokenized"
+    print(f"Knowledge reloaded: v{snapshot.version} from {snapshot.source} in {snapshot.load_seconds * 1000:.1f} ms{retokenized}")
+
+async def reload_knowledge():
+    """Loads and indexes the data off the event loop, then swaps the snapshot in one assignment."""
+    global knowledge, knowledge_mtimes, knowledge_error
+    if not knowledge_ready.is_set():
+        await asyncio.to_thread(knowledge_ready.wait)
+    async with reload_lock:
+        mtimes = _source_mtimes()
+        previous = knowledge
+        snapshot = await asyncio.to_thread(load_knowledge, previous.version + 1 if previous else 1, previous)
+        knowledge, knowledge_mtimes, knowledge_error = snapshot, mtimes, None
+    clear_answer_caches(snapshot)
+    _log_reload(snapshot)
+    return snapshot
+
+def reload_knowledge_now():
+    """Blocking reload for the pre-fork parent, which has no event loop; the workers are replaced after it."""
+    global knowledge, knowledge_mtimes
+    current_knowledge()
+    mtimes = _source_mtimes()
+    knowledge, knowledge_mtimes = load_knowledge(knowledge.version + 1, knowledge), mtimes
+    clear_answer_caches(knowledge)
+    _log_reload(knowledge)
+
+async def flush_metrics():
+    """Pre-fork worker: keeps this worker's snapshot in the shared metrics directory current."""
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+        await asyncio.to_thread(metrics.write_snapshot, metrics.snapshot())
+
+async def watch_knowledge():
+    while True:
+        await asyncio.sleep(KNOWLEDGE_WATCH_INTERVAL)
+        if knowledge_ready.is_set() and knowledge_changed():
+            try:
+                await reload_knowledge()
+            except Exception as e:
+                print(f"Knowledge reload failed, keeping v{knowledge.version if knowledge else 0}: {str(e)}")
+
+# Ranked candidates considered per prompt; the marks-tier token budget decides how many are kept
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "24"))
+
+# Outbound connection pool per provider: size, idle connections kept alive (and for how long),
+# HTTP/2 (when h2 is installed), and connect/read timeouts (read: longest gap between streamed chunks).
+# The limits default to the SDKs' own; against the local mock a pool sized to LLM_MAX_CONCURRENCY with
+# longer keep-alive was slower (bench_provider_pool.py), so tune it only on a measured TLS saving
+def connection_pool(name):
+    return ConnectionPool(
+        name,
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "5")),
+        http2=os.getenv("HTTP2", "0") == "1",
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+    )
+
+groq_pool = connection_pool("groq")
+hf_pool = connection_pool("huggingface")
+
+# Initialize LLM clients (async, so a slow generation never blocks the event loop). The SDKs are
+# imported and the clients built on first use; warm_providers() builds the primary one in the background.
+def make_groq_client():
+    import httpx
+    from groq import AsyncGroq, DefaultAsyncHttpxClient
+    timeout = groq_pool.timeout(httpx)
+    http_client = DefaultAsyncHttpxClient(transport=groq_pool.bind(httpx), timeout=timeout)
+    return AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), timeout=timeout, http_client=http_client)
+
+def make_hf_client():
+    import httpx2
+    from huggingface_hub import AsyncInferenceClient, set_async_client_factory
+    # Keep the hooks of huggingface_hub's own session (request ids, offline mode) on the pooled one. They are
+    # read from the module its default factory uses: calling get_async_session() would open a client to copy them
+    from huggingface_hub.utils._http import async_hf_request_event_hook, async_hf_response_event_hook
+    hooks = {"request": [async_hf_request_event_hook], "response": [async_hf_response_event_hook]}
+    set_async_client_factory(lambda: httpx2.AsyncClient(transport=hf_pool.bind(httpx2), event_hooks=hooks,
+                                                        follow_redirects=True))
+    return AsyncInferenceClient(token=os.getenv("HF_API_KEY"), timeout=hf_pool.timeout(httpx2))
+
+groq_client = LazyClient(make_groq_client) if os.getenv("GROQ_API_KEY") else None
+hf_client = LazyClient(make_hf_client) if os.getenv("HF_API_KEY") else None
+
+def warm_providers():
+    """Builds the client the first answer will use. The fallback's SDK (huggingface_hub, the larger
+    import) is left to its first use, so it does not compete with early requests for the CPU."""
+    client = groq_client or hf_client
+    if client is not None:
+        try:
+            client.resolve()
+        except Exception as e:
+            print(f"Provider client setup failed: {str(e)}")
+
+def build_router(groq_client, hf_client):
+    """Groq first, Hugging Face second; hedging, deadlines and breakers configured from the environment."""
+    def breaker():
+        return CircuitBreaker(int(os.getenv("BREAKER_FAILURES", "5")), float(os.getenv("BREAKER_RESET_SECONDS", "30")))
+    def limiter(env):
+        # Requests per minute allowed to the provider (unset or 0: unlimited)
+        per_minute = int(os.getenv(env, "0"))
+        return RateLimiter(worker_share(per_minute)) if per_minute > 0 else None
+    providers = []
+    if groq_client:
+        providers.append(GroqProvider(groq_client, deadline=float(os.getenv("GROQ_DEADLINE_SECONDS", "60")),
+                                      breaker=breaker(), limiter=limiter("GROQ_RPM"), pool=groq_pool))
+    if hf_client:
+        providers.append(HuggingFaceProvider(hf_client, model=os.getenv("HF_MODEL", HF_MODEL),
+                                             deadline=float(os.getenv("HF_DEADLINE_SECONDS", "90")),
+                                             breaker=breaker(), limiter=limiter("HF_RPM"), pool=hf_pool))
+    fixed_delay = os.getenv("HEDGE_DELAY_MS")
+    return ProviderRouter(
+        providers,
+        hedge=os.getenv("HEDGE_REQUESTS", "0") == "1",
+        hedge_delay=float(fixed_delay) / 1000 if fixed_delay else None,
+        hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "0.95")),
+    )
+
+router = build_router(groq_client, hf_client)
+
+# First knowledge load (see KNOWLEDGE_PRELOAD), started once everything it may warm exists
+knowledge_loader = None
+if KNOWLEDGE_PRELOAD == "eager":
+    _initial_load()
+else:
+    knowledge_loader = threading.Thread(target=_initial_load, name="knowledge-load", daemon=True)
+    knowledge_loader.start()
+
+# Upper bound on provider calls in flight; extra requests queue in marks lanes (4-mark questions first)
+# and get 429 + Retry-After once the expected wait exceeds QUEUE_MAX_WAIT seconds
+LLM_MAX_CONCURRENCY = int(worker_share(int(os.getenv("LLM_MAX_CONCURRENCY", "32"))))
+llm_gate = PriorityGate(
+    LLM_MAX_CONCURRENCY,
+    lane_delays=tuple(float(x) for x in os.getenv("QUEUE_LANE_DELAYS", "0,2,5").split(",")),
+    max_queue=int(worker_share(int(os.getenv("QUEUE_MAX_DEPTH", "256")))),
+    max_wait=float(os.getenv("QUEUE_MAX_WAIT", "30")),
+    quota_wait=lambda calls: router.quota_wait(calls),
+    metrics=metrics,
+)
+metrics.queue_depth.collect = lambda: {(lane,): depth for lane, depth in zip(LANES, llm_gate.depth)}
+
+# Per-client token bucket (X-API-Key, else client IP); CLIENT_RPM=0 disables it. Per worker (see WEB_WORKERS)
+CLIENT_RPM = int(os.getenv("CLIENT_RPM", "60"))
+client_limiter = ClientRateLimiter(CLIENT_RPM, int(os.getenv("CLIENT_BURST", "20"))) if CLIENT_RPM > 0 else None
+# Only behind a proxy that sets X-Forwarded-For; otherwise clients could pick their own identity
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+
+def client_id(request):
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return "key:" + api_key
+    forwarded = request.headers.get("x-forwarded-for")
+    if TRUST_FORWARDED_FOR and forwarded:
+        return "ip:" + forwarded.split(",")[0].strip()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+async def rate_limit(request: Request):
+    if client_limiter is None:
+        return
+    wait = client_limiter.hit(client_id(request))
+    if wait:
+        if metrics.mode != "off":
+            metrics.rejected.inc("client_rate")
+        raise HTTPException(status_code=429, detail="Too many requests from this client",
+                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=429, headers={"Retry-After": str(exc.retry_after)})
+
+# Answer cache for repeat questions (set ANSWER_CACHE_MAX_BYTES=0 to disable)
+answer_cache = AnswerCache(
+    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+    db_path=os.getenv("ANSWER_CACHE_DB") or None,
+)
 
-def get_subject_context(query):
-    """Focused RAG logic for Cambridge History"""
-    context = ""
+# Optional paraphrase cache, enabled by setting SEMANTIC_CACHE_THRESHOLD (cosine, e.g. 0.92)
+semantic_cache = None
+if os.getenv("SEMANTIC_CACHE_THRESHOLD"):
+    from semantic_cache import SemanticCache
+    semantic_cache = SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD")),
+        capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+        search=os.getenv("SEMANTIC_CACHE_SEARCH", "brute"),
+    )
+
+def get_subject_context(query, marks=4):
+    """Focused RAG logic for Cambridge History: best BM25 chunks packed into the marks-tier token budget.
+    Returns (context, usage) where usage reports the context size."""
+    snapshot = current_knowledge()  # read once, so a concurrent reload can't mix two generations
     query_lower = query.lower()
-    data = history_data
-    matches = []
-    marking_examples = []
-        
-    specific_topics = data.get("specific_topics", {})
-    topic_lower_words = set(re.findall(r'\w+', query_lower))
-    
-    for key, topic_data in specific_topics.items():
-        key_words = set(key.split('_'))
-        common = topic_lower_words.intersection(key_words)
-        match = False
-        if len(key_words) == 1 and len(common) == 1: match = True
-        elif len(common) >= 2: match = True
-        elif any(date in query_lower for date in re.findall(r'\d{4}', key)): match = True
-            
-        if match:
-            context += f"\n### TEXTBOOK CONTEXT: {topic_data.get('title', key)} (Nigel Kelly Standards)\n"
-            if "factors" in topic_data:
-                for factor, points in topic_data["factors"].items():
-                    context += f"**{factor}**:\n"
-                    for p in points: context += f"- {p}\n"
-            if "qa_pairs" in topic_data:
-                context += "\n**Relevant Past Questions & Answers:**\n"
-                for qa in topic_data["qa_pairs"][:3]:
-                    context += f"Q: {qa['question']}\nA: {qa['answer']}\n\n"
-            if "raw_text" in topic_data:
-                 context += f"{topic_data['raw_text'][:1000]}...\n"
-            context += "\n"
-    
-    for section in ["section_1", "section_2", "section_3"]:
-        for item in data.get(section, []):
-            topic = item.get("topic", "").lower()
-            if topic in query_lower or any(kw in query_lower for kw in topic.split() if len(kw) > 3):
-                matches.append(json.dumps(item, indent=2))
-        
-    past_papers = data.get("past_papers", {})
-    for year, seasons in past_papers.items():
-        for season, papers in seasons.items():
-            for paper, content in papers.items():
-                mark_schemes = content.get("mark_scheme", [])
-                for scheme in mark_schemes:
-                    question = scheme.get("question", "")
-                    points = scheme.get("points", [])
-                    if any(word in question.lower() for word in query_lower.split() if len(word) > 4):
-                        marking_examples.append({"year": year, "question": question, "points": points[:5]})
-        
-    if matches:
-        context += "\n### O-LEVEL HISTORY ARCHIVE:\n" + "\n---\n".join(matches[:2])
-    
-    if marking_examples:
-        context += "\n\n### CAMBRIDGE EXAMINER MARKING SCHEMES:\n"
-        for example in marking_examples[:2]:
-            context += f"\n**Question: {example['question']}**\n"
-            for point in example['points']: context += f"  • {point}\n"
-            
-    return context
+    budget = token_budget(marks)
+
+    # Topics named in the question (key words / years) outrank incidental mentions
+    # Mark schemes only from the tier being answered (its rubric is the one the examiner applies)
+    # and on the question's topics or words, looked up in the index's by-tier / by-topic groups
+    topics = snapshot.index.match_topics(query_lower)
+    schemes = snapshot.index.match_schemes(query_lower, marks_tier(marks), topics)
+    ranked = snapshot.retriever.top_k(query, k=CONTEXT_TOP_K, boost_keys=topics,
+                                      schemes={(s.key, s.question) for s in schemes})
+    packed, _ = pack_context(ranked, budget)
+    context = render_context(packed)
+
+    usage = {
+        "context_budget": budget,
+        "context_chunks": len(packed),
+        "context_tokens": estimate_tokens(context),
+        "knowledge_version": snapshot.version,
+    }
+    return context, usage
+
+async def lookup_answer(prompt, marks, context, usage):
+    """Exact cache, then (if enabled) the semantic cache. Returns (cache key, answer or None)."""
+    key = cache_key(prompt, marks, context)
+    version = usage["knowledge_version"]
+    cached = await answer_cache.aget(key, version)
+    if cached is None and semantic_cache is not None:
+        cached, similarity = semantic_cache.lookup(prompt, marks, version)
+        if cached is not None:
+            usage["cache_similarity"] = round(similarity, 4)
+    usage["cached"] = cached is not None
+    return key, cached
+
+def cache_source(usage):
+    return "semantic_cache" if "cache_similarity" in usage else "cache"
+
+def remember_answer(key, prompt, marks, answer, version):
+    answer_cache.put(key, answer, version)
+    if semantic_cache is not None:
+        semantic_cache.add(prompt, marks, answer, version)
+
+def clear_answer_caches(snapshot):
+    """Drops the answers of earlier knowledge versions; they were generated from data that has changed."""
+    answer_cache.clear(snapshot.version)
+    if semantic_cache is not None:
+        semantic_cache.clear(snapshot.version)
+
+# Identical questions (normalized query + marks) arriving while one is being answered share its
+# retrieval and provider call; COALESCE_REQUESTS=0 gives every request its own
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+inflight = SingleFlight()
+
+def flight_key(prompt, marks):
+    return (normalize_query(prompt), marks) if COALESCE_REQUESTS else None
+
+async def produce_answer(flight, prompt, marks):
+    """
+    Everything a question needs done once, however many requests are waiting
+    for it: retrieval, cache lookup and one provider stream. Publishes meta
+    (usage) and token (raw text) events; returns (answer, provider, usage,
+    context chars), with provider None and the error message as the answer
+    if the engines failed.
+    """
+    trace = current_trace()
+    await knowledge_loaded()
+    with trace.span("retrieval"):
+        context, usage = get_subject_context(prompt, marks)
+    with trace.span("cache_lookup"):
+        key, cached = await lookup_answer(prompt, marks, context, usage)
+    if cached is not None:
+        provider = cache_source(usage)
+        trace.answered(provider, completion_tokens=estimate_tokens(cached), context_chars=len(context))
+        flight.publish("meta", usage)
+        flight.publish("token", cached)
+        return cached, provider, usage, len(context)
+
+    with trace.span("prompt_assembly"):
+        system_prompt = answer_prompt(marks)
+        context_block = context_message(context)
+        usage["prompt_tokens"] = estimate_tokens(system_prompt) + estimate_tokens(context_block) + estimate_tokens(prompt)
+    flight.publish("meta", usage)
+
+    parts = []
+    provider = None
+    queued = time.perf_counter()
+    try:
+        async with llm_gate.slot(marks):
+            trace.observe("queue_wait", time.perf_counter() - queued)
+            async for provider, text in router.stream(system_prompt, prompt, marks, context_block):
+                parts.append(text)
+                flight.publish("token", text)
+        answer = "".join(parts)
+    except Overloaded:
+        raise
+    except ProvidersUnavailable as e:
+        answer, provider = str(e), None
+    except Exception as e:
+        answer, provider = f"Error with all intelligence engines: {str(e)}", None
+    # Only real answers are cached, never the "engines offline" messages
+    if provider:
+        remember_answer(key, prompt, marks, answer, usage["knowledge_version"])
+    trace.answered(provider, usage["prompt_tokens"], estimate_tokens(answer) if provider else 0, len(context))
+    return answer, provider, usage, len(context)
+
+def join_answer(prompt, marks):
+    """Returns (flight, leader): a new flight for this question, or the one already answering it."""
+    return inflight.join(flight_key(prompt, marks), lambda flight: produce_answer(flight, prompt, marks))
+
+def follower_answered(answer, provider, context_chars):
+    # The leader's trace already counted the provider call; followers are counted as coalesced answers
+    current_trace().answered("coalesced" if provider else None,
+                             completion_tokens=estimate_tokens(answer) if provider else 0, context_chars=context_chars)
 
 async def get_llm_response(prompt: str, marks: int = 4, mode: str = "chat"):
-    context = get_subject_context(prompt)
-    system_prompt = f"""
-You are the Cambridge History Examiner Simulation Engine (Syllabus 2059/01).
-
-===== NON-NEGOTIABLE EXAMINER RULES =====
-
-STEP 1 — QUESTION TYPE DETECTION
-Detect:
-• command word
-• topic
-• personality vs event
-
-STEP 2 — PERSONALITY BIO RULE
-If a named individual appears:
-START answer with:
-• Full name
-• Birth–death years
-• Role/title
-• Movement association
-
-STEP 3 — MARK STRUCTURE ENFORCEMENT
-
-4 MARK:
-• EXACTLY TWO reasons
-• Each reason = POINT → EVIDENCE(date/event) → EXPLANATION
-• NO evaluation
-• NO comparison
-• NO conclusion
-
-7 MARK:
-• THREE developed reasons
-• No sustained judgement
-
-14 MARK:
-• INTRODUCTION
-• AGREE (max 2 paragraphs)
-• DISAGREE (≥3 developments chronological)
-• FINAL JUDGEMENT
-• Sustained comparison required
-
-If violated → internally regenerate.
-
-STEP 4 — NIGEL KELLY EVIDENCE CONTROL
-Only use evidence from CONTEXT.
-Every paragraph must include:
-• named event
-• date
-• Pakistan Movement linkage (if relevant)
-
-STEP 5 — LENGTH NORMALISER
-Target:
-4m → ~120 words
-7m → ~240 words
-14m → ~500 words
-
-Trim or extend silently.
-
-STEP 6 — EXAMINER BAND GENERATOR
-
-Use rubric:
-
-4m:
-2 reasons complete → 4
-1 developed → 2–3
-simple list → 1
-
-7m:
-3 developed → 6–7
-2 developed → 4–5
-descriptive → 2–3
-
-14m:
-evaluation + comparison → 12–14
-some judgement → 8–11
-narrative → 4–7
-
-STEP 7 — EXAMINER AUDIT FORMAT
-Append ONLY:
-
-[EXAMINER AUDIT: X/{marks}]
-Band Level: L?
-Reason: concise examiner rationale
-
-STEP 8 — TONE
-Formal Cambridge examiner.
-
-STEP 9 — FAILSAFE
-If uncertain → default to 4m rules.
-
-===== CONTEXT =====
-{context}
-"""
-    # Try Groq first (Primary)
-    if groq_client:
-        try:
-            completion = groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Answer for {marks} marks: {prompt}"}
-                ],
-                temperature=0.3,
-                max_tokens=2500
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            print(f"Groq Error: {str(e)}. Falling back to secondary engine...")
-
-    # Fallback to Hugging Face (Secondary)
-    if hf_client:
+    """Returns (answer, usage) with estimated context and prompt token counts."""
+    flight, leader = join_answer(prompt, marks)
+    answer, provider, usage, context_chars = await flight.wait()
+    if not leader:
+        follower_answered(answer, provider, context_chars)
+    return answer, dict(usage, coalesced=not leader)
+
+async def stream_llm_response(prompt: str, marks: int = 4):
+    """
+    SSE events for one question: meta (usage) first, then token events as the
+    provider streams, then audit (parsed STEP 7 footer) and done (full answer).
+    A coalesced follower replays the leader's events from the start.
+    """
+    flight, leader = join_answer(prompt, marks)
+    splitter = AuditSplitter()
+    try:
+        async for kind, value in flight.follow():
+            if kind == "meta":
+                yield sse_event("meta", {"marks": marks, "usage": dict(value, coalesced=not leader)})
+                continue
+            visible = splitter.feed(value)
+            if visible:
+                yield sse_event("token", {"text": visible})
+    except Overloaded as e:
+        yield sse_event("error", {"message": str(e), "retry_after": e.retry_after})
+        return
+    answer, provider, usage, context_chars = flight.result
+    if not leader:
+        follower_answered(answer, provider, context_chars)
+    if not provider:
+        yield sse_event("error", {"message": answer})
+        return
+    rest = splitter.flush()
+    if rest:
+        yield sse_event("token", {"text": rest})
+    yield sse_event("audit", parse_audit(answer))
+    yield sse_event("done", {"answer": answer, "provider": provider, "usage": dict(usage, coalesced=not leader)})
+
+# /batch: items per request, and grading calls in flight per batch (the global LLM limit still applies)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+class BatchItem(BaseModel):
+    query: str
+    marks: int = 4
+    student_answer: str
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+async def grade_answer(item, context, context_block, usage):
+    """Grades one student answer against a shared context. Returns the result payload."""
+    trace = current_trace()
+    system_prompt = grading_prompt(item.marks)
+    prompt = f"{item.query}\n\nSTUDENT ANSWER:\n{item.student_answer}"
+    usage = dict(usage, prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(context_block) + estimate_tokens(prompt))
+    key = cache_key(prompt, item.marks, system_prompt + context_block)
+    answer = await answer_cache.aget(key, usage["knowledge_version"])
+    provider = "cache" if answer is not None else None
+    if answer is None:
         try:
-            return hf_client.text_generation(
-                f"<|system|>\n{system_prompt}\n<|user|>\nAnswer for {marks} marks: {prompt}\n<|assistant|>",
-                model="Qwen/Qwen2.5-72B-Instruct",
-                max_new_tokens=2000
-            )
+            async with llm_gate.slot(item.marks):
+                answer, provider = await router.complete(system_prompt, prompt, item.marks, context_block)
+        except Overloaded as e:
+            usage["cached"] = False
+            return {"query": item.query, "marks": item.marks, "error": str(e),
+                    "retry_after": e.retry_after, "usage": usage}
+        except ProvidersUnavailable as e:
+            answer = str(e)
         except Exception as e:
-            return f"Error with all intelligence engines: {str(e)}"
-    
-    return "Intelligence engines offline. Please check API keys."
-
-@app.post("/ask-ai")
+            answer = f"Error with all intelligence engines: {str(e)}"
+        if provider:
+            answer_cache.put(key, answer, usage["knowledge_version"])
+    trace.answered(provider, usage["prompt_tokens"] if provider != "cache" else 0,
+                   estimate_tokens(answer) if provider else 0, len(context))
+    usage["cached"] = provider == "cache"
+    if not provider:
+        return {"query": item.query, "marks": item.marks, "error": answer, "usage": usage}
+    return {"query": item.query, "marks": item.marks, "provider": provider,
+            "audit": parse_audit(answer), "feedback": answer, "usage": usage}
+
+async def stream_batch(items):
+    """
+    SSE events for a batch: meta first, then one result event per item in
+    completion order (with its index in the request), then done.
+    Retrieval and the context message are built once per distinct question.
+    """
+    trace = current_trace()
+    start = time.perf_counter()
+    shared = {}
+    await knowledge_loaded()
+    with trace.span("retrieval"):
+        for item in items:
+            k = (normalize_query(item.query), item.marks)
+            if k not in shared:
+                context, usage = get_subject_context(item.query, item.marks)
+                shared[k] = (context, context_message(context), usage)
+    yield sse_event("meta", {"items": len(items), "distinct_questions": len(shared)})
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def run(index, item):
+        context, context_block, usage = shared[(normalize_query(item.query), item.marks)]
+        async with semaphore:
+            return index, await grade_answer(item, context, context_block, usage)
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    errors = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            if "error" in result:
+                errors += 1
+            yield sse_event("result", {"index": index, **result})
+    finally:
+        # The client went away mid-batch: don't keep grading for nobody
+        for task in tasks:
+            task.cancel()
+    yield sse_event("done", {"items": len(items), "errors": errors,
+                             "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+@app.post("/batch", dependencies=[Depends(rate_limit)])
+async def batch(request: BatchRequest):
+    current_trace().mark("form_parsing")
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to grade")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    llm_gate.check()
+    return StreamingResponse(
+        stream_batch(request.items),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/ask-ai", dependencies=[Depends(rate_limit)])
 async def ask_ai(
     query: str = Form(...),
     marks: int = Form(4)
 ):
-    answer = await get_llm_response(query, marks)
-    return {"answer": answer, "marks": marks}
+    current_trace().mark("form_parsing")
+    answer, usage = await get_llm_response(query, marks)
+    return {"answer": answer, "marks": marks, "usage": usage}
+
+@app.post("/ask-ai/stream", dependencies=[Depends(rate_limit)])
+async def ask_ai_stream(
+    query: str = Form(...),
+    marks: int = Form(4)
+):
+    current_trace().mark("form_parsing")
+    # Refuse up front while the status can still be 429; a later queue timeout arrives as an error event.
+    # A question already being answered needs no slot of its own.
+    if flight_key(query, marks) not in inflight.flights:
+        llm_gate.check()
+    return StreamingResponse(
+        stream_llm_response(query, marks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if prefork.in_worker():
+        # The parent reloads once and replaces every worker; this one answers with the data it still has
+        prefork.request_reload()
+        return {**(await knowledge_loaded()).info(), "workers_restarting": True}
+    try:
+        snapshot = await reload_knowledge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, keeping v{knowledge.version if knowledge else 0}: {str(e)}")
+    return snapshot.info()
+
+@app.get("/admin/knowledge")
+async def admin_knowledge():
+    return (await knowledge_loaded()).info()
+
+@app.get("/ready")
+async def ready():
+    """200 once the knowledge base is loaded and indexed, 503 while it is still loading (or failed)."""
+    body = {
+        "ready": knowledge is not None,
+        "knowledge": knowledge.info() if knowledge is not None else None,
+        "error": knowledge_error,
+        "providers": {name: client.built for name, client in (("groq", groq_client), ("huggingface", hf_client))
+                      if client is not None},
+    }
+    return JSONResponse(body, status_code=200 if knowledge is not None else 503)
+
+@app.get("/providers/stats")
+async def providers_stats():
+    return router.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if metrics.shared_dir:
+        body = await asyncio.to_thread(metrics.render_shared, metrics.snapshot())
+    else:
+        body = metrics.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return {
+        "queue": llm_gate.stats(),
+        "client_rate_limit": {
+            "per_minute": CLIENT_RPM,
+            "tracked_clients": len(client_limiter.buckets) if client_limiter else 0,
+        },
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = answer_cache.stats()
+    stats["semantic"] = semantic_cache.stats() if semantic_cache is not None else None
+    stats["coalescing"] = inflight.stats()
+    return stats
+
+PORT = int(os.getenv("PORT", "8000"))
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+    if WEB_WORKERS > 1:
+        # The workers are forked with the loaded snapshot. Wait for the loader thread itself, not just
+        # knowledge_ready: its provider warm-up may still hold the import lock or LazyClient.lock,
+        # and a worker forked then would inherit the lock held and hang on its first provider call
+        if knowledge_loader is not None:
+            knowledge_loader.join()
+        current_knowledge()
+        import shutil
+        import tempfile
+        metrics.share(tempfile.mkdtemp(prefix="history-metrics-"))
+        try:
+            prefork.serve(app, "0.0.0.0", PORT, WEB_WORKERS, reload=reload_knowledge_now,
+                          watch=knowledge_changed, watch_interval=KNOWLEDGE_WATCH_INTERVAL)
+        finally:
+            shutil.rmtree(metrics.shared_dir, ignore_errors=True)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,356 @@
+"""
+Request timing spans and Prometheus-format metrics for /ask-ai.
+
+A Trace is started per request by MetricsMiddleware and kept in a context
+variable, so any code on the request path (retrieval, prompt assembly, the
+provider router) can reach it with current_trace() without threading it
+through every signature.
+
+Modes (METRICS_MODE):
+  full     every request records its stage spans
+  sampled  stage spans for one request in every sample_every; the counters,
+           token/context histograms and end-to-end latency are still recorded
+           for all requests, so totals stay exact
+  off      nothing is recorded and /metrics is empty
+
+Pre-fork workers each record into their own Metrics. With a shared
+directory (Metrics.share, set by the parent before forking), every worker
+writes a snapshot of its counters and histograms there, and /metrics on
+any worker renders the sum over all of them, so a scrape covers the whole
+server whichever worker answers it. Snapshots of workers that have exited
+are kept, so counters never go backwards; gauges only count live workers.
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000)
+CHAR_BUCKETS = (1000, 2000, 4000, 6000, 8000, 12000, 16000, 24000)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def snapshot(self):
+        return [[list(labelvalues), value] for labelvalues, value in self.values.items()]
+
+    def merge(self, snapshot):
+        for labelvalues, value in snapshot:
+            self.inc(*labelvalues, amount=value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time from collect(), a callable returning {labelvalues tuple: value}."""
+
+    def __init__(self, name, help, labelnames=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def snapshot(self):
+        return [[list(labelvalues), value] for labelvalues, value in (self.collect() if self.collect else {}).items()]
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if values is None:
+            values = self.collect() if self.collect else {}
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self.series = {}  # labelvalues -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, value, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def snapshot(self):
+        return [[list(labelvalues), list(counts), total] for labelvalues, (counts, total) in self.series.items()]
+
+    def merge(self, snapshot):
+        for labelvalues, counts, total in snapshot:
+            series = self.series.setdefault(tuple(labelvalues), [[0] * (len(self.buckets) + 1), 0.0])
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labelvalues, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labelvalues + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Span:
+    __slots__ = ("trace", "stage", "start")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.observe(self.stage, time.perf_counter() - self.start)
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Trace:
+    __slots__ = ("metrics", "start", "sampled")
+
+    def __init__(self, metrics, sampled):
+        self.metrics = metrics
+        self.start = time.perf_counter()
+        self.sampled = sampled
+
+    def span(self, stage):
+        return Span(self, stage) if self.sampled else NULL_SPAN
+
+    def mark(self, stage):
+        """Records the time from the start of the request to now as stage."""
+        if self.sampled:
+            self.metrics.stage_seconds.observe(time.perf_counter() - self.start, stage)
+
+    def observe(self, stage, seconds):
+        if self.sampled:
+            self.metrics.stage_seconds.observe(seconds, stage)
+
+    def provider_timing(self, provider, ttft, total):
+        if self.sampled:
+            self.metrics.ttft_seconds.observe(ttft, provider)
+            self.metrics.generation_seconds.observe(total, provider)
+
+    def provider_failed(self, provider):
+        self.metrics.provider_failures.inc(provider)
+
+    def answered(self, provider, prompt_tokens=0, completion_tokens=0, context_chars=0):
+        m = self.metrics
+        m.answers.inc(provider or "none")
+        m.context_chars.observe(context_chars)
+        if prompt_tokens:
+            m.prompt_tokens.observe(prompt_tokens)
+            m.prompt_tokens_total.inc(amount=prompt_tokens)
+        if completion_tokens:
+            m.completion_tokens.observe(completion_tokens)
+            m.completion_tokens_total.inc(amount=completion_tokens)
+
+
+class NullTrace:
+    """Stand-in used outside a traced request and when metrics are off."""
+    sampled = False
+
+    def span(self, stage):
+        return NULL_SPAN
+
+    def mark(self, stage):
+        pass
+
+    def observe(self, stage, seconds):
+        pass
+
+    def provider_timing(self, provider, ttft, total):
+        pass
+
+    def provider_failed(self, provider):
+        pass
+
+    def answered(self, provider, prompt_tokens=0, completion_tokens=0, context_chars=0):
+        pass
+
+
+NULL_TRACE = NullTrace()
+_current = ContextVar("trace", default=NULL_TRACE)
+
+
+def current_trace():
+    return _current.get()
+
+
+class Metrics:
+    def __init__(self, mode="full", sample_every=10):
+        if mode not in ("full", "sampled", "off"):
+            raise ValueError(f"METRICS_MODE must be full, sampled or off, not {mode!r}")
+        self.mode = mode
+        self.sample_every = max(1, sample_every)
+        self.requests_seen = 0
+        self.shared_dir = None
+
+        self.request_seconds = Histogram("ask_ai_request_seconds", "End-to-end request latency.",
+                                         SECONDS_BUCKETS, ("path", "status"))
+        self.stage_seconds = Histogram("ask_ai_stage_seconds", "Time spent in each stage of a request.",
+                                       SECONDS_BUCKETS, ("stage",))
+        self.ttft_seconds = Histogram("llm_time_to_first_token_seconds",
+                                      "Provider call start to first answer token, including fallback.",
+                                      SECONDS_BUCKETS, ("provider",))
+        self.generation_seconds = Histogram("llm_generation_seconds", "Provider call start to last answer token.",
+                                            SECONDS_BUCKETS, ("provider",))
+        self.prompt_tokens = Histogram("ask_ai_prompt_tokens", "Estimated prompt tokens per provider call.",
+                                       TOKEN_BUCKETS)
+        self.completion_tokens = Histogram("ask_ai_completion_tokens", "Estimated completion tokens per answer.",
+                                           TOKEN_BUCKETS)
+        self.context_chars = Histogram("ask_ai_context_chars", "Retrieved context size in characters.",
+                                       CHAR_BUCKETS)
+        self.answers = Counter("ask_ai_answers_total", "Answers by the provider (or cache) that produced them.",
+                               ("provider",))
+        self.provider_failures = Counter("llm_provider_failures_total", "Provider calls that failed.",
+                                         ("provider",))
+        self.prompt_tokens_total = Counter("ask_ai_prompt_tokens_total", "Estimated prompt tokens sent.")
+        self.completion_tokens_total = Counter("ask_ai_completion_tokens_total", "Estimated completion tokens received.")
+        self.queue_wait = Histogram("ask_ai_queue_wait_seconds", "Time waiting for a provider slot, by marks lane.",
+                                    SECONDS_BUCKETS, ("lane",))
+        self.queue_depth = Gauge("ask_ai_queue_depth", "Requests waiting for a provider slot, by marks lane.",
+                                 ("lane",))
+        self.rejected = Counter("ask_ai_rejected_total", "Requests refused with 429, by reason.", ("reason",))
+
+    def start_trace(self):
+        if self.mode == "off":
+            return NULL_TRACE
+        self.requests_seen += 1
+        return Trace(self, self.mode == "full" or self.requests_seen % self.sample_every == 0)
+
+    def all(self):
+        return (self.request_seconds, self.stage_seconds, self.ttft_seconds, self.generation_seconds,
+                self.prompt_tokens, self.completion_tokens, self.context_chars, self.answers,
+                self.provider_failures, self.prompt_tokens_total, self.completion_tokens_total,
+                self.queue_wait, self.queue_depth, self.rejected)
+
+    def render(self):
+        if self.mode == "off":
+            return ""
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def share(self, directory):
+        """Aggregates /metrics over every process that records into directory (see the module docstring)."""
+        os.makedirs(directory, exist_ok=True)
+        self.shared_dir = directory
+
+    def snapshot(self):
+        """This process's values, as written to the shared directory. Taken on the thread that records them."""
+        return {"pid": os.getpid(), "metrics": {metric.name: metric.snapshot() for metric in self.all()}}
+
+    def write_snapshot(self, snapshot):
+        path = os.path.join(self.shared_dir, f"{snapshot['pid']}.json")
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".part", path)
+
+    def render_shared(self, own):
+        """Writes own (this process's snapshot()) and renders the sum of every snapshot in the shared directory."""
+        if self.mode == "off":
+            return ""
+        self.write_snapshot(own)
+        total = Metrics(self.mode)
+        gauges = {metric.name: {} for metric in total.all() if isinstance(metric, Gauge)}
+        for filename in os.listdir(self.shared_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.shared_dir, filename), "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = snapshot["pid"] == own["pid"] or _alive(snapshot["pid"])
+            for metric in total.all():
+                values = snapshot["metrics"].get(metric.name, [])
+                if not isinstance(metric, Gauge):
+                    metric.merge(values)
+                elif alive:
+                    for labelvalues, value in values:
+                        labelvalues = tuple(labelvalues)
+                        gauges[metric.name][labelvalues] = gauges[metric.name].get(labelvalues, 0) + value
+        lines = []
+        for metric in total.all():
+            lines.extend(metric.render(gauges[metric.name]) if isinstance(metric, Gauge) else metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsMiddleware:
+    """ASGI middleware that starts a Trace for requests to the given paths and records their total latency."""
+
+    def __init__(self, app, metrics, paths):
+        self.app = app
+        self.metrics = metrics
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or self.metrics.mode == "off":
+            return await self.app(scope, receive, send)
+
+        trace = self.metrics.start_trace()
+        token = _current.set(trace)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self.metrics.request_seconds.observe(time.perf_counter() - trace.start, scope["path"], str(status[0]))
@@ -0,0 +1,122 @@
+"""Sentence-aligned, overlapping passages over the specific_topics raw_text."""
+
+import re
+from array import array
+from bisect import bisect_right
+
+from context import estimate_tokens
+
+# Target passage length and how much trailing text (whole sentences) the next passage repeats
+PASSAGE_CHARS = 700
+PASSAGE_OVERLAP = 160
+
+# A sentence ends at ./!/? (plus closing quotes/brackets) before a capitalised word, or at a
+# line break before a bullet, a numbered point or a Q:/Ans./Source line of the notes
+SENTENCE_END_RE = re.compile(
+    r'[.!?]["”’)]*\s+(?=[A-Z“"‘(])'
+    r'|\n(?=\s*(?:[\uf0b7\uf0d8•▪\-–]|[IVX]+\.|\d+[.)]|Q[.:]|Ans\b|Source\b))'
+)
+# "I." / "2)" on their own: the marker of a numbered point, not a sentence
+LIST_MARKER_RE = re.compile(r'\s*(?:[IVX]+|\d+|[a-z])[.)]\s*')
+# pdfplumber pages joined with form feeds, when the ingestion kept them
+PAGE_BREAK = "\f"
+
+
+def sentence_spans(text):
+    """(start, end) of every sentence, whitespace trimmed; sentences longer than PASSAGE_CHARS are cut at spaces."""
+    spans = []
+    start = 0
+    for m in SENTENCE_END_RE.finditer(text):
+        if LIST_MARKER_RE.fullmatch(text, start, m.end()):
+            continue
+        spans.extend(_trimmed(text, start, m.end()))
+        start = m.end()
+    spans.extend(_trimmed(text, start, len(text)))
+    return spans
+
+
+def _trimmed(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    pieces = []
+    while end - start > PASSAGE_CHARS:
+        cut = text.rfind(" ", start + 1, start + PASSAGE_CHARS)
+        cut = cut if cut > start else start + PASSAGE_CHARS
+        pieces.append((start, cut))
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if end > start:
+        pieces.append((start, end))
+    return pieces
+
+
+def parse_page_range(page_range):
+    """'7-12' -> (7, 12); None when the topic has no usable page_range."""
+    try:
+        first, _, last = str(page_range).partition("-")
+        first = int(first)
+        return first, int(last) if last else first
+    except ValueError:
+        return None
+
+
+class Passages:
+    """
+    The passages of one raw_text as parallel arrays: character span in the
+    text, estimated tokens and first/last page. Passage i is
+    text[starts[i]:ends[i]]; consecutive passages share up to
+    PASSAGE_OVERLAP characters of whole sentences.
+
+    Pages come from form feeds in the text when present, counted from the
+    topic's first page; otherwise every passage carries the topic's range.
+    """
+
+    __slots__ = ("starts", "ends", "tokens", "first_pages", "last_pages")
+
+    def __init__(self, text, page_range=None, size=PASSAGE_CHARS, overlap=PASSAGE_OVERLAP):
+        self.starts, self.ends, self.tokens = array("I"), array("I"), array("I")
+        self.first_pages, self.last_pages = array("I"), array("I")
+        pages = parse_page_range(page_range) or (0, 0)
+        breaks = [i for i, ch in enumerate(text) if ch == PAGE_BREAK]
+
+        sentences = sentence_spans(text)
+        i = 0
+        while i < len(sentences):
+            start = sentences[i][0]
+            j = i + 1
+            while j < len(sentences) and sentences[j][1] - start <= size:
+                j += 1
+            end = sentences[j - 1][1]
+            self.starts.append(start)
+            self.ends.append(end)
+            self.tokens.append(estimate_tokens(text[start:end]))
+            if breaks:
+                self.first_pages.append(pages[0] + bisect_right(breaks, start))
+                self.last_pages.append(pages[0] + bisect_right(breaks, end - 1))
+            else:
+                self.first_pages.append(pages[0])
+                self.last_pages.append(pages[1])
+            if j == len(sentences):
+                break
+            # Step back over whole trailing sentences that fit in the overlap, always moving forward
+            k = j
+            while k - 1 > i and sentences[j - 1][1] - sentences[k - 1][0] <= overlap:
+                k -= 1
+            i = k
+
+    def __len__(self):
+        return len(self.starts)
+
+    def pages(self, i):
+        """'8-9' style label for passage i, or None without page information."""
+        first, last = self.first_pages[i], self.last_pages[i]
+        if not first:
+            return None
+        return str(first) if first == last else f"{first}-{last}"
+
+
+def split_passages(text, page_range=None):
+    return Passages(text, page_range)
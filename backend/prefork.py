@@ -0,0 +1,207 @@
+"""
+Pre-fork serving: the parent process imports the app (which loads and
+indexes history_data), freezes the garbage collector's view of everything
+loaded so far, then forks WEB_WORKERS uvicorn workers that all accept on
+one inherited listening socket.
+
+The workers share the parent's knowledge snapshot copy-on-write. gc.freeze()
+moves every object that exists at fork time into the permanent generation,
+so collections in the workers never walk (and write to) those pages; only
+objects a worker actually touches get private copies. Per-worker memory
+therefore stays close to the worker's own request state.
+
+The parent only supervises: it restarts workers that die, and on SIGHUP (or
+when watch() reports a change) it runs reload() itself, refreezes and
+replaces the workers one at a time, so a reload keeps the snapshot shared
+instead of giving every worker a private copy. Each replacement reports
+over a pipe once uvicorn has started (lifespan done, socket served); only
+then is the old worker it replaces told to drain and exit.
+"""
+
+import gc
+import os
+import select
+import signal
+import socket
+import time
+
+# True in a forked worker; the app checks it to leave reloads to the parent
+WORKER = False
+
+# A worker that exits this soon after starting is crash-looping; wait before the next fork
+MIN_UPTIME = 1.0
+RESTART_BACKOFF = 2.0
+# Seconds a replacement worker gets to start serving before a reload gives up on it
+READY_TIMEOUT = 60.0
+
+
+def in_worker():
+    return WORKER
+
+
+def request_reload():
+    """From a worker: ask the parent to reload the knowledge base and roll the workers."""
+    os.kill(os.getppid(), signal.SIGHUP)
+
+
+def _listen(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _freeze():
+    """Collect what the load left behind, then exempt every surviving object from future collections."""
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+
+
+def _spawn(app, sock, log_level, ready_pipe=False):
+    """Forks a worker. Returns its pid, or (pid, fd) with ready_pipe: fd becomes readable once it serves."""
+    import uvicorn
+    ready_r, ready_w = os.pipe() if ready_pipe else (None, None)
+    pid = os.fork()
+    if pid:
+        if ready_pipe:
+            os.close(ready_w)
+            return pid, ready_r
+        return pid
+    global WORKER
+    WORKER = True
+    status = 0
+    try:
+        if ready_pipe:
+            os.close(ready_r)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        class Server(uvicorn.Server):
+            async def startup(self, sockets=None):
+                await super().startup(sockets=sockets)
+                if ready_pipe:
+                    # Tells a rolling reload this worker serves (or failed to start) and the old one can go
+                    os.write(ready_w, b"1" if self.started else b"0")
+                    os.close(ready_w)
+
+        config = uvicorn.Config(app, log_level=log_level, timeout_graceful_shutdown=30)
+        Server(config).run(sockets=[sock])
+    except BaseException as e:
+        print(f"Worker {os.getpid()} failed: {str(e)}")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _wait_ready(fd, timeout):
+    """True once the worker behind fd reports it is serving; False if it exits or times out first."""
+    try:
+        readable, _, _ = select.select([fd], [], [], timeout)
+        return bool(readable) and os.read(fd, 1) == b"1"
+    finally:
+        os.close(fd)
+
+
+def _replace_workers(app, sock, log_level, children, stopping):
+    """Rolls the workers: starts a replacement, waits until it serves, then stops the worker it replaces.
+    A replacement that does not come up stops the roll; the remaining old workers keep serving."""
+    for pid in list(children):
+        if stopping():
+            return
+        new, ready = _spawn(app, sock, log_level, ready_pipe=True)
+        if not _wait_ready(ready, READY_TIMEOUT):
+            print(f"Worker {new} did not start serving within {READY_TIMEOUT:.0f}s; "
+                  f"keeping worker {pid} and the others not yet replaced")
+            try:
+                os.kill(new, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            return
+        children[new] = time.monotonic()
+        # Untracked from here, so the supervisor does not restart it when it exits after draining
+        children.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def serve(app, host, port, workers, reload=None, watch=None, watch_interval=0.0, log_level="info"):
+    """
+    Runs workers forked copies of app on host:port until SIGINT/SIGTERM.
+    reload() rebuilds the parent's state; watch() returns True when it should run.
+    """
+    # Imported here rather than at module level, so a single-process start never pays for it here;
+    # importing before the first fork lets the workers share it
+    import uvicorn
+    sock = _listen(host, port)
+    _freeze()
+    children = {}  # pid -> start time
+    flags = {"stop": False, "reload": False}
+
+    def on_stop(signum, frame):
+        flags["stop"] = True
+
+    def on_hup(signum, frame):
+        flags["reload"] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_hup)
+
+    for _ in range(workers):
+        children[_spawn(app, sock, log_level)] = time.monotonic()
+    print(f"Serving on http://{host}:{port} with {workers} workers (parent pid {os.getpid()})")
+
+    next_watch = time.monotonic() + watch_interval
+    while not flags["stop"]:
+        time.sleep(0.2)
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = children.pop(pid, None)
+            if started is None or flags["stop"]:
+                continue
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started < MIN_UPTIME:
+                time.sleep(RESTART_BACKOFF)
+            children[_spawn(app, sock, log_level)] = time.monotonic()
+
+        if watch is not None and watch_interval > 0 and time.monotonic() >= next_watch:
+            next_watch = time.monotonic() + watch_interval
+            flags["reload"] = flags["reload"] or watch()
+
+        if flags["reload"] and reload is not None:
+            flags["reload"] = False
+            try:
+                reload()
+            except Exception as e:
+                print(f"Reload failed, workers keep the current data: {str(e)}")
+                continue
+            _freeze()
+            _replace_workers(app, sock, log_level, children, lambda: flags["stop"])
+
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + 35
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
@@ -0,0 +1,406 @@
+"""
+LLM providers for the examiner engine: Groq (primary) and Hugging Face (secondary).
+
+ProviderRouter streams from the first healthy provider and falls back to the
+next one if it fails before its first token. In hedged mode it also starts
+the next provider when the current one has not produced a first token within
+its hedge delay (the recent p95 time-to-first-token, clamped), keeps whichever
+starts answering first and cancels the other. Every provider has a total
+deadline, an optional rate limit, and a circuit breaker that skips it after
+repeated failures.
+"""
+
+import abc
+import asyncio
+import threading
+import time
+from collections import deque
+
+from metrics import current_trace
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+HF_MODEL = "Qwen/Qwen2.5-72B-Instruct"
+
+
+class LazyClient:
+    """
+    Stands in for an SDK client and builds it with factory() on first use, so the
+    SDK import (groq ~0.1 s, huggingface_hub's inference client ~0.4 s) is not
+    paid at startup. Attribute access is forwarded to the built client.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.client = None
+        self.lock = threading.Lock()
+
+    def resolve(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = self.factory()
+        return self.client
+
+    @property
+    def built(self):
+        return self.client is not None
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+class ProvidersUnavailable(Exception):
+    """No provider is configured, or every configured provider's breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. While open the provider
+    is skipped; after reset_timeout seconds it is half-open and lets one trial
+    request through - its success closes it, its failure re-opens it. Other
+    callers are turned away until the trial has an outcome.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def ready(self):
+        """Whether allow() would let a call through now, without claiming the half-open trial."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_in_flight)
+
+    def allow(self):
+        """Whether a call may start. When half-open, the caller that gets True holds the trial
+        until record_success / record_failure (or release, if the call ends with neither)."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.trial_in_flight:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def release(self):
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies (seconds)."""
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if len(self.samples) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RateLimiter:
+    """
+    Token bucket allowing per_minute calls a minute on average, in bursts of
+    up to burst (default: ten seconds' worth). Callers wait in FIFO order.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.capacity = burst or max(1, per_minute // 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def estimated_wait(self, calls=1):
+        """Seconds until calls more calls could start, ignoring anyone already waiting."""
+        tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        return max(0.0, (calls - tokens) / self.rate)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waits += 1
+                self.waited_seconds += delay
+                await asyncio.sleep(delay)
+
+
+class Provider(abc.ABC):
+    name = "provider"
+
+    def __init__(self, deadline=60.0, breaker=None, limiter=None, pool=None):
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+        self.pool = pool
+        self.ttft = LatencyTracker()
+
+    @abc.abstractmethod
+    def stream(self, system_prompt, prompt, marks, context=""):
+        """Async generator of answer text pieces. context is sent after the system prompt, as its own message."""
+
+    def stats(self):
+        p95 = self.ttft.percentile(0.95)
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "deadline_s": self.deadline,
+            "ttft_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "rate_limit_per_min": self.limiter.per_minute if self.limiter else None,
+            "rate_limit_waits": self.limiter.waits if self.limiter else 0,
+            "pool": self.pool.stats() if self.pool else None,
+        }
+
+
+class GroqProvider(Provider):
+    name = "groq"
+
+    def __init__(self, client, model=GROQ_MODEL, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.model = model
+
+    async def stream(self, system_prompt, prompt, marks, context=""):
+        messages = [{"role": "system", "content": system_prompt}]
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": f"Answer for {marks} marks: {prompt}"})
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=2500,
+            stream=True
+        )
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
+
+
+class HuggingFaceProvider(Provider):
+    name = "huggingface"
+
+    def __init__(self, client, model=HF_MODEL, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.model = model
+
+    async def stream(self, system_prompt, prompt, marks, context=""):
+        stream = await self.client.text_generation(
+            f"<|system|>\n{system_prompt}\n{context}<|user|>\nAnswer for {marks} marks: {prompt}\n<|assistant|>",
+            model=self.model,
+            max_new_tokens=2000,
+            stream=True
+        )
+        async for text in stream:
+            if text:
+                yield text
+
+
+async def _with_deadline(provider, system_prompt, prompt, marks, context):
+    """provider.stream after the provider's rate limiter admits it, failing with TimeoutError
+    once provider.deadline seconds have passed."""
+    deadline = time.monotonic() + provider.deadline
+    if provider.limiter:
+        try:
+            await asyncio.wait_for(provider.limiter.acquire(), provider.deadline)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{provider.name} rate limit wait exceeded its {provider.deadline}s deadline")
+    agen = provider.stream(system_prompt, prompt, marks, context=context)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{provider.name} exceeded its {provider.deadline}s deadline")
+            try:
+                text = await asyncio.wait_for(agen.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{provider.name} exceeded its {provider.deadline}s deadline")
+            yield text
+    finally:
+        await agen.aclose()
+
+
+async def _first(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        raise RuntimeError("empty response")
+
+
+class ProviderRouter:
+    def __init__(self, providers, hedge=False, hedge_delay=None, hedge_percentile=0.95,
+                 min_hedge_delay=0.25, max_hedge_delay=3.0, default_hedge_delay=1.0):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.hedges_started = 0
+        self.hedges_won = 0
+
+    def quota_wait(self, calls=1):
+        """Seconds until calls more provider calls could start under the rate limits of the healthy providers."""
+        waits = [p.limiter.estimated_wait(calls) if p.limiter else 0.0
+                 for p in self.providers if p.breaker.ready()]
+        return min(waits) if waits else 0.0
+
+    def hedge_delay_for(self, provider):
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        observed = provider.ttft.percentile(self.hedge_percentile)
+        if observed is None:
+            return self.default_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, observed))
+
+    async def stream(self, system_prompt, prompt, marks, context=""):
+        """Yields (provider name, text) pieces from whichever provider answers."""
+        if not self.providers:
+            raise ProvidersUnavailable("Intelligence engines offline. Please check API keys.")
+        pending = [p for p in self.providers if p.breaker.ready()]
+
+        racing = {}  # first-token task -> (provider, generator, started_at, is_hedge)
+        last_error = None
+        trace = current_trace()
+
+        def start_next(is_hedge=False):
+            """Starts the next pending provider its breaker lets through; False when none is left."""
+            while pending:
+                provider = pending.pop(0)
+                if not provider.breaker.allow():
+                    continue
+                agen = _with_deadline(provider, system_prompt, prompt, marks, context)
+                racing[asyncio.ensure_future(_first(agen))] = (provider, agen, time.monotonic(), is_hedge)
+                if is_hedge:
+                    self.hedges_started += 1
+                return True
+            return False
+
+        async def discard(task, provider, agen):
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            await agen.aclose()
+            provider.breaker.release()
+
+        if not start_next():
+            raise ProvidersUnavailable("Intelligence engines paused after repeated failures. Please retry shortly.")
+        first_started = next(iter(racing.values()))[2]
+        winner = None
+        try:
+            while racing and winner is None:
+                timeout = None
+                if self.hedge and pending:
+                    provider, _, started, _ = max(racing.values(), key=lambda entry: entry[2])
+                    timeout = max(0.0, started + self.hedge_delay_for(provider) - time.monotonic())
+                done, _ = await asyncio.wait(racing, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    start_next(is_hedge=True)
+                    continue
+                for task in done:
+                    provider, agen, started, is_hedge = racing.pop(task)
+                    if task.exception() is None and winner is None:
+                        provider.ttft.add(time.monotonic() - started)
+                        winner = (provider, agen, task.result(), is_hedge, started)
+                        continue
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        provider.breaker.record_failure()
+                        trace.provider_failed(provider.name)
+                        print(f"{provider.name} Error: {str(last_error)}")
+                    else:
+                        provider.breaker.release()
+                    await agen.aclose()
+                if winner is None and not racing and pending:
+                    start_next()
+        finally:
+            for task, (provider, agen, _, _) in list(racing.items()):
+                await discard(task, provider, agen)
+            racing.clear()
+
+        if winner is None:
+            raise last_error or ProvidersUnavailable("Intelligence engines offline. Please check API keys.")
+
+        provider, agen, first_text, is_hedge, started = winner
+        if is_hedge:
+            self.hedges_won += 1
+        elif started > first_started:
+            # Time lost to providers that failed before this one was started
+            trace.observe("fallback", started - first_started)
+        first_token_at = time.monotonic()
+        try:
+            yield provider.name, first_text
+            async for text in agen:
+                yield provider.name, text
+        except Exception:
+            provider.breaker.record_failure()
+            trace.provider_failed(provider.name)
+            raise
+        except BaseException:
+            # Cancelled or closed by the caller: the call has no outcome for the breaker
+            provider.breaker.release()
+            raise
+        finally:
+            await agen.aclose()
+        provider.breaker.record_success()
+        trace.provider_timing(provider.name, first_token_at - first_started, time.monotonic() - first_started)
+
+    async def complete(self, system_prompt, prompt, marks, context=""):
+        """Returns (answer, provider name)."""
+        parts = []
+        name = None
+        async for name, text in self.stream(system_prompt, prompt, marks, context):
+            parts.append(text)
+        return "".join(parts), name
+
+    def stats(self):
+        return {
+            "hedge": self.hedge,
+            "hedges_started": self.hedges_started,
+            "hedges_won": self.hedges_won,
+            "providers": {
+                p.name: {**p.stats(), "hedge_delay_ms": round(self.hedge_delay_for(p) * 1000, 1)}
+                for p in self.providers
+            },
+        }
@@ -0,0 +1,185 @@
+"""BM25 ranked retrieval over textbook and past-paper chunks of history_data."""
+
+import math
+from array import array
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+from context import estimate_tokens
+from knowledge import WORD_RE, iter_schemes
+from passages import split_passages
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by did do does for from had has have he her his how in into is it
+its of on or she that the their them they this to was were what when which who why will with
+""".split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+class Chunk(NamedTuple):
+    kind: str    # "raw_text" | "factor" | "qa" | "mark_scheme"
+    key: str     # specific_topics key, or "year/season/paper" for mark schemes
+    title: str
+    text: str
+    meta: dict   # raw_text: {"start", "end"} span in the topic's raw_text and "pages"; mark_scheme: the entry
+    tokens: int  # estimate_tokens(text), precomputed for context packing
+
+
+def tokenize(text):
+    return [t for t in WORD_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def iter_chunks(data):
+    """Every retrievable chunk of history_data, in a stable order."""
+    for key, topic in data.get("specific_topics", {}).items():
+        title = topic.get("title", key)
+        for factor, points in topic.get("factors", {}).items():
+            text = f"**{factor}**:\n" + "".join(f"- {p}\n" for p in points)
+            yield Chunk("factor", key, title, text, {}, estimate_tokens(text))
+        for qa in topic.get("qa_pairs", []):
+            text = f"Q: {qa['question']}\nA: {qa['answer']}\n"
+            yield Chunk("qa", key, title, text, {"marks": qa.get("marks")}, estimate_tokens(text))
+        raw_text = topic.get("raw_text", "")
+        passages = split_passages(raw_text, topic.get("page_range"))
+        for i in range(len(passages)):
+            start, end = passages.starts[i], passages.ends[i]
+            meta = {"start": start, "end": end, "pages": passages.pages(i)}
+            yield Chunk("raw_text", key, title, raw_text[start:end], meta, passages.tokens[i])
+
+    for scheme in iter_schemes(data):
+        text = f"{scheme.question}\n" + "".join(f"  • {p}\n" for p in scheme.points)
+        meta = {"year": scheme.year, "season": scheme.season, "marks": scheme.marks,
+                "question": scheme.question, "points": list(scheme.points)}
+        yield Chunk("mark_scheme", scheme.key, scheme.question, text, meta, estimate_tokens(text))
+
+
+class Retriever:
+    """
+    BM25 over precomputed sparse postings.
+
+    Each term maps to parallel arrays of chunk ids and final BM25 weights
+    (idf and length normalisation already folded in), so scoring a query
+    is a sum over the postings of its terms, done with NumPy into one score
+    per chunk. Topic boosts and the mark-scheme filter are applied to that
+    array through per-key chunk id arrays, so a chunk is only materialised
+    once it is ranked high enough to be returned.
+
+    Term frequencies are kept per indexed text, and a retriever built with
+    previous= takes over the previous one's, so a reload after an ingestion
+    run only tokenizes the chunks that changed. The weights are always
+    recomputed, since idf and average length depend on every chunk.
+    """
+
+    def __init__(self, data, previous=None):
+        self.chunks = list(iter_chunks(data))
+        self.chunk_keys = [c.key for c in self.chunks]
+        self.postings = {}
+        self.term_cache = {}  # indexed text -> (term frequencies, length)
+        self.tokenized = 0    # chunks tokenized by this build (the rest came from previous)
+
+        reuse = getattr(previous, "term_cache", {})
+        term_freqs = []
+        doc_freq = defaultdict(int)
+        total_len = 0
+        for chunk in self.chunks:
+            # textbook chunks also index their topic title, which windows rarely repeat
+            text = chunk.text if chunk.kind == "mark_scheme" else f"{chunk.title}\n{chunk.text}"
+            entry = reuse.get(text) or self.term_cache.get(text)
+            if entry is None:
+                tokens = tokenize(text)
+                tf = defaultdict(int)
+                for t in tokens:
+                    tf[t] += 1
+                entry = (tf, len(tokens))
+                self.tokenized += 1
+            self.term_cache[text] = entry
+            tf = entry[0]
+            term_freqs.append(entry)
+            total_len += entry[1]
+            for t in tf:
+                doc_freq[t] += 1
+
+        n = len(self.chunks) or 1
+        avg_len = total_len / n or 1.0
+        ids = defaultdict(lambda: array("i"))
+        weights = defaultdict(lambda: array("f"))
+        for doc_id, (tf, length) in enumerate(term_freqs):
+            norm = K1 * (1 - B + B * length / avg_len)
+            for t, f in tf.items():
+                idf = math.log(1 + (n - doc_freq[t] + 0.5) / (doc_freq[t] + 0.5))
+                ids[t].append(doc_id)
+                weights[t].append(idf * f * (K1 + 1) / (f + norm))
+        self.postings = {t: (ids[t], weights[t]) for t in ids}
+        schemes = [(i, (c.key, c.title)) for i, c in enumerate(self.chunks) if c.kind == "mark_scheme"]
+        self.index_chunks(self.chunk_keys, schemes)
+
+    def index_chunks(self, chunk_keys, schemes):
+        """Per-chunk tables for top_k: chunk_keys in chunk order, schemes as (chunk id, (key, question)) pairs."""
+        key_chunks = defaultdict(list)  # topic key -> chunk ids
+        for i, key in enumerate(chunk_keys):
+            key_chunks[key].append(i)
+        self.key_chunks = {key: np.array(ids, dtype=np.int64) for key, ids in key_chunks.items()}
+        self.scheme_ids = np.fromiter((i for i, _ in schemes), dtype=np.int64, count=len(schemes))
+        self.scheme_chunks = defaultdict(list)  # (key, question) -> chunk ids
+        for i, pair in schemes:
+            self.scheme_chunks[pair].append(i)
+
+    def score(self, query):
+        """BM25 score of every chunk for query (0 where no query term occurs)."""
+        scores = np.zeros(len(self.chunks))
+        for t in set(tokenize(query)):
+            posting = self.postings.get(t)
+            if posting is None:
+                continue
+            # A term lists each chunk once, so a fancy-indexed add needs no np.add.at
+            scores[np.frombuffer(posting[0], dtype=np.int32)] += np.frombuffer(posting[1], dtype=np.float32)
+        return scores
+
+    def top_k(self, query, k=8, max_chars=None, boost_keys=(), boost=1.5, schemes=None):
+        """
+        Highest-scoring chunks for query, best first.
+
+        At most k chunks are returned; with max_chars, chunks that would push
+        the total text length over the limit are skipped in favour of later
+        (smaller) ones. Chunks whose key is in boost_keys get their score
+        multiplied by boost. With schemes, a set of (key, question) pairs
+        (KnowledgeIndex.match_schemes), every other mark scheme is skipped,
+        so schemes for another marks tier never take a useful chunk's place.
+        """
+        scores = self.score(query)
+        if boost_keys:
+            for key in set(boost_keys):
+                ids = self.key_chunks.get(key)
+                if ids is not None:
+                    scores[ids] *= boost
+        if schemes is not None:
+            allowed = [i for pair in schemes for i in self.scheme_chunks.get(pair, ())]
+            kept = scores[allowed]
+            scores[self.scheme_ids] = 0.0
+            scores[allowed] = kept
+
+        # Best first; the stable sort over ascending ids breaks ties by chunk order
+        candidates = np.flatnonzero(scores)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        results = []
+        used = 0
+        for doc_id in ranked.tolist():
+            if len(results) == k:
+                break
+            chunk = self.chunks[doc_id]
+            if max_chars is not None:
+                size = len(chunk.text)
+                if used + size > max_chars:
+                    continue
+                used += size
+            results.append((chunk, float(scores[doc_id])))
+        return results
+
+
+def build_retriever(data, previous=None):
+    return Retriever(data, previous)
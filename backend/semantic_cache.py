@@ -0,0 +1,175 @@
+"""Near-duplicate answer cache: hashed n-gram query vectors searched by cosine similarity."""
+
+import threading
+import zlib
+
+import numpy as np
+
+from cache import normalize_query
+from knowledge import WORD_RE
+from retriever import STOPWORDS
+
+DEFAULT_DIM = 256
+
+# Question words change the expected answer ("How successful was" vs "Was"), so they are kept
+QUESTION_WORDS = frozenset(["how", "why", "what", "was", "were", "did", "which", "when", "who"])
+VECTOR_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+
+class HashedNgramVectorizer:
+    """
+    CPU-only query embedding: content words plus their character trigrams,
+    hashed into dim signed buckets and L2-normalised. Trigrams let
+    'decline' / 'declined' and 'mughal' / 'mughals' overlap.
+    """
+
+    def __init__(self, dim=DEFAULT_DIM):
+        self.dim = dim
+
+    def features(self, text):
+        for word in WORD_RE.findall(normalize_query(text)):
+            if word in VECTOR_STOPWORDS:
+                continue
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def transform(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self.features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vec[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+
+class SemanticCache:
+    """
+    Fixed-capacity ring buffer of (query vector, marks, answer).
+
+    Vectors live in one contiguous float32 matrix, so brute-force search is
+    a single matrix-vector product. search="lsh" instead hashes vectors with
+    random hyperplanes into num_tables tables of lsh_bits-bit buckets and
+    only scores the rows that share a bucket with the query.
+
+    Rows carry the knowledge version their answer was generated from and
+    only match lookups of the same version; clear(version) empties the
+    buffer when the knowledge is reloaded.
+    """
+
+    def __init__(self, threshold=0.92, capacity=10000, dim=DEFAULT_DIM, search="brute",
+                 lsh_bits=10, num_tables=8, seed=2059):
+        if search not in ("brute", "lsh"):
+            raise ValueError(f"Unknown semantic cache search mode: {search}")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.search = search
+        self.vectorizer = HashedNgramVectorizer(dim)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.marks = np.full(capacity, -1, dtype=np.int32)
+        self.versions = np.full(capacity, -1, dtype=np.int64)
+        self.answers = [None] * capacity
+        self.count = 0
+        self.next_slot = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.num_tables = num_tables
+        if search == "lsh":
+            rng = np.random.default_rng(seed)
+            self.planes = rng.standard_normal((num_tables, lsh_bits, dim)).astype(np.float32)
+            self.bit_weights = (1 << np.arange(lsh_bits)).astype(np.int64)
+            self.slot_buckets = [None] * capacity
+            self.tables = [{} for _ in range(num_tables)]
+
+    def clear(self, version):
+        """Drops every entry; adds from knowledge versions before version are ignored from now on."""
+        with self.lock:
+            self.version = version
+            self.marks.fill(-1)
+            self.versions.fill(-1)
+            self.answers = [None] * self.capacity
+            self.count = 0
+            self.next_slot = 0
+            if self.search == "lsh":
+                self.slot_buckets = [None] * self.capacity
+                self.tables = [{} for _ in range(self.num_tables)]
+
+    def _buckets(self, vec):
+        bits = (self.planes @ vec) > 0  # (num_tables, lsh_bits)
+        return (bits @ self.bit_weights).tolist()
+
+    def _candidates(self, vec):
+        if self.search == "brute":
+            return None
+        rows = set()
+        for table, bucket in zip(self.tables, self._buckets(vec)):
+            rows.update(table.get(bucket, ()))
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+    def lookup(self, query, marks, version=0):
+        """Returns (answer, similarity) for the closest cached query with the same marks and knowledge
+        version, or (None, best)."""
+        vec = self.vectorizer.transform(query)
+        with self.lock:
+            rows = self._candidates(vec)
+            if rows is None:
+                sims = self.vectors[:self.count] @ vec
+                sims[(self.marks[:self.count] != marks) | (self.versions[:self.count] != version)] = -1.0
+                rows = np.arange(self.count)
+            elif len(rows):
+                sims = self.vectors[rows] @ vec
+                sims[(self.marks[rows] != marks) | (self.versions[rows] != version)] = -1.0
+            else:
+                sims = np.empty(0, dtype=np.float32)
+
+            if len(sims):
+                best = int(np.argmax(sims))
+                similarity = float(sims[best])
+                if similarity >= self.threshold:
+                    self.hits += 1
+                    return self.answers[int(rows[best])], similarity
+            else:
+                similarity = 0.0
+            self.misses += 1
+            return None, similarity
+
+    def add(self, query, marks, answer, version=0):
+        vec = self.vectorizer.transform(query)
+        with self.lock:
+            if version < self.version:
+                return
+            slot = self.next_slot
+            if self.search == "lsh":
+                old = self.slot_buckets[slot]
+                if old is not None:
+                    for table, bucket in zip(self.tables, old):
+                        table[bucket].discard(slot)
+                buckets = self._buckets(vec)
+                for table, bucket in zip(self.tables, buckets):
+                    table.setdefault(bucket, set()).add(slot)
+                self.slot_buckets[slot] = buckets
+            self.vectors[slot] = vec
+            self.marks[slot] = marks
+            self.versions[slot] = version
+            self.answers[slot] = answer
+            self.next_slot = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "search": self.search,
+            "threshold": self.threshold,
+            "entries": self.count,
+            "capacity": self.capacity,
+            "knowledge_version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
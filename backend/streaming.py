@@ -0,0 +1,66 @@
+"""Server-Sent Events helpers for /ask-ai/stream."""
+
+import json
+import re
+
+AUDIT_MARKER = "[EXAMINER AUDIT"
+
+AUDIT_RE = re.compile(
+    r'\[EXAMINER AUDIT:?\s*(?:(\d+)\s*/\s*(\d+))?\s*\]'
+    r'(?:\s*Band Level:\s*(?P<band>[^\n]*))?'
+    r'(?:\s*Reason:\s*(?P<reason>.*))?',
+    re.DOTALL,
+)
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def parse_audit(text):
+    """Structured form of the STEP 7 audit footer, or None when the answer has none."""
+    match = AUDIT_RE.search(text)
+    if not match:
+        return None
+    return {
+        "score": int(match.group(1)) if match.group(1) else None,
+        "out_of": int(match.group(2)) if match.group(2) else None,
+        "band": (match.group("band") or "").strip() or None,
+        "reason": (match.group("reason") or "").strip() or None,
+        "raw": text[match.start():].strip(),
+    }
+
+
+class AuditSplitter:
+    """
+    Passes streamed text through until the audit footer starts, then holds
+    the rest back so it can be sent as one structured event. A tail that
+    could be the beginning of the marker is buffered until it is resolved.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.in_audit = False
+
+    def feed(self, text):
+        """Returns the part of text that is safe to forward as tokens."""
+        if self.in_audit:
+            return ""
+        self.pending += text
+        index = self.pending.find(AUDIT_MARKER)
+        if index != -1:
+            self.in_audit = True
+            out, self.pending = self.pending[:index], ""
+            return out
+        keep = 0
+        for size in range(min(len(AUDIT_MARKER) - 1, len(self.pending)), 0, -1):
+            if AUDIT_MARKER.startswith(self.pending[-size:]):
+                keep = size
+                break
+        out = self.pending[:len(self.pending) - keep]
+        self.pending = self.pending[len(self.pending) - keep:]
+        return out
+
+    def flush(self):
+        out, self.pending = ("" if self.in_audit else self.pending), ""
+        return out
@@ -30,13 +30,57 @@ export default function HistoryExaminer() {
         formData.append('query', userQuery)
         formData.append('marks', selectedMarks.toString())
 
+        const marks = selectedMarks
+        const updateAnswer = (content: string, isError = false) => {
+            setMessages(prev => [...prev.slice(0, -1), { role: 'ai', content, marks, isError }])
+        }
+
         try {
-            const response = await fetch(`${import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000'}/ask-ai`, {
+            const response = await fetch(`${import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000'}/ask-ai/stream`, {
                 method: 'POST',
                 body: formData,
             })
-            const data = await response.json()
-            setMessages(prev => [...prev, { role: 'ai', content: data.answer, marks: selectedMarks }])
+            if (response.status === 429) {
+                // Busy or rate limited: Retry-After says how long until a retry should get through
+                const wait = Number(response.headers.get('Retry-After'))
+                const when = wait > 0 ? `in ${wait} second${wait === 1 ? '' : 's'}` : 'in a moment'
+                setMessages(prev => [...prev, { role: 'ai', content: `The Examiner Engine is busy right now. Please try again ${when}.`, marks, isError: true }])
+                return
+            }
+            if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`)
+
+            // Server-Sent Events: token events grow the answer, done carries the full text incl. audit
+            const reader = response.body.getReader()
+            const decoder = new TextDecoder()
+            let buffer = ''
+            let answer = ''
+            let started = false
+            while (true) {
+                const { value, done } = await reader.read()
+                if (done) break
+                buffer += decoder.decode(value, { stream: true })
+                const events = buffer.split('\n\n')
+                buffer = events.pop() || ''
+                for (const raw of events) {
+                    const event = raw.match(/^event: (.*)$/m)?.[1]
+                    const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null')
+                    if (event === 'token') {
+                        answer += data.text
+                        if (!started) {
+                            started = true
+                            setIsAnalyzing(false)
+                            setMessages(prev => [...prev, { role: 'ai', content: answer, marks }])
+                        } else {
+                            updateAnswer(answer)
+                        }
+                    } else if (event === 'done' || event === 'error') {
+                        const content = event === 'done' ? data.answer : data.message
+                        if (started) updateAnswer(content, event === 'error')
+                        else setMessages(prev => [...prev, { role: 'ai', content, marks, isError: event === 'error' }])
+                        started = true
+                    }
+                }
+            }
         } catch (error) {
             setMessages(prev => [...prev, { role: 'ai', content: "Error connecting to Examiner Engine. Please ensure the backend is running.", isError: true }])
         } finally {
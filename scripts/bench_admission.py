@@ -0,0 +1,128 @@
+"""
+Admission Control Benchmark
+===========================
+Drives the FastAPI app in-process with more concurrent /ask-ai requests
+than LLM_MAX_CONCURRENCY against a fake Groq client whose generation time
+grows with the marks (14-mark essays take 3.5x a 4-mark answer), and shows:
+
+  lanes     p50/p95 latency per marks tier with FIFO queueing (all lane
+            delays 0) and with the default priority lanes
+  overload  how many requests are refused with 429 + Retry-After once the
+            expected queue wait exceeds QUEUE_MAX_WAIT
+  clients   one client hammering with its own X-API-Key is throttled by
+            the per-client token bucket while other clients are unaffected
+
+Run from the History/ root directory:
+    python scripts/bench_admission.py [--capacity 4] [--requests 120] [--latency 0.2]
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx
+import main
+from admission import ClientRateLimiter, PriorityGate
+
+MARKS_RE = re.compile(r'Answer for (\d+) marks')
+MARKS = (4, 7, 14)
+
+
+class FakeCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def create(self, messages, **kwargs):
+        marks = int(MARKS_RE.search(messages[-1]["content"]).group(1))
+        await asyncio.sleep(self.latency * marks / 4)
+        return self.chunks("[EXAMINER AUDIT: 4/4]")
+
+    async def chunks(self, text):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeGroq:
+    def __init__(self, latency):
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency))
+
+
+def percentile(samples, q):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+async def flood(client, n, headers_for=lambda i: {}):
+    """Fires n concurrent requests with marks cycling 4/7/14; returns {marks: latencies}, statuses."""
+    latencies = {m: [] for m in MARKS}
+    statuses = []
+
+    async def one(i):
+        marks = MARKS[i % 3]
+        start = time.perf_counter()
+        r = await client.post("/ask-ai", data={"query": f"Why was the Simon Commission rejected? {i}",
+                                               "marks": marks}, headers=headers_for(i))
+        statuses.append((r.status_code, r.headers.get("retry-after")))
+        if r.status_code == 200:
+            latencies[marks].append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, statuses
+
+
+def make_gate(capacity, lane_delays, max_wait):
+    return PriorityGate(capacity, lane_delays=lane_delays, max_wait=max_wait,
+                        quota_wait=main.router.quota_wait, metrics=main.metrics)
+
+
+async def run(args):
+    main.answer_cache.max_bytes = 0
+    main.router = main.build_router(FakeGroq(args.latency), None)
+    main.client_limiter = None
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"capacity {args.capacity}, {args.requests} concurrent requests, fake generation "
+              f"{args.latency:.2f}s per 4 marks\n")
+        print(f"{'queueing':<10}" + "".join(f" {f'{m}m p50':>9} {f'{m}m p95':>9}" for m in MARKS))
+        for name, delays in (("fifo", (0.0, 0.0, 0.0)), ("lanes", (0.0, 2.0, 5.0))):
+            main.llm_gate = make_gate(args.capacity, delays, 600)
+            latencies, _ = await flood(client, args.requests)
+            print(f"{name:<10}" + "".join(f" {percentile(latencies[m], 0.5):>7.0f}ms {percentile(latencies[m], 0.95):>7.0f}ms"
+                                          for m in MARKS))
+
+        max_wait = args.latency * 3
+        main.llm_gate = make_gate(args.capacity, (0.0, 2.0, 5.0), max_wait)
+        # Teach the gate the real service time first, as a running server would have
+        await flood(client, args.capacity * 3)
+        _, statuses = await flood(client, args.requests)
+        refused = [int(ra) for code, ra in statuses if code == 429]
+        print(f"\noverload (QUEUE_MAX_WAIT={max_wait:.1f}s): {len(statuses) - len(refused)} served, "
+              f"{len(refused)} refused with 429"
+              + (f", Retry-After {min(refused)}-{max(refused)}s" if refused else ""))
+
+        main.llm_gate = make_gate(args.capacity, (0.0, 2.0, 5.0), 600)
+        main.client_limiter = ClientRateLimiter(per_minute=60, burst=5)
+        by_client = {"hammer": [0, 0], "students": [0, 0]}
+        for i in range(40):
+            who = "hammer" if i % 2 else "students"
+            key = "hammer" if i % 2 else f"student-{i}"
+            r = await client.post("/ask-ai", data={"query": "Why was the Simon Commission rejected?", "marks": 4},
+                                  headers={"X-API-Key": key})
+            by_client[who][r.status_code == 429] += 1
+        print(f"clients (60/min, burst 5): hammer {by_client['hammer'][0]} served / {by_client['hammer'][1]} "
+              f"refused, 20 other students {by_client['students'][0]} served / {by_client['students'][1]} refused")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=4, help="provider calls in flight (LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake generation seconds for a 4-mark answer")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+/ask-ai Concurrency Benchmark
+=============================
+Drives the FastAPI app in-process with N concurrent /ask-ai requests
+against a fake Groq client that takes a fixed time per completion.
+
+Two provider modes are compared:
+  blocking - the fake client sleeps synchronously (old behaviour, the
+             event loop is frozen for the whole generation)
+  async    - the fake client awaits (current behaviour)
+
+With the async path throughput should scale with the number of
+in-flight requests (up to LLM_MAX_CONCURRENCY); the blocking path
+stays flat at ~1/latency req/s.
+
+Run from the History/ root directory:
+    python scripts/bench_ask_ai_concurrency.py [--latency 0.5] [--levels 1,4,16,32]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx
+import main
+
+
+class FakeCompletions:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def create(self, **kwargs):
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return self.chunks("[EXAMINER AUDIT: 4/4]")
+
+    async def chunks(self, text):
+        delta = SimpleNamespace(content=text)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeGroq:
+    def __init__(self, latency: float, blocking: bool):
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency, blocking))
+
+
+async def run_level(client: httpx.AsyncClient, n: int) -> float:
+    """Fire n concurrent /ask-ai requests and return requests per second."""
+    async def one(i):
+        r = await client.post("/ask-ai", data={"query": f"Why was the Simon Commission rejected? {i}", "marks": 4})
+        r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return n / (time.perf_counter() - start)
+
+
+async def run(latency: float, levels: list):
+    transport = httpx.ASGITransport(app=main.app)
+    # Every request must reach the provider, so the answer cache is switched off
+    main.answer_cache.max_bytes = 0
+    # Every request comes from the same in-process client; the per-client limiter would throttle it
+    main.client_limiter = None
+    print(f"Fake provider latency: {latency:.2f}s, LLM_MAX_CONCURRENCY={main.LLM_MAX_CONCURRENCY}")
+    print(f"{'in-flight':>10} {'blocking req/s':>16} {'async req/s':>14}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for n in levels:
+            row = []
+            for blocking in (True, False):
+                main.router = main.build_router(FakeGroq(latency, blocking), None)
+                row.append(await run_level(client, n))
+            print(f"{n:>10} {row[0]:>16.2f} {row[1]:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake completion")
+    parser.add_argument("--levels", default="1,4,16,32", help="comma-separated in-flight request counts")
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, [int(x) for x in args.levels.split(",")]))
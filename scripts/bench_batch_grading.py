@@ -0,0 +1,86 @@
+"""
+Batch Grading Benchmark
+=======================
+Grades a class set of student answers in-process against a fake Groq
+client with a fixed time per completion, two ways:
+
+  sequential  one /ask-ai call per student answer, one after another
+              (what teachers do today)
+  /batch      one request; retrieval runs once per distinct question and
+              the grading calls fan out up to BATCH_MAX_CONCURRENCY
+
+With --rpm the fake Groq provider gets a requests-per-minute limit, to
+show the batch being paced by the provider rather than by the client.
+
+Run from the History/ root directory:
+    python scripts/bench_batch_grading.py [--students 40] [--latency 0.5] [--rpm 0]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx
+import main
+from providers import RateLimiter
+from bench_ask_ai_concurrency import FakeGroq
+
+QUESTION = "Why was the Simon Commission rejected?"
+
+
+def student_answer(i):
+    return (f"Student {i}: The Simon Commission was rejected because it had no Indian members. "
+            "Congress and the Muslim League boycotted it and protests followed.")
+
+
+async def run(students, latency, rpm):
+    main.answer_cache.max_bytes = 0
+    # Every request comes from the same in-process client; the per-client limiter would throttle it
+    main.client_limiter = None
+    main.router = main.build_router(FakeGroq(latency, False), None)
+    groq = main.router.providers[0]
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        groq.limiter = RateLimiter(rpm) if rpm else None
+        start = time.perf_counter()
+        for i in range(students):
+            query = f"{QUESTION}\n\nSTUDENT ANSWER:\n{student_answer(i)}"
+            r = await client.post("/ask-ai", data={"query": query, "marks": 4})
+            r.raise_for_status()
+        sequential = time.perf_counter() - start
+
+        groq.limiter = RateLimiter(rpm) if rpm else None
+        items = [{"query": QUESTION, "marks": 4, "student_answer": student_answer(i)} for i in range(students)]
+        start = time.perf_counter()
+        results = 0
+        async with client.stream("POST", "/batch", json={"items": items}) as r:
+            r.raise_for_status()
+            event = None
+            async for line in r.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "result":
+                    results += 1
+                elif line.startswith("data: ") and event == "meta":
+                    meta = json.loads(line[6:])
+        batched = time.perf_counter() - start
+
+    print(f"{students} answers, fake provider latency {latency:.2f}s, "
+          f"BATCH_MAX_CONCURRENCY={main.BATCH_MAX_CONCURRENCY}" + (f", {rpm} RPM limit" if rpm else ""))
+    print(f"  sequential /ask-ai: {sequential:6.2f}s")
+    print(f"  /batch:             {batched:6.2f}s  ({sequential / batched:.1f}x, {results} results, "
+          f"{meta['distinct_questions']} distinct question retrieved once)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake completion")
+    parser.add_argument("--rpm", type=int, default=0, help="Groq requests-per-minute limit (0: none)")
+    args = parser.parse_args()
+    asyncio.run(run(args.students, args.latency, args.rpm))
@@ -0,0 +1,65 @@
+"""
+Cold Start / Memory Benchmark
+=============================
+Starts a fresh interpreter per knowledge-base format (JSON vs compiled
+.kb), imports backend/main.py, answers a few retrieval queries and
+reports:
+  import     - wall time of `import main`
+  load       - time of load_knowledge() alone
+  VmRSS      - resident memory of the worker
+  RssAnon    - private (per-worker) part of it
+  RssFile    - file-backed part, shared between workers through the page cache
+
+Builds backend/history_data.kb first if it is missing.
+
+Run from the History/ root directory:
+    python scripts/bench_cold_start.py
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+PROBE = r"""
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+start = time.perf_counter()
+main.load_knowledge()
+loaded = time.perf_counter() - start
+for q in ["Why was the Simon Commission rejected?", "Explain the Pakistan Movement", "Describe the 1937 elections"]:
+    main.get_subject_context(q, 14)
+status = {}
+with open("/proc/self/status") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "RssAnon", "RssFile"):
+            status[key] = int(value.split()[0])
+print(json.dumps({"import": imported, "load": loaded, **status}))
+"""
+
+
+def run(fmt):
+    env = dict(os.environ, HISTORY_DATA_FORMAT=fmt, KNOWLEDGE_PRELOAD="eager")
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if not os.path.exists(os.path.join(BACKEND_DIR, "history_data.kb")):
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), "build_knowledge_base.py")], check=True)
+
+    print(f"{'format':>6} {'import ms':>10} {'load ms':>8} {'VmRSS MB':>9} {'RssAnon MB':>11} {'RssFile MB':>11}")
+    for fmt in ("json", "kb"):
+        r = run(fmt)
+        print(f"{fmt:>6} {r['import'] * 1000:>10.1f} {r['load'] * 1000:>8.1f} {r.get('VmRSS', 0) / 1024:>9.1f} "
+              f"{r.get('RssAnon', 0) / 1024:>11.1f} {r.get('RssFile', 0) / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Past Paper Parser Benchmark
+===========================
+Throughput of parse_question_paper / parse_mark_scheme in MB of extracted
+text per second: the precompiled single-sweep parsers in
+scripts/paper_parsers.py against the original versions, which built their
+regexes inside the function (and, for mark schemes, inside the per-block
+loop) and keyword-scanned every line on the question-paper fallback.
+
+The corpus is --years years of May/June and Oct/Nov sessions, each a
+question paper and a mark scheme, cycled from the extracted-text
+fixtures in scripts/fixtures/papers. Both versions must produce the same
+entries for every paper; the run stops if they differ.
+
+Run from the History/ root directory:
+    python scripts/bench_paper_parsers.py [--years 10] [--repeat 5]
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from paper_parsers import parse_mark_scheme, parse_question_paper
+from check_paper_parsers import FIXTURE_DIR
+
+
+def legacy_parse_question_paper(text, year, season_label):
+    """parse_question_paper as scrape_past_papers.py used to define it."""
+    questions = []
+    mark_pattern = re.compile(
+        r'((?:(?:Describe|Explain|How|Why|Assess|Was|To what extent|\"[^\"]+\")[^\[]+))\[(\d+)\]',
+        re.IGNORECASE | re.DOTALL
+    )
+    matches = mark_pattern.findall(text)
+    for i, (q_text, marks) in enumerate(matches, 1):
+        q_text = q_text.strip()
+        q_text = re.sub(r'\s+', ' ', q_text)
+        if len(q_text) > 15:
+            questions.append({"question_num": i, "question": q_text, "marks": int(marks),
+                              "year": year, "season": season_label})
+    if not questions:
+        lines = text.split('\n')
+        q_num = 0
+        for line in lines:
+            line = line.strip()
+            keywords = ['describe', 'explain', 'how', 'why', 'assess', 'was ',
+                        'what extent', 'compare', 'important']
+            if any(kw in line.lower() for kw in keywords) and len(line) > 20:
+                q_num += 1
+                mark_match = re.search(r'\[(\d+)\]\s*$', line)
+                marks = int(mark_match.group(1)) if mark_match else 4
+                questions.append({"question_num": q_num, "question": re.sub(r'\[\d+\]\s*$', '', line).strip(),
+                                  "marks": marks, "year": year, "season": season_label})
+    return questions
+
+
+def legacy_parse_mark_scheme(text, year, season_label):
+    """parse_mark_scheme as scrape_past_papers.py used to define it."""
+    mark_entries = []
+    block_pattern = re.compile(r'(?m)^(\d+)\s*(?:\([ab]\))?\s*\n(.*?)(?=^\d+\s*(?:\([ab]\))?\s*\n|\Z)', re.DOTALL)
+    blocks = block_pattern.findall(text)
+    if not blocks:
+        block_pattern2 = re.compile(r'(?:^|\n)(\d+)\b(.*?)(?=\n\d+\b|\Z)', re.DOTALL)
+        blocks = block_pattern2.findall(text)
+    for q_num, block_text in blocks:
+        points = []
+        bullet_re = re.compile(r'[•\-–]\s*([^\n•\-–]+)')
+        for match in bullet_re.finditer(block_text):
+            pt = match.group(1).strip()
+            pt = re.sub(r'\s+', ' ', pt)
+            if len(pt) > 10:
+                points.append(pt)
+        award_re = re.compile(r'Award\s+\d+\s+marks?\s+for\s+([^\n]+)', re.IGNORECASE)
+        for match in award_re.finditer(block_text):
+            points.append("Award: " + match.group(1).strip())
+        if not points:
+            numbered_re = re.compile(r'(?m)^\s*\d+[\.\)]\s*(.+)$')
+            for match in numbered_re.finditer(block_text):
+                pt = match.group(1).strip()
+                if len(pt) > 10:
+                    points.append(pt)
+        mark_total_re = re.compile(r'\[(\d+)\]|\((\d+)\s*marks?\)', re.IGNORECASE)
+        mark_match = mark_total_re.search(block_text)
+        total_marks = int(mark_match.group(1) or mark_match.group(2)) if mark_match else 4
+        q_header_lines = block_text.strip().split('\n')[:3]
+        question_hint = ' '.join(q_header_lines).strip()[:200]
+        if points:
+            mark_entries.append({"question_num": int(q_num), "question": question_hint, "points": points[:15],
+                                 "total_marks": total_marks, "year": year, "season": season_label})
+    return mark_entries
+
+
+def load_corpus(years):
+    """[(kind, text)] for years x 2 sessions x (qp, ms), cycling the fixtures of each kind."""
+    fixtures = {"qp": [], "ms": []}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures["qp" if "_qp_" in path else "ms"].append(f.read())
+    corpus = []
+    for i in range(years * 2):
+        for kind in ("qp", "ms"):
+            corpus.append((kind, fixtures[kind][i % len(fixtures[kind])]))
+    return corpus
+
+
+def throughput(corpus, parsers, repeat):
+    """Best-of-repeat MB/s over the corpus."""
+    size = sum(len(text.encode("utf-8")) for _, text in corpus)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for kind, text in corpus:
+            parsers[kind](text, "2023", "May_June_2023")
+        best = min(best, time.perf_counter() - start)
+    return size / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.years)
+    legacy = {"qp": legacy_parse_question_paper, "ms": legacy_parse_mark_scheme}
+    current = {"qp": parse_question_paper, "ms": parse_mark_scheme}
+    for kind, text in corpus:
+        if legacy[kind](text, "2023", "May_June_2023") != current[kind](text, "2023", "May_June_2023"):
+            sys.exit(f"parsers disagree on a {kind} fixture")
+
+    size = sum(len(text.encode("utf-8")) for _, text in corpus)
+    print(f"{len(corpus)} papers ({args.years} years), {size / 1e3:.0f} KB of extracted text, best of {args.repeat}\n")
+    print(f"{'parser':<16} {'legacy MB/s':>12} {'current MB/s':>13} {'speedup':>8}")
+    for kind, label in (("qp", "question paper"), ("ms", "mark scheme")):
+        papers = [(k, t) for k, t in corpus if k == kind]
+        old = throughput(papers, legacy, args.repeat)
+        new = throughput(papers, current, args.repeat)
+        print(f"{label:<16} {old:>12.2f} {new:>13.2f} {new / old:>7.1f}x")
+    old = throughput(corpus, legacy, args.repeat)
+    new = throughput(corpus, current, args.repeat)
+    print(f"{'all':<16} {old:>12.2f} {new:>13.2f} {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Textbook Passage Benchmark
+==========================
+Compares the sentence-aligned, overlapping raw_text passages
+(backend/passages.py) with the fixed 700-character windows they replaced,
+on the worked questions inside the textbook notes themselves: every
+"Q ... [N]" followed by "Ans." in a topic's raw_text is asked as a
+question, and the answer that follows it is what retrieval should bring.
+
+For each question, the chunks are ranked and packed into the marks-tier
+budget exactly as get_subject_context does. The benchmark reports how
+much of the first ANSWER_CHARS characters of the answer made it into the
+context (answer recall), how many raw_text characters were sent (overlap
+rendered once) and the estimated context tokens.
+
+Run from the History/ root directory:
+    python scripts/bench_passages.py
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import retriever
+from context import estimate_tokens, marks_tier, pack_context, render_context, token_budget, uncovered_span
+from knowledge import build_index
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "backend", "history_data.json")
+QUESTION_RE = re.compile(r'(?m)^Q\.?:?\s*(?:\([a-z]\)\s*)?(.+?)\[(\d+)\]\s*\nAns\.?', re.DOTALL)
+NEXT_QUESTION_RE = re.compile(r'\nQ\.?:?\s')
+ANSWER_CHARS = 500
+TOP_K = 24
+
+
+class LegacyWindows:
+    """split_windows as retriever.py used to define it, with the span of each window kept."""
+
+    def __init__(self, text, page_range=None, size=700):
+        self.starts, self.ends, self.tokens = array("I"), array("I"), array("I")
+        start = 0
+        while start < len(text):
+            end = min(start + size, len(text))
+            if end < len(text):
+                space = text.rfind(" ", start, end)
+                if space > start:
+                    end = space
+            piece = text[start:end]
+            if piece.strip():
+                lead = len(piece) - len(piece.lstrip())
+                self.starts.append(start + lead)
+                self.ends.append(start + lead + len(piece.strip()))
+                self.tokens.append(estimate_tokens(piece.strip()))
+            start = end
+
+    def __len__(self):
+        return len(self.starts)
+
+    def pages(self, i):
+        return None
+
+
+def worked_questions(data):
+    """(topic key, question, marks, answer start, answer end) for every Q/Ans pair in the notes."""
+    pairs = []
+    for key, topic in data.get("specific_topics", {}).items():
+        text = topic.get("raw_text", "")
+        for m in QUESTION_RE.finditer(text):
+            nxt = NEXT_QUESTION_RE.search(text, m.end())
+            end = min(nxt.start() if nxt else len(text), m.end() + ANSWER_CHARS)
+            pairs.append((key, " ".join(m.group(1).split()), int(m.group(2)), m.end(), end))
+    return pairs
+
+
+def evaluate(data, index, bm25, pairs):
+    recall = raw_chars = tokens = 0.0
+    for key, question, marks, start, end in pairs:
+        topics = index.match_topics(question.lower())
+        schemes = {(s.key, s.question) for s in index.match_schemes(question.lower(), marks_tier(marks), topics)}
+        ranked = bm25.top_k(question, k=TOP_K, boost_keys=topics, schemes=schemes)
+        packed, _ = pack_context(ranked, token_budget(marks))
+        covered = set()
+        sent = {}
+        for chunk, _ in packed:
+            if chunk.kind == "raw_text":
+                # as rendered: overlapping passages only add their new text
+                new_start, new_end = uncovered_span(chunk, sent.setdefault(chunk.key, []))
+                sent[chunk.key].append((chunk.meta["start"], chunk.meta["end"]))
+                raw_chars += new_end - new_start
+                if chunk.key == key:
+                    covered.update(range(max(start, chunk.meta["start"]), min(end, chunk.meta["end"])))
+        recall += len(covered) / (end - start)
+        tokens += estimate_tokens(render_context(packed))
+    n = len(pairs)
+    return recall / n, raw_chars / n, tokens / n, sum(1 for c in bm25.chunks if c.kind == "raw_text")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-file", default=DATA_FILE)
+    args = parser.parse_args()
+
+    with open(args.data_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    index = build_index(data)
+    pairs = worked_questions(data)
+
+    current = evaluate(data, index, retriever.Retriever(data), pairs)
+    split_passages = retriever.split_passages
+    retriever.split_passages = LegacyWindows
+    try:
+        legacy = evaluate(data, index, retriever.Retriever(data), pairs)
+    finally:
+        retriever.split_passages = split_passages
+
+    print(f"{len(pairs)} worked questions from the textbook notes, budgets by their marks\n")
+    print(f"{'chunking':<22} {'chunks':>7} {'answer recall':>14} {'raw_text chars':>15} {'context tokens':>15}")
+    for label, (recall, chars, tokens, chunks) in (("700-char windows", legacy), ("sentence passages", current)):
+        print(f"{label:<22} {chunks:>7} {recall:>13.1%} {chars:>15.0f} {tokens:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
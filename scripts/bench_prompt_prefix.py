@@ -0,0 +1,150 @@
+"""
+Prompt Prefix Caching Benchmark
+===============================
+Compares the old single-message system prompt (rules rebuilt per call with
+{marks} inside STEP 7 and the context appended) with the precompiled
+prompts in backend/prompts.py (byte-identical rules prefix, short
+per-tier tail, context as its own message) against the mock provider's
+prefix cache (scripts/mock_llm_server.py --prefill-ms-per-1k).
+
+Half the requests are /ask-ai answers and half are /batch grading calls,
+whose old prompt put a grading header in front of the rules. The same mix
+of questions and mark tiers is sent sequentially in both modes, with the
+mock's prefix cache emptied in between. Reported per mode: prompt tokens,
+prompt tokens served from the prefix cache, uncached (prefilled) tokens,
+time to first token, and the CPU cost of assembling the prompt.
+--prefix-cache-blocks shrinks the mock's cache to simulate eviction
+pressure, where fewer distinct prefixes matter most.
+
+Run from the History/ root directory:
+    python scripts/bench_prompt_prefix.py [--requests 120] [--prefill-ms-per-1k 60]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx
+from groq import AsyncGroq
+
+import main
+from prompts import EXAMINER_RULES, answer_prompt, context_message, grading_prompt
+from providers import GroqProvider, ProviderRouter
+from load_test_ask_ai import QUESTIONS, free_port, wait_for
+
+AUDIT_PLACEHOLDER = "[EXAMINER AUDIT: X/M]"
+LEGACY_GRADING_HEADER = """
+===== GRADING MODE =====
+The user message is an exam question followed by a STUDENT ANSWER.
+Do NOT write your own answer. Mark the student answer against the rules and
+context below: give short feedback on what earned and lost marks, then the
+STEP 7 audit footer with the mark you award.
+"""
+
+
+def legacy_system_prompt(marks, context):
+    """The system prompt as main.py used to build it: one f-string with marks and context inside."""
+    return EXAMINER_RULES.replace(AUDIT_PLACEHOLDER, f"[EXAMINER AUDIT: X/{marks}]") + context_message(context)
+
+
+def legacy_grading_prompt(marks, context):
+    """The /batch prompt as main.py used to build it: grading header in front of the answer prompt."""
+    return LEGACY_GRADING_HEADER + legacy_system_prompt(marks, context)
+
+
+def build_args(query, marks, context, grading, legacy):
+    """router.stream arguments for one request in either prompt layout."""
+    if grading:
+        query = f"{query}\n\nSTUDENT ANSWER:\nIt was rejected because it had no Indian members."
+        if legacy:
+            return (legacy_grading_prompt(marks, context), query, marks)
+        return (grading_prompt(marks), query, marks, context_message(context))
+    if legacy:
+        return (legacy_system_prompt(marks, context), query, marks)
+    return (answer_prompt(marks), query, marks, context_message(context))
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+async def run_mode(router, mock_url, workload, legacy):
+    httpx.post(f"{mock_url}/mock/reset")
+    ttfts = []
+    for query, marks, context, grading in workload:
+        args = build_args(query, marks, context, grading, legacy)
+        start = time.perf_counter()
+        first = None
+        async for _name, _text in router.stream(*args):
+            if first is None:
+                first = time.perf_counter() - start
+        ttfts.append(first)
+    return ttfts, httpx.get(f"{mock_url}/mock/stats").json()["groq"]
+
+
+def assembly_cost(workload, legacy, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query, marks, context, grading in workload:
+            build_args(query, marks, context, grading, legacy)
+    return (time.perf_counter() - start) / (repeat * len(workload)) * 1e6
+
+
+async def run(args):
+    port = free_port()
+    mock_url = f"http://127.0.0.1:{port}"
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(os.path.dirname(__file__), "mock_llm_server.py"),
+        "--port", str(port), "--ttft-ms", str(args.ttft_ms), "--jitter", "0",
+        "--tokens-per-sec", "0", "--answer-tokens", "5",
+        "--prefill-ms-per-1k", str(args.prefill_ms_per_1k),
+        "--prefix-cache-blocks", str(args.prefix_cache_blocks),
+    ])
+    try:
+        wait_for(f"{mock_url}/mock/stats", mock)
+        router = ProviderRouter([GroqProvider(AsyncGroq(api_key="mock", base_url=mock_url))])
+        workload = []
+        for i in range(args.requests):
+            query = QUESTIONS[i % len(QUESTIONS)]
+            marks = (4, 7, 14)[(i // len(QUESTIONS)) % 3]
+            grading = i % 2 == 1
+            workload.append((query, marks, main.get_subject_context(query, marks)[0], grading))
+
+        print(f"{args.requests} requests (half /ask-ai answers, half /batch grading) over {len(QUESTIONS)} "
+              f"questions x 3 mark tiers; mock TTFT {args.ttft_ms:.0f} ms + {args.prefill_ms_per_1k:.0f} ms "
+              f"per 1k uncached prompt tokens, prefix cache {args.prefix_cache_blocks} blocks\n")
+        print(f"{'mode':<12} {'prompt tok':>11} {'cached tok':>11} {'prefilled':>10} "
+              f"{'ttft p50':>9} {'ttft p95':>9} {'assembly':>10}")
+        rows = {}
+        for legacy in (True, False):
+            ttfts, stats = await run_mode(router, mock_url, workload, legacy)
+            name = "legacy" if legacy else "precompiled"
+            prefilled = stats["prompt_tokens"] - stats["cached_prompt_tokens"]
+            rows[name] = (prefilled, percentile(ttfts, 0.5))
+            print(f"{name:<12} {stats['prompt_tokens']:>11} {stats['cached_prompt_tokens']:>11} {prefilled:>10} "
+                  f"{percentile(ttfts, 0.5):>7.1f}ms {percentile(ttfts, 0.95):>7.1f}ms "
+                  f"{assembly_cost(workload, legacy):>8.2f}us")
+
+        saved = rows["legacy"][0] - rows["precompiled"][0]
+        print(f"\nPrefilled tokens saved: {saved} ({saved / max(1, rows['legacy'][0]):.1%}), "
+              f"TTFT p50 {rows['legacy'][1] - rows['precompiled'][1]:+.1f} ms faster")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--ttft-ms", type=float, default=80.0, help="mock base time to first token")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=60.0,
+                        help="mock first-token cost per 1000 uncached prompt tokens")
+    parser.add_argument("--prefix-cache-blocks", type=int, default=8192,
+                        help="mock prefix cache capacity in 256-char blocks (small values simulate eviction pressure)")
+    asyncio.run(run(parser.parse_args()))
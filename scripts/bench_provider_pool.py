@@ -0,0 +1,128 @@
+"""
+Provider Connection Pool Benchmark
+==================================
+How many outbound connections the backend opens to a provider under bursty
+load, with the SDK defaults the pool starts from (20 idle connections kept
+for 5 seconds) against a pool sized to the provider concurrency
+(HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_SECONDS,
+backend/http_pool.py).
+
+The backend runs with uvicorn next to the mock LLM server
+(scripts/mock_llm_server.py, keeping idle connections open for 120 s like
+a provider's edge would), with the answer cache off, so every /ask-ai
+is a provider call. The load comes in --bursts bursts of --burst concurrent
+requests, --pause seconds apart. Every connection opened is a TCP (and, to
+the real providers, TLS) handshake on the path of the request that opened
+it; with keep-alive that outlives the pauses only the first burst should
+open any. Counts are read from GET /providers/stats after the run.
+
+Provider calls are capped at LLM_MAX_CONCURRENCY (default 32) as in
+production, so a burst larger than that queues in the backend and a pool
+sized to the same limit stays full. Keep-alive is not free: httpcore
+scans all idle connections whenever a request starts or ends, so a pool
+much larger than the concurrency it serves costs CPU on every call.
+
+Run from the History/ root directory:
+    python scripts/bench_provider_pool.py [--burst 64] [--bursts 4] [--pause 6] [--provider groq|huggingface]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from load_test_ask_ai import MARKS, QUESTIONS, ROOT, free_port, percentile, wait_for
+
+SETTINGS = {
+    "SDK defaults": {},
+    "sized pool": {"HTTP_MAX_CONNECTIONS": "32", "HTTP_MAX_KEEPALIVE": "32", "HTTP_KEEPALIVE_SECONDS": "30"},
+}
+
+
+def start_backend(mock_url, provider, settings):
+    port = free_port()
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("HTTP_", "GROQ_", "HF_"))}
+    env.update({
+        "ANSWER_CACHE_MAX_BYTES": "0", "ANSWER_CACHE_DB": "", "SEMANTIC_CACHE_THRESHOLD": "",
+        "KNOWLEDGE_WATCH_INTERVAL": "0", "KNOWLEDGE_PRELOAD": "eager", "COALESCE_REQUESTS": "0",
+        "CLIENT_RPM": "0", "METRICS_MODE": "off",
+        **settings,
+    })
+    if provider == "groq":
+        env.update({"GROQ_API_KEY": "mock", "GROQ_BASE_URL": mock_url})
+    else:
+        env.update({"HF_API_KEY": "mock", "HF_MODEL": f"{mock_url}/hf/generate"})
+    backend = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=os.path.join(ROOT, "backend"), env=env, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    wait_for(f"{url}/ready", backend)
+    return url, backend
+
+
+async def bursts(url, size, count, pause):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120.0) as client:
+        async def one(i):
+            nonlocal errors
+            start = time.perf_counter()
+            r = await client.post("/ask-ai", data={"query": QUESTIONS[i % len(QUESTIONS)], "marks": MARKS[i % len(MARKS)]})
+            if r.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+        for b in range(count):
+            if b:
+                await asyncio.sleep(pause)
+            await asyncio.gather(*(one(b * size + i) for i in range(size)))
+        stats = (await client.get("/providers/stats")).json()
+    return latencies, errors, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=64, help="concurrent requests per burst")
+    parser.add_argument("--bursts", type=int, default=4)
+    parser.add_argument("--pause", type=float, default=6.0, help="idle seconds between bursts")
+    parser.add_argument("--provider", choices=("groq", "huggingface"), default="groq")
+    parser.add_argument("--ttft-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, "scripts", "mock_llm_server.py"),
+                             "--port", str(mock_port), "--ttft-ms", str(args.ttft_ms),
+                             "--tokens-per-sec", str(args.tokens_per_sec), "--keep-alive", "120"],
+                            stdout=subprocess.DEVNULL)
+    try:
+        wait_for(f"{mock_url}/mock/stats", mock)
+        print(f"{args.bursts} bursts of {args.burst} /ask-ai, {args.pause:.0f} s apart, provider {args.provider}\n")
+        print(f"{'settings':<14} {'requests':>9} {'opened':>7} {'reuse':>6} {'peak active':>11} {'waits':>6} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for label, settings in SETTINGS.items():
+            url, backend = start_backend(mock_url, args.provider, settings)
+            try:
+                latencies, errors, stats = asyncio.run(bursts(url, args.burst, args.bursts, args.pause))
+            finally:
+                backend.terminate()
+                backend.wait()
+            pool = stats["providers"][args.provider]["pool"]
+            print(f"{label:<14} {pool['requests']:>9} {pool['connections_opened']:>7} {pool['reuse_rate'] or 0:>6.1%} "
+                  f"{pool['peak_active']:>11} {pool['waits']:>6} {percentile(latencies, 0.5) or 0:>8.1f} "
+                  f"{percentile(latencies, 0.99) or 0:>8.1f} {errors:>7}")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
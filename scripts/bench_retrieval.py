@@ -0,0 +1,140 @@
+"""
+Retrieval Micro-Benchmark
+=========================
+Compares the legacy full-scan get_subject_context (copied below as it
+was before the inverted index) with the current backend implementation
+on the shipped backend/history_data.json, and times the BM25 top-k
+lookup on its own. Also prints estimated context tokens per marks tier
+against the legacy unbounded context.
+
+Run from the History/ root directory:
+    python scripts/bench_retrieval.py [--repeat 200]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import main
+
+QUERIES = [
+    "Explain the main causes of the Mughal decline.",
+    "Why was the Simon Commission rejected?",
+    "Was the Khilafat Movement successful?",
+    "Evaluate the role of Sir Syed Ahmad Khan.",
+    "Explain the Pakistan Movement",
+    "Describe the 1937 elections and Congress rule 1937-1939.",
+    "How successful was Ayub Khan's government?",
+    "Describe the effects of the partition of 1947 on the people of Pakistan.",
+]
+
+
+def legacy_subject_context(query, data):
+    """get_subject_context as it was before the inverted index (full scans per call)."""
+    context = ""
+    query_lower = query.lower()
+    matches = []
+    marking_examples = []
+
+    specific_topics = data.get("specific_topics", {})
+    topic_lower_words = set(re.findall(r'\w+', query_lower))
+
+    for key, topic_data in specific_topics.items():
+        key_words = set(key.split('_'))
+        common = topic_lower_words.intersection(key_words)
+        match = False
+        if len(key_words) == 1 and len(common) == 1: match = True
+        elif len(common) >= 2: match = True
+        elif any(date in query_lower for date in re.findall(r'\d{4}', key)): match = True
+
+        if match:
+            context += f"\n### TEXTBOOK CONTEXT: {topic_data.get('title', key)} (Nigel Kelly Standards)\n"
+            if "factors" in topic_data:
+                for factor, points in topic_data["factors"].items():
+                    context += f"**{factor}**:\n"
+                    for p in points: context += f"- {p}\n"
+            if "qa_pairs" in topic_data:
+                context += "\n**Relevant Past Questions & Answers:**\n"
+                for qa in topic_data["qa_pairs"][:3]:
+                    context += f"Q: {qa['question']}\nA: {qa['answer']}\n\n"
+            if "raw_text" in topic_data:
+                 context += f"{topic_data['raw_text'][:1000]}...\n"
+            context += "\n"
+
+    for section in ["section_1", "section_2", "section_3"]:
+        for item in data.get(section, []):
+            topic = item.get("topic", "").lower()
+            if topic in query_lower or any(kw in query_lower for kw in topic.split() if len(kw) > 3):
+                matches.append(json.dumps(item, indent=2))
+
+    past_papers = data.get("past_papers", {})
+    for year, seasons in past_papers.items():
+        for season, papers in seasons.items():
+            for paper, content in papers.items():
+                mark_schemes = content.get("mark_scheme", [])
+                for scheme in mark_schemes:
+                    question = scheme.get("question", "")
+                    points = scheme.get("points", [])
+                    if any(word in question.lower() for word in query_lower.split() if len(word) > 4):
+                        marking_examples.append({"year": year, "question": question, "points": points[:5]})
+
+    if matches:
+        context += "\n### O-LEVEL HISTORY ARCHIVE:\n" + "\n---\n".join(matches[:2])
+
+    if marking_examples:
+        context += "\n\n### CAMBRIDGE EXAMINER MARKING SCHEMES:\n"
+        for example in marking_examples[:2]:
+            context += f"\n**Question: {example['question']}**\n"
+            for point in example['points']: context += f"  • {point}\n"
+
+    return context
+
+
+def time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES))
+
+
+def main_bench(repeat):
+    # the legacy path and the index builds need the full JSON, not the compiled .kb view
+    data = main.load_json(main.HIST_DATA_PATH)
+    print(f"Corpus: {len(data.get('specific_topics', {}))} topics, "
+          f"{len(main.current_knowledge().index.schemes)} mark-scheme entries")
+
+    start = time.perf_counter()
+    main.build_index(data)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:.2f} ms (once per load)")
+    start = time.perf_counter()
+    main.build_retriever(data)
+    print(f"BM25 build: {(time.perf_counter() - start) * 1000:.2f} ms "
+          f"({len(main.current_knowledge().retriever.chunks)} chunks, once per load)")
+
+    legacy = time_per_call(lambda q: legacy_subject_context(q, data), repeat)
+    current = time_per_call(main.get_subject_context, repeat)
+    print(f"legacy  get_subject_context: {legacy * 1e6:8.1f} us/query")
+    print(f"current get_subject_context: {current * 1e6:8.1f} us/query")
+    print(f"speed-up: {legacy / current:.1f}x")
+    top_k = time_per_call(lambda q: main.current_knowledge().retriever.top_k(
+        q, k=main.CONTEXT_TOP_K), repeat)
+    print(f"BM25 top_k alone:            {top_k * 1e6:8.1f} us/query")
+
+    print("\nEstimated context tokens (legacy vs budgeted 4m / 7m / 14m):")
+    for q in QUERIES:
+        legacy_tokens = main.estimate_tokens(legacy_subject_context(q, data))
+        tiers = [main.get_subject_context(q, marks)[1]["context_tokens"] for marks in (4, 7, 14)]
+        print(f"  {legacy_tokens:6d} -> {tiers[0]:5d} / {tiers[1]:5d} / {tiers[2]:5d}  {q}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main_bench(args.repeat)
@@ -0,0 +1,91 @@
+"""
+Semantic Cache Lookup Benchmark
+===============================
+Fills the semantic answer cache with synthetic exam questions built from
+the specific_topics titles, then measures lookup latency for brute-force
+and random-projection LSH search at 10k and 100k entries. LSH recall is
+reported as the share of brute-force hits where LSH also returns a hit.
+
+Run from the History/ root directory:
+    python scripts/bench_semantic_cache.py [--sizes 10000,100000] [--probes 500]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from knowledge import WORD_RE
+from main import current_knowledge
+from semantic_cache import SemanticCache
+
+TEMPLATES = [
+    "Why was the {t} important?",
+    "Describe the {t}.",
+    "How successful was the {t}?",
+    "Explain the causes of the {t}.",
+    "Was the {t} the most important reason for {u}?",
+    "What were the results of the {t}?",
+]
+MARKS = [4, 7, 14]
+
+
+def synthetic_questions(n, rng):
+    topics = [t.get("title", k) for k, t in current_knowledge().data.get("specific_topics", {}).items()]
+    vocab = sorted({w for t in topics for w in WORD_RE.findall(t.lower()) if len(w) > 3})
+    questions = []
+    for i in range(n):
+        template = rng.choice(TEMPLATES)
+        t, u = rng.choice(topics), rng.choice(topics)
+        # a couple of extra vocabulary words keep the 100k entries distinct
+        extra = " ".join(rng.sample(vocab, 2))
+        questions.append((template.format(t=t, u=u) + f" ({extra} {i})", rng.choice(MARKS)))
+    return questions
+
+
+def paraphrase(question, rng):
+    """Light rewording: lower-case, drop the trailing id, maybe drop one word."""
+    words = question.lower().split()[:-1]
+    if len(words) > 6 and rng.random() < 0.5:
+        words.pop(rng.randrange(1, len(words)))
+    return " ".join(words)
+
+
+def bench(size, probes, threshold, rng):
+    questions = synthetic_questions(size, rng)
+    caches = {mode: SemanticCache(threshold=threshold, capacity=size, search=mode) for mode in ("brute", "lsh")}
+    start = time.perf_counter()
+    for q, marks in questions:
+        for cache in caches.values():
+            cache.add(q, marks, q)
+    fill = time.perf_counter() - start
+
+    sample = rng.sample(questions, probes)
+    probe_queries = [(paraphrase(q, rng), marks) for q, marks in sample]
+    results = {}
+    for mode, cache in caches.items():
+        start = time.perf_counter()
+        answers = [cache.lookup(q, marks)[0] for q, marks in probe_queries]
+        results[mode] = ((time.perf_counter() - start) / probes, answers)
+
+    brute_hits = [a is not None for a in results["brute"][1]]
+    lsh_hits = sum(1 for b, l in zip(results["brute"][1], results["lsh"][1]) if b is not None and l is not None)
+    recall = lsh_hits / sum(brute_hits) if any(brute_hits) else 0.0
+
+    print(f"\n{size} entries (fill {fill:.1f}s for both caches)")
+    print(f"  brute: {results['brute'][0] * 1e6:9.1f} us/lookup, hit rate {sum(brute_hits) / probes:.2%}")
+    print(f"  lsh:   {results['lsh'][0] * 1e6:9.1f} us/lookup, recall vs brute {recall:.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    rng = random.Random(2059)
+    for size in [int(s) for s in args.sizes.split(",")]:
+        bench(size, args.probes, args.threshold, rng)
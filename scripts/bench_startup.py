@@ -0,0 +1,139 @@
+"""
+Backend Startup Benchmark
+=========================
+What a cold start costs before the backend can answer, for scale-to-zero
+deployments.
+
+  1. Import breakdown: `python -X importtime -c "import main"` in a fresh
+     interpreter, summarised as the total and the slowest direct imports of
+     main (cumulative, so each includes everything it pulls in). The provider
+     SDKs (groq, huggingface_hub) should not appear: they are imported on
+     first use or by the background warm-up.
+  2. Time to first response: the backend is started with uvicorn next to
+     the mock LLM server (scripts/mock_llm_server.py), and the benchmark
+     polls it from the moment of spawning. It records when the server first
+     answers at all (GET /ready, even with 503), when /ready turns 200
+     (knowledge base loaded and indexed), and when the first POST /ask-ai
+     is answered. That last one includes building the provider client if
+     the warm-up has not done it yet.
+
+Step 2 runs for KNOWLEDGE_PRELOAD=background (default) and eager and
+reports the median of --repeat starts.
+
+Run from the History/ root directory:
+    python scripts/bench_startup.py [--repeat 3] [--top 12]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from load_test_ask_ai import ROOT, free_port, wait_for
+
+BACKEND_DIR = os.path.join(ROOT, "backend")
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_breakdown():
+    """(total seconds, [(cumulative seconds, module)]) for the direct imports of main."""
+    env = dict(os.environ, KNOWLEDGE_PRELOAD="background")
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    # Lines come in post-order: a module's imports are listed, one level deeper, just before it
+    total, direct, pending = 0.0, [], []
+    for line in err.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)) / 1e6, len(m.group(3)), m.group(4)
+        if depth == 1:
+            if name == "main":
+                total, direct = cumulative, pending
+            pending = []
+        elif depth == 3:
+            pending.append((cumulative, name))
+    return total, sorted(direct, reverse=True)
+
+
+def first_response(mock_url, preload):
+    """Seconds from spawn to (first answer, /ready 200, first /ask-ai answer)."""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "KNOWLEDGE_PRELOAD": preload, "PORT": str(port),
+        "GROQ_API_KEY": "mock", "GROQ_BASE_URL": mock_url,
+        "HF_API_KEY": "mock", "HF_MODEL": f"{mock_url}/hf/generate",
+        "ANSWER_CACHE_MAX_BYTES": "0", "ANSWER_CACHE_DB": "", "SEMANTIC_CACHE_THRESHOLD": "",
+        "KNOWLEDGE_WATCH_INTERVAL": "0",
+    })
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    backend = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    up = ready = answered = None
+    try:
+        with httpx.Client(base_url=url, timeout=60.0) as client:
+            while ready is None:
+                if backend.poll() is not None:
+                    raise RuntimeError(f"backend exited with code {backend.returncode}")
+                try:
+                    r = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                up = up or time.perf_counter() - start
+                if r.status_code == 200:
+                    ready = time.perf_counter() - start
+                else:
+                    time.sleep(0.005)
+            r = client.post("/ask-ai", data={"query": "Why was the Simon Commission rejected?", "marks": 4})
+            r.raise_for_status()
+            answered = time.perf_counter() - start
+    finally:
+        backend.terminate()
+        backend.wait()
+    return up, ready, answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12, help="direct imports of main to list")
+    args = parser.parse_args()
+
+    total, direct = import_breakdown()
+    print(f"import main: {total * 1000:.0f} ms (python -X importtime, cumulative)\n")
+    for cumulative, name in direct[:args.top]:
+        print(f"  {cumulative * 1000:8.1f} ms  {name}")
+    lazy = [name for _, name in direct if name.split(".")[0] in ("groq", "huggingface_hub", "dotenv")]
+    print(f"\n  eagerly imported provider SDKs: {', '.join(lazy) or 'none'}")
+
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, "scripts", "mock_llm_server.py"),
+                             "--port", str(mock_port), "--ttft-ms", "0", "--tokens-per-sec", "100000"],
+                            stdout=subprocess.DEVNULL)
+    try:
+        wait_for(f"{mock_url}/mock/stats", mock)
+        print(f"\nTime from spawn (median of {args.repeat}):")
+        print(f"{'preload':>11} {'first response':>15} {'ready':>8} {'first /ask-ai':>14}")
+        for preload in ("background", "eager"):
+            runs = [first_response(mock_url, preload) for _ in range(args.repeat)]
+            up, ready, answered = (statistics.median(r[i] for r in runs) * 1000 for i in range(3))
+            print(f"{preload:>11} {up:>12.0f} ms {ready:>5.0f} ms {answered:>11.0f} ms")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
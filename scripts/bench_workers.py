@@ -0,0 +1,173 @@
+"""
+Pre-fork Workers Benchmark
+==========================
+Requests per second and per-worker memory of the backend against the
+number of pre-fork workers (WEB_WORKERS, backend/prefork.py).
+
+For each worker count the backend is started as `python main.py` on a
+free port, next to the mock LLM server (scripts/mock_llm_server.py). The
+load is closed-loop: --concurrency connections spread over --client-procs
+client processes, each sending the next /ask-ai as soon as the last one
+is answered, for --duration seconds. By default the workers' answer
+caches are warmed first, so every measured request runs form parsing,
+retrieval, context packing, the cache lookup and JSON serialization but
+no provider call. That is the CPU-bound part that extra workers
+parallelize. With --provider the cache is disabled and every request
+also streams an answer from the mock.
+
+Memory is read from /proc/<pid>/smaps_rollup of every worker after the
+run:
+  Pss      - proportional share, shared pages split between the workers
+  Private  - pages only this worker has (its own copies and request state)
+Flat Private as workers are added means the knowledge base stays shared.
+
+The client processes run on the same machine and take CPU from the
+workers; give them cores to spare (e.g. --workers 1,2,4,6 on 8 cores).
+
+Run from the History/ root directory:
+    python scripts/bench_workers.py [--workers 1,2,4,8] [--duration 10] [--concurrency 64]
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from load_test_ask_ai import MARKS, QUESTIONS, ROOT, free_port, percentile, wait_for
+
+
+def start_mock(ttft_ms, tokens_per_sec):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "scripts", "mock_llm_server.py"), "--port", str(port),
+        "--ttft-ms", str(ttft_ms), "--tokens-per-sec", str(tokens_per_sec),
+    ], stdout=subprocess.DEVNULL)
+    wait_for(f"{url}/mock/stats", mock)
+    return url, mock
+
+
+def start_backend(workers, mock_url, provider):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "WEB_WORKERS": str(workers), "PORT": str(port),
+        "GROQ_API_KEY": "mock", "GROQ_BASE_URL": mock_url,
+        "HF_API_KEY": "mock", "HF_MODEL": f"{mock_url}/hf/generate",
+        "ANSWER_CACHE_MAX_BYTES": "0" if provider else str(32 * 1024 * 1024), "ANSWER_CACHE_DB": "",
+        "SEMANTIC_CACHE_THRESHOLD": "", "KNOWLEDGE_WATCH_INTERVAL": "0", "COALESCE_REQUESTS": "0",
+        "CLIENT_RPM": "0", "GROQ_RPM": "0", "HF_RPM": "0", "LLM_MAX_CONCURRENCY": "256", "METRICS_MODE": "off",
+    })
+    backend = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(ROOT, "backend"), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    wait_for(f"{url}/cache/stats", backend)
+    return url, backend
+
+
+def worker_pids(backend):
+    """The forked workers, or the backend itself when it runs as one process."""
+    try:
+        with open(f"/proc/{backend.pid}/task/{backend.pid}/children") as f:
+            children = [int(pid) for pid in f.read().split()]
+    except OSError:
+        children = []
+    return children or [backend.pid]
+
+
+def memory_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Pss", "Private_Clean", "Private_Dirty"):
+                fields[key] = int(value.split()[0])
+    return fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+async def drive(url, concurrency, duration, offset):
+    """Closed loop on concurrency connections; returns (ok, errors, latencies)."""
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def loop(i):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                data = {"query": QUESTIONS[i % len(QUESTIONS)], "marks": MARKS[i % len(MARKS)]}
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    r = await client.post("/ask-ai", data=data)
+                    if r.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                        continue
+                except httpx.HTTPError:
+                    pass
+                errors += 1
+
+        await asyncio.gather(*(loop(offset + i) for i in range(concurrency)))
+    return len(latencies), errors, latencies
+
+
+def drive_process(url, concurrency, duration, offset):
+    return asyncio.run(drive(url, concurrency, duration, offset))
+
+
+def measure(url, concurrency, duration, client_procs):
+    per_proc = max(1, concurrency // client_procs)
+    with ProcessPoolExecutor(client_procs) as pool:
+        runs = [pool.submit(drive_process, url, per_proc, duration, p * per_proc) for p in range(client_procs)]
+        results = [run.result() for run in runs]
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = [lat for r in results for lat in r[2]]
+    return ok / duration, errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument("--provider", action="store_true", help="disable the answer cache, so every request calls the mock")
+    parser.add_argument("--ttft-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=100000.0)
+    args = parser.parse_args()
+
+    mock_url, mock = start_mock(args.ttft_ms, args.tokens_per_sec)
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} connections from {args.client_procs} client process(es), "
+          f"{'provider calls' if args.provider else 'warm answer cache'}\n")
+    print(f"{'workers':>7} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'Pss MB/worker':>14} {'Private MB/worker':>18}")
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            url, backend = start_backend(workers, mock_url, args.provider)
+            try:
+                # Every worker answers every question/marks pair at least once before measuring
+                measure(url, args.concurrency, max(2.0, workers * 0.5), args.client_procs)
+                rps, errors, latencies = measure(url, args.concurrency, args.duration, args.client_procs)
+                mem = [memory_kb(pid) for pid in worker_pids(backend)]
+            finally:
+                backend.send_signal(signal.SIGTERM)
+                backend.wait()
+            pss = sum(m[0] for m in mem) / len(mem) / 1024
+            private = sum(m[1] for m in mem) / len(mem) / 1024
+            print(f"{workers:>7} {rps:>8.1f} {percentile(latencies, 0.5) or 0:>8.1f} "
+                  f"{percentile(latencies, 0.99) or 0:>8.1f} {errors:>7} {pss:>14.1f} {private:>18.1f}")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
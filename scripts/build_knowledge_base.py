@@ -0,0 +1,42 @@
+"""
+Knowledge Base Compiler
+=======================
+Compiles backend/history_data.json into backend/history_data.kb, the
+memory-mapped format the backend loads at startup (string table, offset
+arrays and precomputed BM25 postings). Re-run after editing the JSON;
+the backend falls back to the JSON while the .kb is older than it.
+
+Run from the History/ root directory:
+    python scripts/build_knowledge_base.py
+"""
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from kb_format import compile_kb
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+DATA_FILE = os.path.join(BACKEND_DIR, "history_data.json")
+KB_FILE = os.path.join(BACKEND_DIR, "history_data.kb")
+
+
+def main():
+    print(f"📂 Loading: {DATA_FILE}")
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    start = time.perf_counter()
+    retriever = compile_kb(data, KB_FILE)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Wrote {KB_FILE}")
+    print(f"   {len(retriever.chunks)} chunks, {len(retriever.postings)} terms, "
+          f"{os.path.getsize(KB_FILE) / 1024:.0f} KB in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
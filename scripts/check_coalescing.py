@@ -0,0 +1,146 @@
+"""
+Request Coalescing Check
+========================
+Drives the FastAPI app in-process with N concurrent copies of the same
+question - differing only in case, spacing and trailing punctuation, as
+a class typing a projected question would - against a fake Groq client
+that counts its calls and streams its answer in several chunks.
+
+For /ask-ai and /ask-ai/stream it checks that:
+  - the N requests make exactly one upstream call (one retrieval too)
+  - every request gets the same answer, and every stream the same tokens
+  - N-1 of them report usage.coalesced = true
+and then repeats /ask-ai with COALESCE_REQUESTS off, where the same
+burst makes N upstream calls. Exits non-zero if any check fails.
+
+Run from the History/ root directory:
+    python scripts/check_coalescing.py [--requests 30] [--latency 0.3]
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import httpx
+import main
+
+QUESTION = "Why was the Simon Commission rejected?"
+ANSWER_CHUNKS = ["The Commission ", "had no Indian ", "members, so Congress ", "boycotted it.",
+                 "\n\n[EXAMINER AUDIT: 4/4]"]
+
+
+class CountingCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.chunks()
+
+    async def chunks(self):
+        for text in ANSWER_CHUNKS:
+            await asyncio.sleep(self.latency / len(ANSWER_CHUNKS))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class CountingGroq:
+    def __init__(self, latency):
+        self.chat = SimpleNamespace(completions=CountingCompletions(latency))
+
+
+def variant(i):
+    """The question as student i typed it."""
+    forms = (QUESTION, QUESTION.lower(), QUESTION.upper(), "  " + QUESTION.replace(" ", "  "), QUESTION[:-1] + "??")
+    return forms[i % len(forms)]
+
+
+def sse_events(body):
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+async def burst(client, n, stream):
+    """n concurrent identical questions; returns [(answer, token texts, coalesced)]."""
+    async def one(i):
+        path = "/ask-ai/stream" if stream else "/ask-ai"
+        r = await client.post(path, data={"query": variant(i), "marks": 4})
+        r.raise_for_status()
+        if not stream:
+            body = r.json()
+            return body["answer"], None, body["usage"]["coalesced"]
+        tokens, done = [], None
+        for event, data in sse_events(r.text):
+            if event == "token":
+                tokens.append(data["text"])
+            elif event == "done":
+                done = data
+        return done["answer"], "".join(tokens), done["usage"]["coalesced"]
+
+    return await asyncio.gather(*(one(i) for i in range(n)))
+
+
+def fresh_provider(latency):
+    groq = CountingGroq(latency)
+    main.router = main.build_router(groq, None)
+    return groq.chat.completions
+
+
+async def run(args):
+    main.answer_cache.max_bytes = 0  # every burst must reach the provider
+    main.client_limiter = None
+    retrievals = 0
+    get_subject_context = main.get_subject_context
+
+    def counting_context(*a, **kw):
+        nonlocal retrievals
+        retrievals += 1
+        return get_subject_context(*a, **kw)
+
+    main.get_subject_context = counting_context
+    failures = []
+
+    def check(ok, message):
+        print(("  ok    " if ok else "  FAIL  ") + message)
+        if not ok:
+            failures.append(message)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=None) as client:
+        for stream in (False, True):
+            name = "/ask-ai/stream" if stream else "/ask-ai"
+            print(f"{name}: {args.requests} concurrent copies of one question")
+            upstream = fresh_provider(args.latency)
+            retrievals = 0
+            results = await burst(client, args.requests, stream)
+            check(upstream.calls == 1, f"upstream calls: {upstream.calls}")
+            check(retrievals == 1, f"retrievals: {retrievals}")
+            check(len({answer for answer, _, _ in results}) == 1, "every request got the same answer")
+            if stream:
+                check(len({tokens for _, tokens, _ in results}) == 1, "every stream carried the same tokens")
+            followers = sum(coalesced for _, _, coalesced in results)
+            check(followers == args.requests - 1, f"coalesced followers: {followers}")
+
+        print(f"/ask-ai with COALESCE_REQUESTS=0: {args.requests} concurrent copies")
+        main.COALESCE_REQUESTS = False
+        upstream = fresh_provider(args.latency)
+        await burst(client, args.requests, False)
+        check(upstream.calls == args.requests, f"upstream calls: {upstream.calls}")
+        main.COALESCE_REQUESTS = True
+
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake time to first token in seconds")
+    sys.exit(asyncio.run(run(parser.parse_args())))
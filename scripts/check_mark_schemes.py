@@ -0,0 +1,103 @@
+"""
+Past Paper Mark Scheme Check
+============================
+Asks every past-paper question in history_data.json at its own marks tier
+through get_subject_context (backend/main.py), the function /ask-ai uses,
+and checks the CAMBRIDGE EXAMINER MARKING SCHEMES block that comes back:
+
+  - the entry has marking points at all (curated entries store them as
+    mark_scheme_points, raw parser output as points/total_marks; both are
+    read through knowledge.iter_schemes)
+  - its first marking point is in the context
+  - no mark scheme of another marks tier is in the context
+
+One entry in the raw parser's shape is added to the data so the
+points/total_marks path is covered too. Also prints the average tokens
+of the marking-scheme block against retrieval without the mark-scheme
+lookup (every scheme BM25 ranks, any tier). Exits non-zero on any failure.
+
+Run from the History/ root directory:
+    python scripts/check_mark_schemes.py
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ["KNOWLEDGE_PRELOAD"] = "eager"
+os.environ.setdefault("KNOWLEDGE_WATCH_INTERVAL", "0")
+
+import main
+from context import estimate_tokens, pack_context, render_context, token_budget
+from knowledge import KnowledgeSnapshot, build_index
+from retriever import build_retriever
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "backend", "history_data.json")
+SCHEME_HEADING = "### CAMBRIDGE EXAMINER MARKING SCHEMES:"
+SCHEME_MARKS_RE = re.compile(r'^\*\*Question: .*\*\* \(\w+, (\d+) marks\)$', re.MULTILINE)
+
+RAW_PARSER_ENTRY = {
+    "question": "Why did the Khilafat Movement fail by 1924?",
+    "points": [
+        "Gandhi called off non-cooperation after the violence at Chauri Chaura in 1922",
+        "The Hijrat Movement left thousands of migrants destitute in Afghanistan",
+        "Mustafa Kemal abolished the Caliphate in 1924, removing the movement's purpose",
+    ],
+    "total_marks": 7,
+}
+
+
+def scheme_block(context):
+    if SCHEME_HEADING not in context:
+        return ""
+    return context[context.index(SCHEME_HEADING):]
+
+
+def check(data_file):
+    with open(data_file, "r", encoding="utf-8") as f:
+        data = copy.deepcopy(json.load(f))
+    data.setdefault("past_papers", {}).setdefault("1999", {}).setdefault("Oct_Nov_1999", {}) \
+        .setdefault("paper_1", {}).setdefault("mark_scheme", []).append(RAW_PARSER_ENTRY)
+    index = build_index(data)
+    retriever = build_retriever(data)
+    main.knowledge = KnowledgeSnapshot(data, index, retriever, 0, "check", "", 0.0)
+
+    failures = 0
+    served_tokens = unfiltered_tokens = 0
+    for scheme in index.schemes:
+        query, marks = scheme.question, scheme.marks
+        block = scheme_block(main.get_subject_context(query, marks)[0])
+        unfiltered, _ = pack_context(retriever.top_k(query, k=main.CONTEXT_TOP_K,
+                                                     boost_keys=index.match_topics(query.lower())),
+                                     token_budget(marks))
+        served_tokens += estimate_tokens(block)
+        unfiltered_tokens += estimate_tokens(scheme_block(render_context(unfiltered)))
+
+        problems = []
+        if not scheme.points:
+            problems.append("no marking points")
+        elif f"  • {scheme.points[0]}\n" not in block:
+            problems.append("first marking point not in context")
+        other = {int(m) for m in SCHEME_MARKS_RE.findall(block)} - {marks}
+        if other:
+            problems.append(f"mark schemes for {sorted(other)} marks in context")
+        print(f"  {'FAIL' if problems else 'ok  '}  {scheme.key} [{marks}] {query[:60]}"
+              + (f": {'; '.join(problems)}" if problems else ""))
+        failures += bool(problems)
+
+    n = len(index.schemes)
+    print(f"\nmarking-scheme block: {served_tokens / n:.0f} tokens on average as served, "
+          f"{unfiltered_tokens / n:.0f} without the mark-scheme lookup")
+    print(f"{failures} of {n} entries failed" if failures else f"all {n} entries ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-file", default=DATA_FILE)
+    args = parser.parse_args()
+    sys.exit(check(args.data_file))
@@ -0,0 +1,80 @@
+"""
+Past Paper Parser Regression Check
+==================================
+Runs parse_question_paper / parse_mark_scheme (scripts/paper_parsers.py)
+over every extracted-text fixture in scripts/fixtures/papers and compares
+the entries with the recorded {name}.expected.json next to it. Files with
+_qp_ in the name are question papers, _ms_ mark schemes.
+
+The fixtures cover a full Cambridge paper (sources, sub-parts, "[Turn
+over" and "[ ]" brackets, quoted 14-mark prompts), a paper without [N]
+marks (line fallback), a mark scheme with level descriptors, numbered
+and dashed points, one whose blocks have no number-only header lines, and
+text pdfplumber extracted from scripts/paper_fixture_server.py PDFs.
+
+After an intended change in parser output, rewrite the expectations with
+--update and review the diff. Exits non-zero on any mismatch.
+
+Run from the History/ root directory:
+    python scripts/check_paper_parsers.py [--update]
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from paper_parsers import parse_mark_scheme, parse_question_paper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "papers")
+
+
+def parse_fixture(name, text, year, season):
+    parser = parse_question_paper if "_qp_" in name else parse_mark_scheme
+    return parser(text, year, season)
+
+
+def first_difference(expected, actual):
+    if len(expected) != len(actual):
+        return f"{len(actual)} entries, expected {len(expected)}"
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        for field in want.keys() | got.keys():
+            if want.get(field) != got.get(field):
+                return f"entry {i} {field}: {got.get(field)!r}, expected {want.get(field)!r}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="rewrite the .expected.json files from current output")
+    args = parser.parse_args()
+
+    failures = 0
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.txt"))):
+        name = os.path.basename(path)[:-4]
+        expected_path = path[:-4] + ".expected.json"
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        with open(expected_path, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+        actual = parse_fixture(name, text, expected["year"], expected["season"])
+
+        if args.update:
+            expected["entries"] = actual
+            with open(expected_path, "w", encoding="utf-8") as f:
+                json.dump(expected, f, indent=1, ensure_ascii=False)
+            print(f"  updated {name}: {len(actual)} entries")
+            continue
+        problem = first_difference(expected["entries"], actual)
+        print(f"  {'FAIL' if problem else 'ok  '}  {name}: {problem or f'{len(actual)} entries'}")
+        failures += problem is not None
+
+    print(f"\n{failures} fixture(s) failed" if failures else "\nall fixtures match")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Provider Hedging Harness
+========================
+Runs ProviderRouter against two fake providers with configurable
+time-to-first-token distributions and compares plain fallback against
+hedged requests (start the secondary once the primary is slower than its
+recent p95 TTFT, keep whichever answers first).
+
+Each fake provider draws its TTFT from a lognormal around --primary-ms /
+--secondary-ms; with probability --tail-prob the primary stalls for
+--tail-ms instead, and with probability --fail-prob it errors before its
+first token. A final phase makes the primary fail every request to show
+the circuit breaker opening and traffic going straight to the secondary.
+
+Run from the History/ root directory:
+    python scripts/hedging_harness.py [--requests 400] [--tail-prob 0.05]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from providers import CircuitBreaker, Provider, ProviderRouter
+
+
+class FakeProvider(Provider):
+    def __init__(self, name, ttft_ms, sigma=0.3, tail_prob=0.0, tail_ms=0.0, fail_prob=0.0,
+                 rng=None, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.ttft_ms = ttft_ms
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_ms = tail_ms
+        self.fail_prob = fail_prob
+        self.rng = rng or random.Random()
+        self.calls = 0
+
+    async def stream(self, system_prompt, prompt, marks, context=""):
+        self.calls += 1
+        if self.rng.random() < self.tail_prob:
+            delay = self.tail_ms / 1000
+        else:
+            delay = self.rng.lognormvariate(0, self.sigma) * self.ttft_ms / 1000
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.fail_prob:
+            raise RuntimeError(f"{self.name} returned 503")
+        for piece in ("The ", "Simon ", "Commission ", "[EXAMINER AUDIT: 4/4]"):
+            yield piece
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_phase(router, requests, concurrency):
+    """Returns (TTFT samples in ms, error count)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            try:
+                async for _name, _text in router.stream("system", f"question {i}", 4):
+                    if first is None:
+                        first = (time.perf_counter() - start) * 1000
+                samples.append(first)
+            except Exception:
+                errors += 1
+
+    # The router prints one line per provider failure; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples, errors
+
+
+def make_router(args, hedge, seed):
+    rng = random.Random(seed)
+    primary = FakeProvider("groq", args.primary_ms, tail_prob=args.tail_prob, tail_ms=args.tail_ms,
+                           fail_prob=args.fail_prob, rng=rng)
+    secondary = FakeProvider("huggingface", args.secondary_ms, rng=rng)
+    return ProviderRouter([primary, secondary], hedge=hedge, min_hedge_delay=0.01)
+
+
+async def main(args):
+    print(f"primary ~{args.primary_ms:.0f}ms (tail {args.tail_prob:.0%} at {args.tail_ms:.0f}ms, "
+          f"fail {args.fail_prob:.0%}), secondary ~{args.secondary_ms:.0f}ms, {args.requests} requests\n")
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'hedged':>7} {'won':>5} {'secondary calls':>16}")
+    for hedge in (False, True):
+        router = make_router(args, hedge, args.seed)
+        # Warm the TTFT window so the adaptive hedge delay is in effect
+        await run_phase(router, 50, args.concurrency)
+        router.hedges_started = router.hedges_won = 0
+        router.providers[1].calls = 0
+        samples, errors = await run_phase(router, args.requests, args.concurrency)
+        print(f"{'hedged' if hedge else 'fallback':<10} {percentile(samples, 0.5):>8.1f} "
+              f"{percentile(samples, 0.95):>8.1f} {percentile(samples, 0.99):>8.1f} {errors:>7} "
+              f"{router.hedges_started:>7} {router.hedges_won:>5} {router.providers[1].calls:>16}")
+
+    print("\nCircuit breaker: primary fails every request")
+    router = make_router(args, True, args.seed)
+    primary = router.providers[0]
+    primary.fail_prob, primary.tail_prob = 1.0, 0.0
+    primary.breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+    await run_phase(router, 40, 1)
+    print(f"  primary calls over 40 requests: {primary.calls} (breaker {primary.breaker.state})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--primary-ms", type=float, default=60)
+    parser.add_argument("--secondary-ms", type=float, default=120)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=1500)
+    parser.add_argument("--fail-prob", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+Ingestion store for the past_papers section of history_data.json.
+
+The ingestion scripts (scrape_past_papers.py, populate_past_papers.py)
+write through IngestStore instead of rewriting the file themselves:
+
+  - upsert_paper() merges one paper's mark-scheme entries into
+    past_papers[year][season][paper]. Entries are matched by normalized
+    question text and marks, so a run only adds, updates or removes the
+    entries it owns (tagged with its source); entries from other sources
+    in the same paper are left alone. An empty entry list never removes
+    anything, and callers that only have part of a paper pass prune=False.
+  - commit() publishes to the backend's data file by writing a temporary
+    file in the same directory and renaming it over the old one, so the
+    backend's watcher never sees half a file, and appends one line per
+    changed paper to the change journal (DATA_FILE.journal.jsonl).
+    Nothing is written when nothing changed.
+
+Used as a context manager, the store commits on a clean exit.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+DATA_FILE = os.path.join(BACKEND_DIR, "history_data.json")
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+def journal_path(data_file: str) -> str:
+    return os.path.splitext(data_file)[0] + ".journal.jsonl"
+
+
+def entry_keys(entries: list) -> list:
+    """Match key per entry: normalized question, marks and occurrence (for repeated questions)."""
+    seen = {}
+    keys = []
+    for entry in entries:
+        marks = entry.get("marks", entry.get("total_marks"))  # scraped entries carry total_marks
+        base = (_SPACE_RE.sub(" ", entry.get("question", "").lower()).strip(), marks)
+        seen[base] = seen.get(base, -1) + 1
+        keys.append(base + (seen[base],))
+    return keys
+
+
+class IngestStore:
+    def __init__(self, data_file: str = DATA_FILE):
+        self.data_file = data_file
+        self.journal_file = journal_path(data_file)
+        self.data = None
+        self.changes = []  # journal records for this session, written on commit
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+    def load(self):
+        if self.data is None:
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        return self.data
+
+    def paper(self, year: str, season: str, paper: str = "paper_1") -> list:
+        """Current entries of one paper (empty if absent)."""
+        return self.load().get("past_papers", {}).get(year, {}).get(season, {}).get(paper, {}).get("mark_scheme", [])
+
+    def upsert_paper(self, year: str, season: str, paper: str, entries: list, source: str,
+                     prune: bool = True) -> dict:
+        """
+        Merges entries (tagged with source) into one paper. With prune, existing
+        entries of the same source that are not in entries are removed; an empty
+        entries list is never pruned against, since it means the source has
+        nothing for this paper in this run rather than that it was emptied.
+        Returns the counts {added, updated, removed, unchanged}.
+        """
+        prune = prune and bool(entries)
+        past_papers = self.load().setdefault("past_papers", {})
+        content = past_papers.setdefault(year, {}).setdefault(season, {}).setdefault(paper, {})
+        current = content.get("mark_scheme", [])
+        incoming = [dict(entry, source=source) for entry in entries]
+        incoming_by_key = dict(zip(entry_keys(incoming), incoming))
+
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        merged = []
+        for key, entry in zip(entry_keys(current), current):
+            new = incoming_by_key.pop(key, None)
+            if new is None:
+                if prune and entry.get("source") == source:
+                    counts["removed"] += 1
+                else:
+                    merged.append(entry)
+            elif new == entry:
+                counts["unchanged"] += 1
+                merged.append(entry)
+            else:
+                counts["updated"] += 1
+                merged.append(new)
+        merged.extend(incoming_by_key.values())
+        counts["added"] = len(incoming_by_key)
+
+        content["mark_scheme"] = merged
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            self.changes.append({"paper": f"{year}/{season}/{paper}", "source": source, **counts})
+        return counts
+
+    def commit(self) -> int:
+        """Publishes the data and journals the changes. Returns the number of papers changed."""
+        if not self.changes:
+            return 0
+        payload = json.dumps(self.data, indent=2, ensure_ascii=False).encode("utf-8")
+        directory = os.path.dirname(os.path.abspath(self.data_file))
+        partial = os.path.join(directory, f".{os.path.basename(self.data_file)}.{os.getpid()}.part")
+        with open(partial, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.data_file)
+
+        digest = hashlib.sha256(payload).hexdigest()
+        at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            for change in self.changes:
+                f.write(json.dumps({"at": at, **change, "sha256": digest}, ensure_ascii=False) + "\n")
+        changed = len(self.changes)
+        self.changes = []
+        return changed
@@ -0,0 +1,248 @@
+"""
+/ask-ai Load Test
+=================
+End-to-end load test of the real backend against the mock LLM server
+(scripts/mock_llm_server.py). Both are started as subprocesses on free
+ports: the backend is pointed at the mock via GROQ_BASE_URL / HF_MODEL and
+runs with the answer cache and request coalescing disabled, so every
+request does retrieval, prompt building and a full provider round trip.
+With --coalesce, concurrent identical questions share one round trip as
+they do in production (COALESCE_REQUESTS=1); the results record which.
+
+Each RPS level is an open-loop run: requests are sent on a fixed schedule
+for --duration seconds whether or not earlier ones have finished, so
+queueing shows up as latency rather than as a lower send rate. For every
+level the suite records achieved throughput, p50/p95/p99 latency (and
+time to first token with --stream) and the error rate, and writes them
+all to a JSON results file for comparison across changes.
+
+An answer counts as an error when the HTTP status is not 200, the
+connection fails, or the backend returned its "engines offline/error"
+text instead of an answer.
+
+Run from the History/ root directory:
+    python scripts/load_test_ask_ai.py [--rps 5,10,20,40] [--duration 10] [--out load_test_results.json]
+    python scripts/load_test_ask_ai.py --target http://127.0.0.1:8000   # already-running backend
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+QUESTIONS = [
+    "Why was the Simon Commission rejected?",
+    "Explain the causes of the decline of the Mughal Empire.",
+    "Why did the War of Independence of 1857 fail?",
+    "What were Jinnah's Fourteen Points?",
+    "Explain why the Khilafat Movement failed.",
+    "How successful was the Cripps Mission of 1942?",
+    "Why was Bengal partitioned in 1905?",
+    "Describe the work of Sir Syed Ahmad Khan.",
+]
+MARKS = [4, 7, 14]
+ERROR_PREFIXES = ("Error with all intelligence engines", "Intelligence engines")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, proc, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_stack(args):
+    """Starts the mock provider server and the backend; returns (backend URL, mock URL, processes)."""
+    mock_port, backend_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "scripts", "mock_llm_server.py"),
+        "--port", str(mock_port), "--seed", str(args.seed),
+        "--ttft-ms", str(args.ttft_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+        "--answer-tokens", str(args.answer_tokens), "--error-rate", str(args.error_rate),
+        "--midstream-error-rate", str(args.midstream_error_rate),
+    ])
+    wait_for(f"{mock_url}/mock/stats", mock)
+
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": "mock", "GROQ_BASE_URL": mock_url,
+        "HF_API_KEY": "mock", "HF_MODEL": f"{mock_url}/hf/generate",
+        "ANSWER_CACHE_MAX_BYTES": "0", "ANSWER_CACHE_DB": "",
+        "SEMANTIC_CACHE_THRESHOLD": "", "KNOWLEDGE_WATCH_INTERVAL": "0",
+        # all load comes from one client IP; the per-client limiter would answer most of it with 429
+        "CLIENT_RPM": "0",
+        "COALESCE_REQUESTS": "1" if args.coalesce else "0",
+    })
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(backend_port), "--log-level", "warning"],
+        cwd=os.path.join(ROOT, "backend"), env=env,
+    )
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    wait_for(f"{backend_url}/cache/stats", backend)
+    return backend_url, mock_url, [backend, mock]
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+async def one_request(client, i, stream):
+    """Returns (ok, latency seconds, time to first token seconds or None)."""
+    data = {"query": QUESTIONS[i % len(QUESTIONS)], "marks": MARKS[i % len(MARKS)]}
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if not stream:
+            r = await client.post("/ask-ai", data=data)
+            ok = r.status_code == 200 and not r.json()["answer"].startswith(ERROR_PREFIXES)
+            return ok, time.perf_counter() - start, None
+        ok = False
+        async with client.stream("POST", "/ask-ai/stream", data=data) as r:
+            if r.status_code != 200:
+                return False, time.perf_counter() - start, None
+            event = None
+            async for line in r.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                    if event == "token" and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif event == "done":
+                        ok = True
+                    elif event == "error":
+                        ok = False
+        return ok, time.perf_counter() - start, ttft
+    except httpx.HTTPError:
+        return False, time.perf_counter() - start, ttft
+
+
+async def run_level(client, rps, duration, stream):
+    total = max(1, int(rps * duration))
+    start = time.perf_counter()
+
+    async def scheduled(i):
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await one_request(client, i, stream)
+
+    results = await asyncio.gather(*(scheduled(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies = [lat for ok, lat, _ in results if ok]
+    ttfts = [t for ok, _, t in results if ok and t is not None]
+    errors = sum(1 for ok, _, _ in results if not ok)
+    level = {
+        "target_rps": rps,
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "error_rate": round(errors / total, 4),
+        "latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                       "p99": percentile(latencies, 0.99)},
+    }
+    if stream:
+        level["ttft_ms"] = {"p50": percentile(ttfts, 0.5), "p95": percentile(ttfts, 0.95),
+                            "p99": percentile(ttfts, 0.99)}
+    return level
+
+
+async def run(args, backend_url, mock_url):
+    levels = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=backend_url, limits=limits, timeout=timeout) as client:
+        # Warm-up so imports, the knowledge base and provider connections are not measured
+        await asyncio.gather(*(one_request(client, i, args.stream) for i in range(4)))
+        if mock_url:
+            httpx.post(f"{mock_url}/mock/reset")
+        print(f"{'target rps':>10} {'achieved':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for rps in args.rps:
+            level = await run_level(client, rps, args.duration, args.stream)
+            if mock_url:
+                level["mock"] = httpx.get(f"{mock_url}/mock/stats").json()
+                httpx.post(f"{mock_url}/mock/reset")
+            lat = level["latency_ms"]
+            print(f"{rps:>10g} {level['throughput_rps']:>9.2f} {lat['p50'] or 0:>8.1f} "
+                  f"{lat['p95'] or 0:>8.1f} {lat['p99'] or 0:>8.1f} {level['error_rate']:>7.1%}")
+            levels.append(level)
+    return levels
+
+
+def main(args):
+    procs = []
+    mock_url = None
+    try:
+        if args.target:
+            backend_url = args.target.rstrip("/")
+        else:
+            backend_url, mock_url, procs = start_stack(args)
+        levels = asyncio.run(run(args, backend_url, mock_url))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "endpoint": "/ask-ai/stream" if args.stream else "/ask-ai",
+        "target": args.target or "local backend + mock providers",
+        "duration_s": args.duration,
+        "coalesce": None if args.target else args.coalesce,
+        "mock": None if args.target else {
+            "ttft_ms": args.ttft_ms, "tokens_per_sec": args.tokens_per_sec,
+            "answer_tokens": args.answer_tokens, "error_rate": args.error_rate,
+            "midstream_error_rate": args.midstream_error_rate, "seed": args.seed,
+        },
+        "levels": levels,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", default="5,10,20,40", help="comma-separated request rates")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--stream", action="store_true", help="drive /ask-ai/stream and record time to first token")
+    parser.add_argument("--out", default="load_test_results.json")
+    parser.add_argument("--target", help="URL of an already-running backend (skips starting the mock stack)")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="let concurrent identical questions share a provider call (local stack only)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout")
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--midstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=2059)
+    args = parser.parse_args()
+    args.rps = [float(x) for x in args.rps.split(",")]
+    main(args)
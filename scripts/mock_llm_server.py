@@ -0,0 +1,289 @@
+"""
+Mock LLM Provider Server
+========================
+A local stand-in for the two engines behind /ask-ai, so the backend can be
+exercised end to end without API keys or network access:
+
+  POST /openai/v1/chat/completions   Groq (OpenAI-style) chat completions,
+                                     plain JSON or SSE chunks with stream=true
+  POST /hf/generate                  Hugging Face TGI text-generation,
+                                     plain JSON or SSE tokens with stream=true
+
+Behaviour is scriptable from the command line and at runtime through
+POST /mock/config (JSON with any of the fields below, optionally scoped
+to one protocol with "provider": "groq" | "hf"):
+
+  ttft_ms            time to first token
+  jitter             lognormal sigma applied to ttft_ms (0 = fixed)
+  tokens_per_sec     generation rate after the first token
+  answer_tokens      words in the canned answer (scaled up for 7/14 marks)
+  error_rate         probability of failing before the first token
+  error_status       HTTP status used for those failures (429, 500, 503, ...)
+  midstream_error_rate  probability of dropping a stream after the first token
+  prefill_ms_per_1k  extra first-token delay per 1000 prompt tokens not served
+                     from the prefix cache (0 = prompt length is free)
+
+The prefix cache mimics provider-side KV reuse: prompts are hashed in
+PREFIX_BLOCK_CHARS blocks, each chained to the blocks before it, and a
+request only pays prefill for the blocks after its longest cached prefix.
+Groq responses report the hit as usage.prompt_tokens_details.cached_tokens.
+
+GET /mock/stats returns request, error, token and prompt-cache counters
+per protocol; POST /mock/reset zeroes them and empties the prefix cache.
+
+Point the backend at it with:
+    GROQ_API_KEY=mock GROQ_BASE_URL=http://127.0.0.1:9100
+    HF_API_KEY=mock HF_MODEL=http://127.0.0.1:9100/hf/generate
+
+Run from the History/ root directory:
+    python scripts/mock_llm_server.py [--port 9100] [--ttft-ms 300] [--tokens-per-sec 250] [--error-rate 0.01]
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import OrderedDict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SETTINGS = ("ttft_ms", "jitter", "tokens_per_sec", "answer_tokens", "error_rate",
+            "error_status", "midstream_error_rate", "prefill_ms_per_1k")
+PREFIX_BLOCK_CHARS = 256
+PREFIX_CACHE_BLOCKS = 8192
+CHARS_PER_TOKEN = 4
+
+ANSWER_BODY = (
+    "The Simon Commission was rejected because it contained no Indian members, which Congress "
+    "and the Muslim League both saw as an insult to Indian opinion. This led to nationwide "
+    "protests and the Nehru Report, which in turn provoked Jinnah's Fourteen Points. "
+)
+MARKS_RE = re.compile(r'Answer for (\d+) marks')
+
+app = FastAPI(title="Mock LLM providers")
+rng = random.Random()
+request_ids = itertools.count(1)
+
+
+def default_config(args=None):
+    return {
+        "ttft_ms": getattr(args, "ttft_ms", 300.0),
+        "jitter": getattr(args, "jitter", 0.25),
+        "tokens_per_sec": getattr(args, "tokens_per_sec", 250.0),
+        "answer_tokens": getattr(args, "answer_tokens", 120),
+        "error_rate": getattr(args, "error_rate", 0.0),
+        "error_status": getattr(args, "error_status", 503),
+        "midstream_error_rate": getattr(args, "midstream_error_rate", 0.0),
+        "prefill_ms_per_1k": getattr(args, "prefill_ms_per_1k", 0.0),
+    }
+
+
+def empty_stats():
+    return {"requests": 0, "streams": 0, "errors": 0, "midstream_errors": 0, "tokens": 0,
+            "prompt_tokens": 0, "cached_prompt_tokens": 0}
+
+
+config = {"groq": default_config(), "hf": default_config()}
+stats = {"groq": empty_stats(), "hf": empty_stats()}
+prefix_cache = OrderedDict()  # chained block hash -> None, in LRU order
+
+
+def prefill(provider, prompt):
+    """Returns (prompt tokens, cached prompt tokens) and stores the prompt's blocks in the prefix cache."""
+    cached_blocks = 0
+    missed = False
+    h = 0
+    for start in range(0, len(prompt) - PREFIX_BLOCK_CHARS + 1, PREFIX_BLOCK_CHARS):
+        h = hash((h, prompt[start:start + PREFIX_BLOCK_CHARS]))
+        if not missed and h in prefix_cache:
+            prefix_cache.move_to_end(h)
+            cached_blocks += 1
+            continue
+        missed = True
+        prefix_cache[h] = None
+        if len(prefix_cache) > PREFIX_CACHE_BLOCKS:
+            prefix_cache.popitem(last=False)
+    tokens = len(prompt) // CHARS_PER_TOKEN
+    cached = cached_blocks * PREFIX_BLOCK_CHARS // CHARS_PER_TOKEN
+    stats[provider]["prompt_tokens"] += tokens
+    stats[provider]["cached_prompt_tokens"] += cached
+    return tokens, cached
+
+
+def answer_words(prompt, settings):
+    """Canned examiner answer, longer for higher-mark questions, ending in the audit footer."""
+    match = MARKS_RE.search(prompt)
+    marks = int(match.group(1)) if match else 4
+    n = int(settings["answer_tokens"] * {4: 1, 7: 1.75, 14: 3.5}.get(marks, 1))
+    body = list(itertools.islice(itertools.cycle(ANSWER_BODY.split()), n))
+    words = [w + " " for w in body]
+    words.append(f"\n\n[EXAMINER AUDIT: {marks}/{marks}]\nBand Level: Level 4\nReason: Explained with support.")
+    return words
+
+
+def first_token_delay(settings, uncached_tokens=0):
+    base = settings["ttft_ms"] / 1000
+    if settings["jitter"]:
+        base *= rng.lognormvariate(0, settings["jitter"])
+    return base + settings["prefill_ms_per_1k"] * uncached_tokens / 1_000_000
+
+
+def injected_error(provider, settings):
+    if rng.random() < settings["error_rate"]:
+        stats[provider]["errors"] += 1
+        status = int(settings["error_status"])
+        return JSONResponse({"error": {"message": f"mock {provider} error", "type": "mock_error"}}, status_code=status)
+    return None
+
+
+async def paced(provider, words, settings):
+    """Yields words at tokens_per_sec, optionally failing after the first one."""
+    interval = 1 / settings["tokens_per_sec"] if settings["tokens_per_sec"] > 0 else 0
+    fail_at = rng.randrange(1, len(words)) if rng.random() < settings["midstream_error_rate"] and len(words) > 1 else None
+    for i, word in enumerate(words):
+        if i == fail_at:
+            stats[provider]["midstream_errors"] += 1
+            raise ConnectionError("mock stream dropped")
+        if i and interval:
+            await asyncio.sleep(interval)
+        stats[provider]["tokens"] += 1
+        yield word
+
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat(request: Request):
+    body = await request.json()
+    settings = config["groq"]
+    stats["groq"]["requests"] += 1
+    prompt = "".join(f"<|{m.get('role')}|>\n{m.get('content', '')}\n" for m in body.get("messages", []))
+    prompt_tokens, cached_tokens = prefill("groq", prompt)
+    await asyncio.sleep(first_token_delay(settings, prompt_tokens - cached_tokens))
+    error = injected_error("groq", settings)
+    if error:
+        return error
+
+    words = answer_words(prompt, settings)
+    completion_id = f"chatcmpl-mock-{next(request_ids)}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+             "total_tokens": prompt_tokens + len(words),
+             "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+    if not body.get("stream"):
+        text = "".join([w async for w in paced("groq", words, {**settings, "midstream_error_rate": 0})])
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    stats["groq"]["streams"] += 1
+
+    def chunk(delta, finish=None, **extra):
+        return "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra,
+        }) + "\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        async for word in paced("groq", words, settings):
+            yield chunk({"content": word})
+        yield chunk({}, "stop", x_groq={"id": completion_id, "usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/hf/generate")
+async def hf_generate(request: Request):
+    body = await request.json()
+    settings = config["hf"]
+    stats["hf"]["requests"] += 1
+    prompt_tokens, cached_tokens = prefill("hf", body.get("inputs", ""))
+    await asyncio.sleep(first_token_delay(settings, prompt_tokens - cached_tokens))
+    error = injected_error("hf", settings)
+    if error:
+        return error
+
+    words = answer_words(body.get("inputs", ""), settings)
+    if not body.get("stream"):
+        text = "".join([w async for w in paced("hf", words, {**settings, "midstream_error_rate": 0})])
+        return [{"generated_text": text}]
+
+    stats["hf"]["streams"] += 1
+
+    async def events():
+        generated = []
+        async for word in paced("hf", words, settings):
+            generated.append(word)
+            last = len(generated) == len(words)
+            yield "data:" + json.dumps({
+                "index": len(generated),
+                "token": {"id": len(generated), "text": word, "logprob": -0.1, "special": False},
+                "generated_text": "".join(generated) if last else None,
+                "details": None,
+            }) + "\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/mock/config")
+async def set_config(request: Request):
+    update = await request.json()
+    targets = [update.pop("provider")] if "provider" in update else list(config)
+    unknown = set(update) - set(SETTINGS)
+    if unknown:
+        return JSONResponse({"error": f"unknown settings: {sorted(unknown)}"}, status_code=400)
+    for target in targets:
+        config[target].update(update)
+    return config
+
+
+@app.get("/mock/config")
+async def get_config():
+    return config
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/mock/reset")
+async def reset_stats():
+    for provider in stats:
+        stats[provider] = empty_stats()
+    prefix_cache.clear()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.25, help="lognormal sigma on the first-token delay")
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--answer-tokens", type=int, default=120, help="words in a 4-mark answer")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--midstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0,
+                        help="first-token delay per 1000 uncached prompt tokens")
+    parser.add_argument("--prefix-cache-blocks", type=int, default=PREFIX_CACHE_BLOCKS,
+                        help="prefix cache capacity in PREFIX_BLOCK_CHARS blocks")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--keep-alive", type=float, default=5.0,
+                        help="seconds an idle client connection stays open (uvicorn's default is 5)")
+    args = parser.parse_args()
+    rng.seed(args.seed)
+    PREFIX_CACHE_BLOCKS = args.prefix_cache_blocks
+    config = {"groq": default_config(args), "hf": default_config(args)}
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", timeout_keep_alive=args.keep_alive)
@@ -0,0 +1,193 @@
+"""
+Past Paper Fixture Server
+=========================
+A local stand-in for GCE Guide, so scrape_past_papers.py can be run and
+tested offline. Serves every PDF in --dir at the URL the scraper builds:
+
+  GET /{year}/{filename}.pdf     the file {dir}/{filename}.pdf (year is ignored)
+  GET /stats                     requests, bytes sent and injected errors
+  POST /reset                    zeroes the counters
+
+With --generate, every paper in scrape_past_papers.PAPERS that is missing
+from --dir is first written as a small synthetic PDF - a question paper
+with 4-, 7- and 14-mark questions or a mark scheme with bullet points -
+so a full offline run needs no real papers. --latency and --error-rate
+make downloads slow or flaky to exercise the concurrency, retries and
+resume of the pipeline.
+
+Point the scraper at it with:
+    python scripts/scrape_past_papers.py --base-url http://127.0.0.1:9200
+
+Run from the History/ root directory:
+    python scripts/paper_fixture_server.py --dir data/fixture_papers --generate [--port 9200] [--latency 0.2]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from scrape_past_papers import PAPERS
+
+QUESTIONS = [
+    ("Describe the terms of the Simon Commission of 1927.", 4),
+    ("Explain why the Khilafat Movement failed.", 7),
+    ("'The Cripps Mission of 1942 was the most important reason for the failure of British attempts "
+     "to reach agreement with Indian parties.' How far do you agree? Explain your answer.", 14),
+]
+POINTS = [
+    ["No Indian members were appointed to the Commission", "It was to report on constitutional reform",
+     "Led by Sir John Simon and arrived in India in 1928"],
+    ["Turkey abolished the Caliphate itself in 1924", "The Chauri Chaura incident made Gandhi call off protest",
+     "Hijrat movement to Afghanistan ended in hardship", "Award 2 marks for each developed explanation"],
+    ["Cripps offered dominion status only after the war", "Congress rejected it as a post-dated cheque",
+     "Quit India Movement followed its failure", "Credit balanced answers that consider other factors",
+     "Do not award above Level 3 without a judgement"],
+]
+
+stats = {"requests": 0, "bytes": 0, "errors": 0, "missing": 0}
+stats_lock = threading.Lock()
+
+
+def pdf_bytes(pages):
+    """A minimal PDF with one text page per list of lines (Helvetica, 11pt)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def wrap(text, width=90):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return lines + [line]
+
+
+def synthetic_paper(filename):
+    """Pages of a synthetic question paper (_qp_) or mark scheme (_ms_)."""
+    header = [f"Cambridge O Level History 2059 paper {filename}", ""]
+    if "_qp_" in filename:
+        pages = []
+        for num, (question, marks) in enumerate(QUESTIONS, 1):
+            lines = wrap(f"{num} {question} [{marks}]")
+            pages.append(header + lines)
+        return pages
+    pages = []
+    for num, ((question, marks), points) in enumerate(zip(QUESTIONS, POINTS), 1):
+        lines = header + [str(num)] + wrap(question)[:2] + [f"- {point}" for point in points] + [f"[{marks}]"]
+        pages.append(lines)
+    return pages
+
+
+def generate(directory):
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for _year, _season, filename in PAPERS:
+        path = os.path.join(directory, f"{filename}.pdf")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(pdf_bytes(synthetic_paper(filename)))
+            written += 1
+    return written
+
+
+class Handler(BaseHTTPRequestHandler):
+    directory = "."
+    latency = 0.0
+    error_rate = 0.0
+    rng = random.Random()
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            return self._json(stats)
+        with stats_lock:
+            stats["requests"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            with stats_lock:
+                stats["errors"] += 1
+            return self._json({"error": "injected"}, 503)
+        name = os.path.basename(self.path.split("?")[0])
+        path = os.path.join(self.directory, name)
+        if not name.endswith(".pdf") or not os.path.isfile(path):
+            with stats_lock:
+                stats["missing"] += 1
+            return self._json({"error": "not found"}, 404)
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with stats_lock:
+            stats["bytes"] += len(body)
+
+    def do_POST(self):
+        if self.path == "/reset":
+            with stats_lock:
+                for key in stats:
+                    stats[key] = 0
+            return self._json(stats)
+        self._json({"error": "not found"}, 404)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", required=True, help="directory of fixture PDFs named like 2059_s24_qp_1.pdf")
+    parser.add_argument("--generate", action="store_true", help="write synthetic PDFs for missing PAPERS first")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of answering 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.generate:
+        print(f"Generated {generate(args.dir)} synthetic PDFs in {args.dir}")
+    Handler.directory = args.dir
+    Handler.latency = args.latency
+    Handler.error_rate = args.error_rate
+    Handler.rng.seed(args.seed)
+    print(f"Serving {args.dir} on http://{args.host}:{args.port}")
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
@@ -0,0 +1,152 @@
+"""
+Question paper and mark scheme parsers for scrape_past_papers.py.
+
+Every pattern is compiled once at import. Both parsers walk the extracted
+text left to right once:
+
+  parse_question_paper  a tokenizer over "[N]" mark tokens, other "["
+                        brackets and the question keywords; a question runs
+                        from the first keyword after the previous question
+                        to its "[N]"
+  parse_mark_scheme     one sweep for the numbered block headers; each
+                        block is then scanned for its bullets, "Award ..."
+                        lines and mark total
+
+The output is the same as the original regex-per-call parsers (checked
+against scripts/fixtures/papers by scripts/check_paper_parsers.py).
+No third-party imports, so the checks and scripts/bench_paper_parsers.py
+run without pdfplumber or requests.
+"""
+
+import re
+
+WS_RE = re.compile(r'\s+')
+
+# ── Question paper ──
+# Question stems: "Describe ...", "Explain why ...", quoted essay prompts, ...
+QP_KEYWORDS = r'Describe|Explain|How|Why|Assess|Was|To what extent|"[^"]+"'
+# Looking for a question start: a keyword, or a bracket that ends the current segment. The leading
+# lookahead on the possible first characters lets the regex engine skip everything else quickly.
+QP_SEEK_RE = re.compile(r'(?=[\["DEHWATdehwat])(?:(?P<mark>\[(?P<marks>\d+)\])|(?P<open>\[)|(?P<start>'
+                        + QP_KEYWORDS + r'))', re.IGNORECASE)
+# Inside a question: the next bracket, which must be its "[N]"
+QP_BOUND_RE = re.compile(r'\[(?:(\d+)\])?')
+# Fallback for papers without [N] marks: any line mentioning one of these
+QP_FALLBACK_RE = re.compile(r'describe|explain|how|why|assess|was |what extent|compare|important', re.IGNORECASE)
+TRAILING_MARKS_RE = re.compile(r'\[(\d+)\]\s*$')
+
+# ── Mark scheme ──
+# Cambridge blocks start with a line holding only the question number, e.g. "1" or "2 (a)"
+MS_HEADER_RE = re.compile(r'(?m)^(\d+)\s*(?:\([ab]\))?\s*\n')
+# Fallback: any line starting with a number
+MS_LOOSE_BLOCK_RE = re.compile(r'(?:^|\n)(\d+)\b(.*?)(?=\n\d+\b|\Z)', re.DOTALL)
+BULLET_RE = re.compile(r'[•\-–]\s*([^\n•\-–]+)')
+AWARD_RE = re.compile(r'Award\s+\d+\s+marks?\s+for\s+([^\n]+)', re.IGNORECASE)
+NUMBERED_RE = re.compile(r'(?m)^\s*\d+[\.\)]\s*(.+)$')
+MARK_TOTAL_RE = re.compile(r'\[(\d+)\]|\((\d+)\s*marks?\)', re.IGNORECASE)
+
+
+def _question_spans(text: str):
+    """Yields (question text, marks) for every keyword ... [N] run, in order."""
+    pos = 0
+    while True:
+        token = QP_SEEK_RE.search(text, pos)
+        if token is None:
+            return
+        if token.lastgroup != "start":
+            pos = token.end()
+            continue
+        bound = QP_BOUND_RE.search(text, token.end())
+        if bound is not None and bound.group(1) is not None and bound.start() > token.end():
+            yield text[token.start():bound.start()], bound.group(1)
+            pos = bound.end()
+        elif token.group()[0] == '"':
+            # A quote can hide a bracket, so a later start inside it may still succeed
+            pos = token.start() + 1
+        elif bound is None:
+            return
+        else:
+            # Every start before this bracket fails the same way, unless a quote spans it
+            quote = text.find('"', token.start() + 1, bound.start())
+            pos = quote if quote != -1 else bound.start()
+
+
+def parse_question_paper(text: str, year: str, season_label: str) -> list:
+    """
+    Parse a question paper PDF text to extract questions.
+    Returns a list of dicts: {question_num, marks, question_text}
+    """
+    questions = []
+    # O-Level Hist 2059 Paper 1: 4-mark (describe), 7-mark (explain why) and 14-mark (essay) questions
+    for i, (q_text, marks) in enumerate(_question_spans(text), 1):
+        q_text = WS_RE.sub(' ', q_text.strip())
+        if len(q_text) > 15:  # skip tiny fragments
+            questions.append({
+                "question_num": i,
+                "question": q_text,
+                "marks": int(marks),
+                "year": year,
+                "season": season_label
+            })
+
+    # Fallback: line-by-line keyword search
+    if not questions:
+        q_num = 0
+        for line in text.split('\n'):
+            line = line.strip()
+            if len(line) > 20 and QP_FALLBACK_RE.search(line):
+                q_num += 1
+                mark_match = TRAILING_MARKS_RE.search(line)
+                questions.append({
+                    "question_num": q_num,
+                    "question": TRAILING_MARKS_RE.sub('', line).strip(),
+                    "marks": int(mark_match.group(1)) if mark_match else 4,
+                    "year": year,
+                    "season": season_label
+                })
+
+    return questions
+
+
+def _scheme_blocks(text: str):
+    """Yields (question number, block text) between consecutive block headers."""
+    headers = list(MS_HEADER_RE.finditer(text))
+    if not headers:
+        yield from MS_LOOSE_BLOCK_RE.findall(text)
+        return
+    for header, following in zip(headers, headers[1:] + [None]):
+        yield header.group(1), text[header.end():following.start() if following else len(text)]
+
+
+def parse_mark_scheme(text: str, year: str, season_label: str) -> list:
+    """
+    Parse a mark scheme PDF text to extract marking points.
+    Returns list of dicts: {question, points, total_marks}
+    """
+    mark_entries = []
+    for q_num, block_text in _scheme_blocks(text):
+        # Bullet/dash points, then "Award X marks for ..." lines
+        points = [pt for pt in (WS_RE.sub(' ', m.group(1).strip()) for m in BULLET_RE.finditer(block_text))
+                  if len(pt) > 10]
+        points.extend("Award: " + m.group(1).strip() for m in AWARD_RE.finditer(block_text))
+        # Indicative content as a numbered list (1. 2. 3.)
+        if not points:
+            points = [pt for pt in (m.group(1).strip() for m in NUMBERED_RE.finditer(block_text)) if len(pt) > 10]
+        if not points:
+            continue
+
+        mark_match = MARK_TOTAL_RE.search(block_text)
+        total_marks = int(mark_match.group(1) or mark_match.group(2)) if mark_match else 4
+        # Question text from the block header
+        question_hint = ' '.join(block_text.strip().split('\n')[:3]).strip()[:200]
+
+        mark_entries.append({
+            "question_num": int(q_num),
+            "question": question_hint,
+            "points": points[:15],  # max 15 marking points
+            "total_marks": total_marks,
+            "year": year,
+            "season": season_label
+        })
+
+    return mark_entries
@@ -9,10 +9,9 @@ Run from the History/ root directory:
     python scripts/populate_past_papers.py
 """
 
-import json
 import os
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "history_data.json")
+from ingest_store import DATA_FILE, IngestStore
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CURATED CAMBRIDGE O-LEVEL HISTORY 2059 PAST PAPER DATA (2002-2025)
@@ -423,42 +422,27 @@ def populate_past_papers():
         print(f"ERROR: {DATA_FILE} not found!")
         return
 
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # Deep merge: year -> season -> paper_1 -> mark_scheme
-    # We want to keep existing data while adding new years
-    existing = data.get("past_papers", {})
-    
-    # Merge curated data
-    for year, seasons in PAST_PAPERS.items():
-        if year not in existing:
-            existing[year] = {}
-        for season, papers in seasons.items():
-            if season not in existing[year]:
-                existing[year][season] = {}
-            # Standardizing to paper_1
-            existing[year][season]["paper_1"] = papers["paper_1"]
-
-    data["past_papers"] = existing
-
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Per-paper upsert: curated entries are matched by question and marks,
+    # scraped entries in the same paper are kept
+    with IngestStore(DATA_FILE) as store:
+        print("\nCurated past papers (2002-2025):")
+        print("-" * 50)
+        for year, seasons in PAST_PAPERS.items():
+            for season, papers in seasons.items():
+                counts = store.upsert_paper(year, season, "paper_1", papers["paper_1"]["mark_scheme"], source="curated")
+                changes = ", ".join(f"{n} {key}" for key, n in counts.items() if n and key != "unchanged")
+                print(f"  {year} {season.replace('_', ' ')}: {changes or 'unchanged'}")
+        changed = len(store.changes)
+        existing = store.load()["past_papers"]
 
     # Report
     total_q = 0
-    print("\nCurated past papers written (2002-2025):")
-    print("-" * 50)
-    for year in sorted(existing.keys()):
+    for year in existing:
         for season in existing[year]:
-            n = len(existing[year][season].get("paper_1", {}).get("mark_scheme", []))
-            total_q += n
-            if n > 0:
-                print(f"  {year} {season.replace('_', ' ')}: {n} questions")
+            total_q += len(existing[year][season].get("paper_1", {}).get("mark_scheme", []))
     print("-" * 50)
     print(f"  TOTAL: {total_q} mark-scheme entries in database")
-    print("\nDone! history_data.json updated.")
-
+    print(f"\nDone! {changed} paper(s) changed in history_data.json." if changed else "\nDone! Nothing to change.")
 
 if __name__ == "__main__":
     populate_past_papers()
@@ -5,8 +5,22 @@ Downloads question papers & mark schemes from GCE Guide,
 extracts text with pdfplumber, parses Q&A pairs, and
 populates the 'past_papers' section of history_data.json.
 
+The stages run as a pipeline: downloads share one pooled HTTP session
+with a bounded number in flight, each finished PDF goes straight to a
+process pool for text extraction, and parsing runs as extractions land.
+Every finished stage is recorded in DOWNLOAD_DIR/manifest.json, so a
+crashed or interrupted run picks up where it stopped; --redo reruns a
+stage (and the ones after it) for every paper. Extracted per-page text is
+kept gzip-compressed in EXTRACT_CACHE_DIR, keyed by the SHA-256 of the
+PDF bytes and EXTRACTOR_VERSION, so after a parser change, a lost
+manifest or a re-download of the same file no PDF is parsed by pdfplumber
+twice. Each parse record carries PARSER_VERSION, a hash of
+paper_parsers.py, so editing the parsers reparses every paper without
+--redo parse.
+
 Run from the History/ root directory:
-    python scripts/scrape_past_papers.py
+    python scripts/scrape_past_papers.py [--download-workers 4] [--extract-workers N] [--redo parse]
+    python scripts/scrape_past_papers.py --base-url http://127.0.0.1:9200   # scripts/paper_fixture_server.py
 """
 
 import sys
@@ -18,15 +32,27 @@ import os
 import re
 import json
 import time
+import gzip
+import hashlib
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pdfplumber
 
+from ingest_store import DATA_FILE, IngestStore
+import paper_parsers
+from paper_parsers import parse_mark_scheme, parse_question_paper
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CONFIGURATION
 # ─────────────────────────────────────────────────────────────────────────────
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "history_data.json")
 DOWNLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "downloaded_papers")
+EXTRACT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "extracted_text")
+MANIFEST_NAME = "manifest.json"
+STAGES = ("download", "extract", "parse")
 
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
@@ -87,21 +113,44 @@ HEADERS = {
 # STEP 1: DOWNLOAD PDF
 # ─────────────────────────────────────────────────────────────────────────────
 
-def build_url(year: str, season: str, filename: str) -> str:
+def build_url(year: str, season: str, filename: str, base: str = GCE_BASE) -> str:
     """Build the direct GCE Guide PDF URL."""
-    return f"{GCE_BASE}/{year}/{filename}.pdf"
+    return f"{base}/{year}/{filename}.pdf"
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """One keep-alive session for all downloads, retrying 429/5xx with backoff."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(total=3, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
 
-def download_pdf(url: str, dest_path: str) -> bool:
-    """Download a PDF from url to dest_path. Returns True on success."""
+def download_pdf(session: requests.Session, url: str, dest_path: str) -> bool:
+    """Download a PDF from url to dest_path. Returns True on success.
+    The file is written under a temporary name and renamed, so a crash never leaves half a PDF."""
     if os.path.exists(dest_path):
         print(f"  ✅ Already downloaded: {os.path.basename(dest_path)}")
         return True
     try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
+        response = session.get(url, timeout=30)
         if response.status_code == 200 and b"%PDF" in response.content[:10]:
-            with open(dest_path, "wb") as f:
+            partial = dest_path + ".part"
+            with open(partial, "wb") as f:
                 f.write(response.content)
+            os.replace(partial, dest_path)
             print(f"  ✅ Downloaded: {os.path.basename(dest_path)}")
             return True
         else:
@@ -116,168 +165,62 @@ def download_pdf(url: str, dest_path: str) -> bool:
 # STEP 2: EXTRACT TEXT FROM PDF
 # ─────────────────────────────────────────────────────────────────────────────
 
-def extract_pdf_text(pdf_path: str) -> str:
-    """Extract full text from a PDF using pdfplumber."""
+# Part of the extraction cache key: bump the suffix when extraction changes in a way that alters the text
+EXTRACTOR_VERSION = f"pdfplumber-{pdfplumber.__version__}/1"
+
+
+def extract_pdf_pages(pdf_path: str) -> list:
+    """Per-page text of a PDF using pdfplumber ('' for pages without text); None if it can't be read."""
     try:
         with pdfplumber.open(pdf_path) as pdf:
-            pages_text = []
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    pages_text.append(text)
-            return "\n".join(pages_text)
+            return [page.extract_text() or "" for page in pdf.pages]
     except Exception as e:
         print(f"  ⚠️  pdfplumber error on {pdf_path}: {e}")
-        return ""
+        return None
 
 
-# ─────────────────────────────────────────────────────────────────────────────
-# STEP 3: PARSE QUESTION PAPER
-# ─────────────────────────────────────────────────────────────────────────────
+def pages_to_text(pages: list) -> str:
+    return "\n".join(text for text in pages if text)
 
-def parse_question_paper(text: str, year: str, season_label: str) -> list:
-    """
-    Parse a question paper PDF text to extract questions.
-    Returns a list of dicts: {question_num, marks, question_text}
-    """
-    questions = []
-    
-    # Pattern: "1  (a)  Describe..." or "Question 1" or numbered lines
-    # O-Level Hist 2059 Paper 1 format:
-    # Section A: 4-mark questions (describe / how / why)  
-    # Section B: 7-mark questions
-    # Section C: 14-mark questions
-    
-    patterns = [
-        # Match "1 Describe..." or "1. Describe..."
-        r'(?m)^(\d+)\s*[\.\)]\s*(.+?)(?=^\d+\s*[\.\)]|\Z)',
-        # Match "Question 1" style
-        r'(?m)^(?:Question\s+)?(\d+)\s*\n(.+?)(?=^(?:Question\s+)?\d+\s*\n|\Z)',
-    ]
-    
-    # Try to split by mark indicators [4], [7], [14]
-    mark_pattern = re.compile(
-        r'((?:(?:Describe|Explain|How|Why|Assess|Was|To what extent|\"[^\"]+\")[^\[]+))\[(\d+)\]',
-        re.IGNORECASE | re.DOTALL
-    )
-    
-    matches = mark_pattern.findall(text)
-    for i, (q_text, marks) in enumerate(matches, 1):
-        q_text = q_text.strip()
-        # Clean up whitespace
-        q_text = re.sub(r'\s+', ' ', q_text)
-        if len(q_text) > 15:  # skip tiny fragments
-            questions.append({
-                "question_num": i,
-                "question": q_text,
-                "marks": int(marks),
-                "year": year,
-                "season": season_label
-            })
-    
-    # Fallback: line-by-line keyword search
-    if not questions:
-        lines = text.split('\n')
-        q_num = 0
-        for line in lines:
-            line = line.strip()
-            keywords = ['describe', 'explain', 'how', 'why', 'assess', 'was ', 
-                       'what extent', 'compare', 'important']
-            if any(kw in line.lower() for kw in keywords) and len(line) > 20:
-                q_num += 1
-                # Try to find marks at end of line
-                mark_match = re.search(r'\[(\d+)\]\s*$', line)
-                marks = int(mark_match.group(1)) if mark_match else 4
-                questions.append({
-                    "question_num": q_num,
-                    "question": re.sub(r'\[\d+\]\s*$', '', line).strip(),
-                    "marks": marks,
-                    "year": year,
-                    "season": season_label
-                })
-    
-    return questions
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Extract full text from a PDF using pdfplumber."""
+    return pages_to_text(extract_pdf_pages(pdf_path) or [])
+
+
+def extraction_cache_path(cache_dir: str, pdf_sha256: str) -> str:
+    version = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{pdf_sha256}-{version}.json.gz")
+
+
+def load_extracted_pages(cache_dir: str, pdf_sha256: str) -> list:
+    """Cached per-page text for the PDF with these bytes, or None."""
+    try:
+        with gzip.open(extraction_cache_path(cache_dir, pdf_sha256), "rt", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store_extracted_pages(cache_dir: str, pdf_sha256: str, pages: list):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = extraction_cache_path(cache_dir, pdf_sha256)
+    with gzip.open(path + ".part", "wt", encoding="utf-8") as f:
+        json.dump({"sha256": pdf_sha256, "extractor": EXTRACTOR_VERSION, "pages": pages}, f, ensure_ascii=False)
+    os.replace(path + ".part", path)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# STEP 4: PARSE MARK SCHEME
+# STEP 3 & 4: PARSE QUESTION PAPER AND MARK SCHEME (paper_parsers.py)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def parse_mark_scheme(text: str, year: str, season_label: str) -> list:
-    """
-    Parse a mark scheme PDF text to extract marking points.
-    Returns list of dicts: {question, points, total_marks}
-    """
-    mark_entries = []
-    
-    # ── Pattern 1: Cambridge-style mark scheme blocks ──
-    # "1  (a)  Any TWO of the following: • Point 1 • Point 2..."
-    # or "Award marks for..."
-    
-    # Split into question blocks using question numbers
-    # Cambridge MSs often have: "1 (a)" or just "1" as section headers
-    
-    block_pattern = re.compile(
-        r'(?m)^(\d+)\s*(?:\([ab]\))?\s*\n(.*?)(?=^\d+\s*(?:\([ab]\))?\s*\n|\Z)',
-        re.DOTALL
-    )
-    
-    blocks = block_pattern.findall(text)
-    
-    if not blocks:
-        # Alternative: split by "Question X" or mark award lines
-        block_pattern2 = re.compile(
-            r'(?:^|\n)(\d+)\b(.*?)(?=\n\d+\b|\Z)',
-            re.DOTALL
-        )
-        blocks = block_pattern2.findall(text)
-    
-    for q_num, block_text in blocks:
-        # Extract bullet points (• or –, or numbered)
-        points = []
-        
-        # Find bullet/dash points
-        bullet_re = re.compile(r'[•\-–]\s*([^\n•\-–]+)')
-        for match in bullet_re.finditer(block_text):
-            pt = match.group(1).strip()
-            pt = re.sub(r'\s+', ' ', pt)
-            if len(pt) > 10:
-                points.append(pt)
-        
-        # Also grab "Award X marks for..." lines
-        award_re = re.compile(r'Award\s+\d+\s+marks?\s+for\s+([^\n]+)', re.IGNORECASE)
-        for match in award_re.finditer(block_text):
-            points.append("Award: " + match.group(1).strip())
-        
-        # Look for indicative content lines (numbered 1. 2. 3.)
-        if not points:
-            numbered_re = re.compile(r'(?m)^\s*\d+[\.\)]\s*(.+)$')
-            for match in numbered_re.finditer(block_text):
-                pt = match.group(1).strip()
-                if len(pt) > 10:
-                    points.append(pt)
-        
-        # Detect total marks from block
-        mark_total_re = re.compile(r'\[(\d+)\]|\((\d+)\s*marks?\)', re.IGNORECASE)
-        mark_match = mark_total_re.search(block_text)
-        total_marks = int(mark_match.group(1) or mark_match.group(2)) if mark_match else 4
-        
-        # Try to extract question text from block header
-        q_header_lines = block_text.strip().split('\n')[:3]
-        question_hint = ' '.join(q_header_lines).strip()[:200]
-        
-        if points:
-            mark_entries.append({
-                "question_num": int(q_num),
-                "question": question_hint,
-                "points": points[:15],  # max 15 marking points
-                "total_marks": total_marks,
-                "year": year,
-                "season": season_label
-            })
-    
-    return mark_entries
+def source_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
 
+# Recorded with every parse: a paper parsed by a different paper_parsers.py is parsed again
+PARSER_VERSION = source_hash(paper_parsers.__file__)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # STEP 5: MATCH Q-PAPER + MARK SCHEME 
@@ -351,111 +294,251 @@ def get_season_label(season_code: str) -> str:
 # STEP 7: UPDATE history_data.json
 # ─────────────────────────────────────────────────────────────────────────────
 
-def update_history_data(all_results: dict):
-    """Load history_data.json and populate/update the 'past_papers' section."""
-    print(f"\n📂 Loading: {DATA_FILE}")
-    
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        history_data = json.load(f)
-    
-    # Merge scraped data into past_papers
-    existing_pp = history_data.get("past_papers", {})
-    
-    for year, seasons in all_results.items():
-        if year not in existing_pp:
-            existing_pp[year] = {}
-        for season_label, entries in seasons.items():
-            if season_label not in existing_pp[year]:
-                existing_pp[year][season_label] = {}
-            # Store under paper_1
-            existing_pp[year][season_label]["paper_1"] = {
-                "mark_scheme": entries
-            }
-    
-    history_data["past_papers"] = existing_pp
-    
-    # Write back
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(history_data, f, indent=2, ensure_ascii=False)
-    
+def update_history_data(all_results: dict, data_file: str = DATA_FILE):
+    """Upsert every scraped paper into the 'past_papers' section through the ingestion store."""
+    print(f"\n📂 Loading: {data_file}")
+
+    totals = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    with IngestStore(data_file) as store:
+        for year, seasons in all_results.items():
+            for season_label, entries in seasons.items():
+                # Store under paper_1; curated entries in the same paper are kept
+                counts = store.upsert_paper(year, season_label, "paper_1", entries, source="scraped")
+                for key, n in counts.items():
+                    totals[key] += n
+        changed = len(store.changes)
+
     total_entries = sum(
-        len(seasons[s].get("paper_1", {}).get("mark_scheme", []))
-        for year, seasons in all_results.items()
-        for s in seasons
+        len(entries)
+        for seasons in all_results.values()
+        for entries in seasons.values()
     )
-    print(f"\n✅ Updated history_data.json with {total_entries} mark scheme entries")
-    print(f"   Covering {len(all_results)} years, across multiple seasons.")
+    print(f"\n✅ {total_entries} mark scheme entries across {len(all_results)} years: "
+          f"{totals['added']} added, {totals['updated']} updated, {totals['removed']} removed, "
+          f"{totals['unchanged']} unchanged")
+    print(f"   {changed} paper(s) changed" + (f", journalled in {store.journal_file}" if changed else ", nothing written"))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# STEP 8: STAGE MANIFEST (resume after a crash)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_manifest(path: str) -> dict:
+    """{"papers": {filename: {stage: record}}}; a missing or corrupt file starts afresh."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("papers"), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"papers": {}}
+
+
+def save_manifest(path: str, manifest: dict):
+    """Written to a temporary file and renamed, so a crash mid-write keeps the previous manifest."""
+    partial = path + ".part"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(partial, path)
+
+
+def completed_stage(entry: dict, pdf_path: str, cache_dir: str) -> str:
+    """The last stage of a paper whose record still matches the files on disk (None if none)."""
+    download = entry.get("download")
+    if not download or not os.path.exists(pdf_path) or os.path.getsize(pdf_path) != download["bytes"]:
+        return None
+    extract = entry.get("extract")
+    if (not extract or extract["sha256"] != download["sha256"] or extract.get("extractor") != EXTRACTOR_VERSION
+            or not os.path.exists(extraction_cache_path(cache_dir, download["sha256"]))):
+        return "download"
+    parse = entry.get("parse")
+    if not parse or parse["sha256"] != download["sha256"] or parse.get("parser") != PARSER_VERSION:
+        return "extract"
+    return "parse"
+
+
+def forget_stages(manifest: dict, stage: str):
+    """Drops stage and every later one from all papers, so this run redoes them."""
+    for entry in manifest["papers"].values():
+        for later in STAGES[STAGES.index(stage):]:
+            entry.pop(later, None)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN PIPELINE
 # ─────────────────────────────────────────────────────────────────────────────
 
+def run_pipeline(papers: list, base_url: str, download_dir: str, download_workers: int,
+                 extract_workers: int, redo: str = None, cache_dir: str = EXTRACT_CACHE_DIR) -> dict:
+    """
+    Downloads, extracts and parses every paper, resuming from the manifest.
+    Returns {filename: parsed entries} for the papers that got through all stages.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+    manifest_path = os.path.join(download_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    if redo:
+        forget_stages(manifest, redo)
+        if redo == "download":
+            for _year, _season, filename in papers:
+                pdf_path = os.path.join(download_dir, f"{filename}.pdf")
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+
+    info = {filename: (year, season_code) for year, season_code, filename in papers}
+    paths = {filename: os.path.join(download_dir, f"{filename}.pdf") for filename in info}
+    # --redo extract means run pdfplumber again, not just forget that it ran
+    use_cache = redo != "extract"
+    results = {}
+    skipped = {stage: 0 for stage in STAGES}
+    cache_hits = 0
+    pending = {}  # future -> (stage, filename)
+
+    session = make_session(download_workers)
+    downloads = ThreadPoolExecutor(max_workers=download_workers)
+    extractors = ProcessPoolExecutor(max_workers=extract_workers)
+
+    def parse(filename, pages=None):
+        year, season_code = info[filename]
+        entry = manifest["papers"][filename]
+        if pages is None:
+            pages = load_extracted_pages(cache_dir, entry["download"]["sha256"]) or []
+        text = pages_to_text(pages)
+        season_label = get_season_label(season_code)
+        if "_qp_" in filename:
+            entries = parse_question_paper(text, year, season_label)
+        else:
+            entries = parse_mark_scheme(text, year, season_label)
+        entry["parse"] = {"sha256": entry["download"]["sha256"], "parser": PARSER_VERSION, "entries": entries}
+        save_manifest(manifest_path, manifest)
+        results[filename] = entries
+        print(f"  -> Parsed {len(entries)} {'questions' if '_qp_' in filename else 'mark scheme entries'} "
+              f"from {filename}")
+
+    def extracted(filename, pages):
+        entry = manifest["papers"][filename]
+        entry["extract"] = {"sha256": entry["download"]["sha256"], "extractor": EXTRACTOR_VERSION,
+                            "pages": len(pages), "chars": sum(map(len, pages))}
+        save_manifest(manifest_path, manifest)
+        parse(filename, pages)
+
+    def after_download(filename):
+        nonlocal cache_hits
+        pages = load_extracted_pages(cache_dir, manifest["papers"][filename]["download"]["sha256"]) if use_cache else None
+        if pages is not None:
+            cache_hits += 1
+            extracted(filename, pages)
+        else:
+            pending[extractors.submit(extract_pdf_pages, paths[filename])] = ("extract", filename)
+
+    try:
+        for filename, (year, season_code) in info.items():
+            entry = manifest["papers"].setdefault(filename, {})
+            pdf_path = paths[filename]
+            done = completed_stage(entry, pdf_path, cache_dir)
+            if done is None and os.path.exists(pdf_path) and not entry.get("download"):
+                # Downloaded by an older run without a manifest
+                entry["download"] = {"sha256": file_sha256(pdf_path), "bytes": os.path.getsize(pdf_path)}
+                done = completed_stage(entry, pdf_path, cache_dir)
+            if done == "parse":
+                skipped["parse"] += 1
+                results[filename] = entry["parse"]["entries"]
+            elif done == "extract":
+                skipped["extract"] += 1
+                parse(filename)
+            elif done == "download":
+                skipped["download"] += 1
+                after_download(filename)
+            else:
+                url = build_url(year, season_code, filename, base_url)
+                pending[downloads.submit(download_pdf, session, url, pdf_path)] = ("download", filename)
+        save_manifest(manifest_path, manifest)
+        print(f"  Resuming: {skipped['parse']} papers already parsed, {skipped['extract']} extracted, "
+              f"{skipped['download']} downloaded")
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, filename = pending.pop(future)
+                pdf_path = paths[filename]
+                if stage == "download":
+                    if future.result():
+                        manifest["papers"][filename]["download"] = {
+                            "sha256": file_sha256(pdf_path), "bytes": os.path.getsize(pdf_path)}
+                        save_manifest(manifest_path, manifest)
+                        after_download(filename)
+                else:
+                    pages = future.result()
+                    if not pages or not any(pages):
+                        print(f"  ⚠️  Empty text extracted from {filename}")
+                        continue
+                    store_extracted_pages(cache_dir, manifest["papers"][filename]["download"]["sha256"], pages)
+                    extracted(filename, pages)
+        if cache_hits:
+            print(f"  {cache_hits} extractions served from the text cache")
+    finally:
+        downloads.shutdown(wait=True, cancel_futures=True)
+        extractors.shutdown(wait=True, cancel_futures=True)
+        session.close()
+    return results
+
+
 def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=GCE_BASE, help="where the PDFs are served ({base}/{year}/{file}.pdf)")
+    parser.add_argument("--download-dir", default=DOWNLOAD_DIR)
+    parser.add_argument("--cache-dir", default=EXTRACT_CACHE_DIR, help="compressed per-page text by PDF SHA-256")
+    parser.add_argument("--data-file", default=DATA_FILE, help="history_data.json to update")
+    parser.add_argument("--download-workers", type=int, default=4, help="downloads in flight (pooled connections)")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 2,
+                        help="processes running pdfplumber")
+    parser.add_argument("--redo", choices=STAGES, help="rerun this stage and the ones after it for every paper")
+    parser.add_argument("--no-update", action="store_true", help="parse only, leave history_data.json untouched")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  O-Level History 2059 - Past Paper Scraper")
     print("=" * 60)
 
+    start = time.perf_counter()
+    parsed = run_pipeline(PAPERS, args.base_url, args.download_dir, args.download_workers,
+                          args.extract_workers, args.redo, args.cache_dir)
+    print(f"\n  Pipeline finished in {time.perf_counter() - start:.1f}s "
+          f"({len(parsed)}/{len(PAPERS)} papers parsed)")
+
     # Group papers by year/season
     grouped: dict = {}
     for year, season_code, filename in PAPERS:
         season_label = get_season_label(season_code)
-        key = (year, season_label, season_code)
+        key = (year, season_label)
         if key not in grouped:
             grouped[key] = {"qp": None, "ms": None}
         if "_qp_" in filename:
-            grouped[key]["qp"] = filename
+            grouped[key]["qp"] = parsed.get(filename) or None
         elif "_ms_" in filename:
-            grouped[key]["ms"] = filename
+            grouped[key]["ms"] = parsed.get(filename) or None
 
     all_results: dict = {}
-
-    for (year, season_label, season_code), files in grouped.items():
-        print(f"\n{'='*50}")
-        print(f"  [{year}] {season_label.replace('_', ' ')}")
-        print(f"{'='*50}")
-
-        questions = []
-        mark_entries = []
-
-        # ── Download & parse Question Paper ──
-        if files["qp"]:
-            url = build_url(year, season_code, files["qp"])
-            dest = os.path.join(DOWNLOAD_DIR, f"{files['qp']}.pdf")
-            print(f"\n  [QP] {url}")
-            if download_pdf(url, dest):
-                text = extract_pdf_text(dest)
-                if text:
-                    questions = parse_question_paper(text, year, season_label)
-                    print(f"  -> Parsed {len(questions)} questions from QP")
-                else:
-                    print("  ⚠️  Empty text extracted from QP")
-            time.sleep(1.5)  # polite delay
-
-        # ── Download & parse Mark Scheme ──
-        if files["ms"]:
-            url = build_url(year, season_code, files["ms"])
-            dest = os.path.join(DOWNLOAD_DIR, f"{files['ms']}.pdf")
-            print(f"\n  [MS] {url}")
-            if download_pdf(url, dest):
-                text = extract_pdf_text(dest)
-                if text:
-                    mark_entries = parse_mark_scheme(text, year, season_label)
-                    print(f"  -> Parsed {len(mark_entries)} mark scheme entries")
-                else:
-                    print("  ⚠️  Empty text extracted from MS")
-            time.sleep(1.5)
-
+    incomplete = []
+    for (year, season_label), files in grouped.items():
+        # A season whose QP or MS failed to download or parse in this run is left as stored:
+        # upserting a partial result would prune the entries the missing paper would have matched
+        if files["qp"] is None or files["ms"] is None:
+            incomplete.append(f"{year} {season_label.replace('_', ' ')}")
+            continue
         # ── Merge QP + MS ──
-        merged = merge_qa_with_marks(questions, mark_entries, year, season_label)
-        print(f"\n  [MERGE] {len(merged)} final Q&A pairs for {year} {season_label}")
-
+        merged = merge_qa_with_marks(files["qp"], files["ms"], year, season_label)
         if year not in all_results:
             all_results[year] = {}
         all_results[year][season_label] = merged
 
+    if incomplete:
+        print(f"\n⚠️  Not updated, question paper or mark scheme missing: {', '.join(incomplete)}")
+
     # ── Write to JSON ──
-    update_history_data(all_results)
+    if not args.no_update:
+        update_history_data(all_results, args.data_file)
 
     print("\n" + "=" * 60)
     print("  SCRAPING COMPLETE!")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# backend/ and scripts/ are flat directories of sibling modules, imported the way main.py and the scripts do
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import Overloaded, PriorityGate
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+async def hold(gate, marks, order, release):
+    async with gate.slot(marks):
+        order.append(marks)
+        await release.wait()
+
+
+def serve_order(clock, arrivals):
+    """Marks in the order one slot serves them: a 7-mark holder, then arrivals [(time, marks)] queued behind it."""
+    async def run():
+        gate = PriorityGate(1, lane_delays=(0.0, 2.0, 5.0))
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(gate, 7, order, release))]
+        await asyncio.sleep(0)
+        for at, marks in arrivals:
+            clock[0] = at
+            tasks.append(asyncio.create_task(hold(gate, marks, order, release)))
+            await asyncio.sleep(0)
+        assert gate.stats()["queue_depth"] == {"4": 1, "7": 0, "14": 1}
+        release.set()
+        await asyncio.gather(*tasks)
+        assert gate.stats()["active"] == 0
+        return order
+    return asyncio.run(run())
+
+
+def test_short_question_overtakes_queued_essay(clock):
+    assert serve_order(clock, [(0.0, 14), (1.0, 4)]) == [7, 4, 14]
+
+
+def test_essay_is_not_overtaken_after_its_lane_delay(clock):
+    assert serve_order(clock, [(0.0, 14), (6.0, 4)]) == [7, 14, 4]
+
+
+def test_full_queue_is_refused_with_retry_after(clock):
+    async def run():
+        gate = PriorityGate(1, max_queue=1, max_wait=60.0)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(gate, 4, [], release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:
+            async with gate.slot(4):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return gate, refused.value
+    gate, refused = asyncio.run(run())
+    assert refused.reason == "queue_full"
+    assert refused.retry_after == 10  # (1 queued + 1) x 5 s service time / 1 slot
+    assert gate.stats()["rejected"]["queue_full"] == 1
+
+
+def test_long_estimated_wait_is_refused(clock):
+    async def run():
+        gate = PriorityGate(1, max_wait=8.0)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(gate, 4, [], release)) for _ in range(2)]  # 5 s wait: queued
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:  # 10 s wait
+            async with gate.slot(4):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return refused.value
+    refused = asyncio.run(run())
+    assert refused.reason == "queue_wait" and refused.retry_after == 10
+
+
+def test_waiter_that_times_out_is_refused_and_leaves_the_queue():
+    async def run():
+        gate = PriorityGate(1, max_wait=0.05)
+        gate.service_time = 0.01  # admitted to the queue, but the holder never lets go in time
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, 4, [], release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:
+            async with gate.slot(14):
+                pass
+        release.set()
+        await holder
+        return gate, refused.value
+    gate, refused = asyncio.run(run())
+    assert refused.reason == "queue_timeout"
+    assert gate.stats()["queue_depth"] == {"4": 0, "7": 0, "14": 0}
+    assert gate.stats()["active"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import cache
+from cache import AnswerCache
+
+
+def test_lru_evicts_least_recently_used():
+    answers = AnswerCache(max_bytes=20)  # two entries of 1 + 9 bytes
+    answers.put("a", "x" * 9)
+    answers.put("b", "x" * 9)
+    assert answers.get("a") is not None  # a is now the most recently used
+    answers.put("c", "x" * 9)
+    assert answers.get("b") is None
+    assert answers.get("a") is not None and answers.get("c") is not None
+    assert answers.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: now[0], sleep=time.sleep))
+    answers = AnswerCache(ttl=10)
+    answers.put("a", "answer")
+    now[0] += 9
+    assert answers.get("a") == "answer"
+    now[0] += 2
+    assert answers.get("a") is None
+    assert answers.stats()["entries"] == 0
+
+
+def test_byte_cap_counts_utf8_and_skips_oversized_answers():
+    answers = AnswerCache(max_bytes=16)
+    answers.put("a", "é" * 7)  # 1 + 14 bytes
+    assert answers.stats()["bytes"] == 15
+    answers.put("b", "x" * 20)  # larger than the whole cache: not kept, nothing evicted for it
+    assert answers.get("b") is None
+    assert answers.get("a") == "é" * 7
+    answers.put("c", "x" * 5)  # 6 bytes: a must go
+    assert answers.get("a") is None
+    assert answers.stats()["bytes"] == 6
+
+
+def test_sqlite_write_behind_survives_restart(tmp_path):
+    db = str(tmp_path / "answers.sqlite3")
+    answers = AnswerCache(db_path=db, flush_interval=60)
+    answers.put("a", "answer", version=1)
+    assert answers.stats()["pending_writes"] == 1  # queued, not yet committed
+    answers.close()  # flushes without waiting out the interval
+    assert answers.stats()["db_writes"] == 1
+
+    reopened = AnswerCache(db_path=db)
+    assert reopened.stats()["entries"] == 0
+    assert asyncio.run(reopened.aget("a", version=1)) == "answer"  # read from SQLite in a thread
+    assert reopened.stats()["entries"] == 1 and reopened.stats()["hits"] == 1
+    assert asyncio.run(reopened.aget("missing", version=1)) is None
+    assert reopened.stats()["misses"] == 1
+    reopened.close()
+
+
+def test_clear_drops_persisted_answers_of_older_versions(tmp_path):
+    db = str(tmp_path / "answers.sqlite3")
+    answers = AnswerCache(db_path=db, flush_interval=0)
+    answers.put("a", "answer", version=1)
+    answers.clear(2)
+    answers.put("b", "newer", version=2)
+    answers.close()
+
+    reopened = AnswerCache(db_path=db)
+    assert reopened.get("a", version=2) is None
+    assert reopened.get("b", version=2) == "newer"
+    reopened.close()
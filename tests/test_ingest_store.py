@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from ingest_store import IngestStore
+
+SCRAPED = {"question": "Why did the Simon Commission fail?", "marks": 7, "mark_scheme_points": ["No Indian members"]}
+CURATED = {"question": "Describe the Lucknow Pact.", "marks": 4, "mark_scheme_points": ["Congress and League agreed"]}
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "history_data.json"
+    paper = {"mark_scheme": [dict(SCRAPED, source="scraped"), dict(CURATED, source="curated")]}
+    path.write_text(json.dumps({"past_papers": {"2019": {"May_June_2019": {"paper_1": paper}}}}))
+    return path
+
+
+def stored(data_file):
+    return json.loads(data_file.read_text())["past_papers"]["2019"]["May_June_2019"]["paper_1"]["mark_scheme"]
+
+
+def test_failed_paper_keeps_stored_entries(data_file):
+    # A paper that failed to download or parse arrives as an empty entry list
+    with IngestStore(str(data_file)) as store:
+        counts = store.upsert_paper("2019", "May_June_2019", "paper_1", [], source="scraped")
+    assert counts == {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    assert [e["question"] for e in stored(data_file)] == [SCRAPED["question"], CURATED["question"]]
+    assert not (data_file.parent / "history_data.journal.jsonl").exists()
+
+
+def test_partial_upsert_does_not_prune(data_file):
+    new = {"question": "Was the Khilafat Movement a failure?", "marks": 14, "mark_scheme_points": ["Yes"]}
+    with IngestStore(str(data_file)) as store:
+        counts = store.upsert_paper("2019", "May_June_2019", "paper_1", [new], source="scraped", prune=False)
+    assert counts["added"] == 1 and counts["removed"] == 0
+    assert {e["question"] for e in stored(data_file)} == {SCRAPED["question"], CURATED["question"], new["question"]}
+
+
+def test_complete_upsert_prunes_only_its_own_source(data_file):
+    new = {"question": "Was the Khilafat Movement a failure?", "marks": 14, "mark_scheme_points": ["Yes"]}
+    with IngestStore(str(data_file)) as store:
+        counts = store.upsert_paper("2019", "May_June_2019", "paper_1", [new], source="scraped")
+    assert counts == {"added": 1, "updated": 0, "removed": 1, "unchanged": 0}
+    assert {e["question"] for e in stored(data_file)} == {CURATED["question"], new["question"]}
+    journal = (data_file.parent / "history_data.journal.jsonl").read_text().splitlines()
+    assert json.loads(journal[0])["removed"] == 1
+
+
+def test_unchanged_upsert_writes_nothing(data_file):
+    before = data_file.read_text()
+    with IngestStore(str(data_file)) as store:
+        counts = store.upsert_paper("2019", "May_June_2019", "paper_1", [SCRAPED], source="scraped")
+    assert counts["unchanged"] == 1
+    assert data_file.read_text() == before
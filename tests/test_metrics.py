@@ -0,0 +1,29 @@
+import os
+
+from metrics import Metrics
+
+
+def test_shared_render_sums_workers(tmp_path):
+    other, own = Metrics(), Metrics()
+    for metrics in (other, own):
+        metrics.share(str(tmp_path))
+        metrics.answers.inc("groq")
+        metrics.request_seconds.observe(0.2, "/ask-ai", "200")
+    other.answers.inc("cache")
+    other.queue_depth.collect = lambda: {("4",): 5}
+    other_snapshot = other.snapshot()
+    other_snapshot["pid"] = os.getpid() + 1_000_000  # no such process: counters kept, gauges dropped
+    other.write_snapshot(other_snapshot)
+    own.queue_depth.collect = lambda: {("4",): 2}
+
+    body = own.render_shared(own.snapshot())
+    assert 'ask_ai_answers_total{provider="groq"} 2' in body
+    assert 'ask_ai_answers_total{provider="cache"} 1' in body
+    assert 'ask_ai_request_seconds_count{path="/ask-ai",status="200"} 2' in body
+    assert 'ask_ai_queue_depth{lane="4"} 2' in body
+
+
+def test_unshared_render_is_this_process_only():
+    metrics = Metrics()
+    metrics.answers.inc("groq")
+    assert 'ask_ai_answers_total{provider="groq"} 1' in metrics.render()
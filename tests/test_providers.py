@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+import providers
+from providers import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(providers, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_open_half_open_closed(clock):
+    breaker = open_breaker(clock)
+    assert not breaker.ready() and not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.state == "half_open" and breaker.ready()
+    assert breaker.allow()  # this caller holds the one trial
+    assert not breaker.ready() and not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.trial_in_flight
+    assert not breaker.allow()
+
+    clock[0] += 29  # the reset timeout counts from the failed trial
+    assert breaker.state == "open"
+    clock[0] += 1
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+def test_released_trial_lets_the_next_caller_try(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()  # the trial ended with neither outcome (e.g. cancelled)
+    assert breaker.state == "half_open" and breaker.ready()
+    assert breaker.allow()